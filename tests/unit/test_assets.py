@@ -0,0 +1,323 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from vulnspec import ParseError, SynthError
+from vulnspec.assets import Asset
+from vulnspec.common.dump import DumpType
+from vulnspec.graph import (
+    Array,
+    Assignment,
+    Call,
+    Cast,
+    Deref,
+    Ref,
+    SizeOfExpr,
+    Value,
+    Variable,
+)
+from vulnspec.interpret import Lifter, UsageCapture
+from vulnspec.node import PointerTypeNode, SimpleTypeNode, intern_type
+from vulnspec.parser import RegexLexer
+from vulnspec.parser.token import TokenType
+from vulnspec.passes import FrontEndVisitor, ProcessingError
+
+SPEC = """
+chunk counter : int = 0
+
+block (nop) outer {
+    counter = counter + 1
+    if counter > 2 {
+        call inner
+    }
+}
+
+block inner {
+    counter = 0
+    ...
+    counter = 1
+}
+
+block (nop) unused {
+    counter = counter + 2
+}
+"""
+
+
+TYPED_SPEC = """
+chunk buffer: [8]char,
+      pointer: *char,
+      size: int
+
+block main {
+    pointer = &buffer[0]
+    *pointer = *pointer
+    size = (*pointer) as int
+    call helper
+}
+
+block (func) helper {
+    pointer = &buffer[1]
+}
+"""
+
+CHAR = intern_type(SimpleTypeNode("char"))
+CHAR_POINTER = intern_type(PointerTypeNode(SimpleTypeNode("char")))
+
+
+def shape(block):
+    return [type(stmt).__name__ for stmt in block.statements]
+
+
+def test_lazy_bodies():
+    asset = Asset.load(SPEC, external=True, lazy=True)
+
+    blocks = {block.name: block for block in asset.blocks}
+    assert set(blocks) == {"outer", "inner", "unused"}
+    assert blocks["outer"].constraint.nop
+    assert all(not block.statements for block in blocks.values())
+
+
+def test_resolve():
+    eager = Asset.load(SPEC, external=True)
+    lazy = Asset.load(SPEC, external=True, lazy=True)
+
+    blocks = {block.name: block for block in lazy.blocks}
+    lazy.resolve(blocks["outer"])
+
+    expected = {block.name: block for block in eager.blocks}
+    blocks = {block.name: block for block in lazy.blocks}
+    assert set(blocks) == set(expected)
+    for name in ("outer", "inner", "inner1"):
+        assert shape(blocks[name]) == shape(expected[name])
+    assert not blocks["unused"].statements
+
+    call = blocks["inner"].statements[-1]
+    assert isinstance(call, Call)
+    assert call.block is blocks["inner1"]
+
+
+def test_deferred_errors():
+    spec = SPEC.replace("counter + 2", "missing + 2")
+    asset = Asset.load(spec, external=True, lazy=True)
+
+    blocks = {block.name: block for block in asset.blocks}
+    with pytest.raises(ProcessingError):
+        asset.resolve(blocks["unused"])
+
+    spec = SPEC.replace("counter + 2", "counter +")
+    asset = Asset.load(spec, external=True, lazy=True)
+
+    blocks = {block.name: block for block in asset.blocks}
+    with pytest.raises(ParseError):
+        asset.resolve(blocks["unused"])
+
+
+def test_parse_error_tokens(tmp_path, monkeypatch):
+    spec = SPEC.replace("counter + 2", "counter +")
+
+    lexed = []
+    tokens = RegexLexer.tokens
+
+    def counted(self):
+        for token in tokens(self):
+            lexed.append(token)
+            yield token
+
+    monkeypatch.setattr(RegexLexer, "tokens", counted)
+
+    # the rest of the stream is only lexed to finish a token dump
+    with pytest.raises(ParseError):
+        Asset.load(spec)
+    partial = len(lexed)
+    assert lexed[-1].ttype != TokenType.EOF
+
+    lexed.clear()
+    path = tmp_path / "tokens.txt"
+    with pytest.raises(ParseError):
+        Asset.load(spec, dump={DumpType.Tokens: path})
+    assert len(lexed) > partial
+    assert lexed[-1].ttype == TokenType.EOF
+    assert path.read_text().count("\n") == len(
+        [token for token in lexed if token.ttype in (TokenType.Newline, TokenType.EOF)]
+    )
+
+
+def test_expression_types():
+    asset = Asset.load(TYPED_SPEC)
+    blocks = {block.name: block for block in asset.blocks}
+
+    ref, deref, cast = blocks["main"].statements[:3]
+    assert isinstance(ref, Assignment) and isinstance(ref.value, Ref)
+    assert ref.target.vtype is CHAR_POINTER
+    assert ref.value.vtype is CHAR_POINTER
+    assert ref.value.target.vtype is CHAR
+
+    assert isinstance(deref, Assignment) and isinstance(deref.target, Deref)
+    assert deref.target.vtype is CHAR
+    assert deref.target.target.vtype is CHAR_POINTER
+
+    assert isinstance(cast, Assignment) and isinstance(cast.value, Cast)
+    assert cast.value.vtype is intern_type(SimpleTypeNode("int"))
+
+    # types are kept when the graph is rewritten
+    mapped = blocks["main"].map(lambda item: item)
+    assert isinstance(mapped.statements[0], Assignment)
+    assert mapped.statements[0].value.vtype is CHAR_POINTER
+
+
+def test_lifted_types():
+    asset = Asset.load(TYPED_SPEC)
+    blocks = {block.name: block for block in asset.blocks}
+
+    buffer = asset.chunks[0].lookup("buffer")
+    assert buffer is not None
+    root, var, _ = Lifter.lift(blocks["helper"], buffer)
+    assert isinstance(root.capture, Ref)
+    assert root.capture.vtype is CHAR_POINTER
+    assert var.vtype is CHAR_POINTER
+
+    # which matches the type that is computed for an untyped usage
+    untyped = UsageCapture(buffer, Ref(Array(Variable(buffer), Value("1"))))
+    assert intern_type(untyped.nvar().vtype) is CHAR_POINTER
+
+
+def test_sizeof_template():
+    spec = """
+    chunk size: int
+
+    block main {
+        size = sizeofexpr(<value; 4>)
+    }
+    """
+    asset = Asset.load(spec)
+    statement = asset.blocks[0].statements[0]
+    assert isinstance(statement, Assignment)
+    assert isinstance(statement.value, SizeOfExpr)
+    assert isinstance(statement.value.target, Value)
+    assert statement.value.target.value == "4"
+
+
+TEMPLATED_SPEC = """
+template <size; random.randint(4, 64)>
+
+chunk buffer: [<size>]char
+chunk index: int = <start; random.randint(0, 3)>
+
+block main {
+    buffer[index] = <fill; random.choice(["'a'", "'b'"])>
+    index = index + <step; random.randint(1, 3)>
+    if index < <limit> {
+        call main
+    }
+}
+"""
+
+
+def test_fused():
+    for spec in (SPEC, TYPED_SPEC):
+        separate = Asset.load(spec, external=True)
+        fused = Asset.load(spec, external=True, fused=True)
+
+        expected = {block.name: block for block in separate.blocks}
+        blocks = {block.name: block for block in fused.blocks}
+        assert set(blocks) == set(expected)
+        for name, block in blocks.items():
+            assert shape(block) == shape(expected[name])
+
+        assert [var.name for chunk in fused.chunks for var in chunk.variables] == [
+            var.name for chunk in separate.chunks for var in chunk.variables
+        ]
+
+    blocks = {block.name: block for block in fused.blocks}
+    ref = blocks["main"].statements[0]
+    assert isinstance(ref, Assignment) and isinstance(ref.value, Ref)
+    assert ref.value.vtype is CHAR_POINTER
+
+
+def test_fused_templates():
+    random.seed(0)
+    separate = Asset.load(TEMPLATED_SPEC, templates={"limit": 2})
+    random.seed(0)
+    fused = Asset.load(TEMPLATED_SPEC, templates={"limit": 2}, fused=True)
+
+    templates = fused.attachments["templates"]
+    assert templates == separate.attachments["templates"]
+    assert templates["limit"] == 2
+
+    buffer = fused.chunks[0].lookup("buffer")
+    assert buffer is not None
+    assert buffer.vtype.size.value == templates["size"]
+
+
+EXAMPLES = Path(__file__).parents[2] / "examples"
+
+
+def summary(asset):
+    return (
+        [(block.name, shape(block)) for block in asset.blocks],
+        [
+            (var.name, repr(var.vtype), str(var.initial))
+            for chunk in asset.chunks
+            for var in chunk.variables
+        ],
+        sorted(dict(asset.attachments["templates"]).items()),
+    )
+
+
+@pytest.mark.parametrize(
+    "path",
+    sorted(EXAMPLES.glob("**/*.spec")) + sorted(EXAMPLES.glob("protostar/**/*.txt")),
+    ids=lambda path: path.name,
+)
+def test_fused_examples(path):
+    # FrontEndVisitor repeats the traversals of the separate passes, so check
+    # that it still agrees with them on every bundled example
+    spec = path.read_text()
+    for seed in range(4):
+        random.seed(seed)
+        separate = Asset.load(spec, templates={"seed": seed})
+        random.seed(seed)
+        fused = Asset.load(spec, templates={"seed": seed}, fused=True)
+        assert summary(fused) == summary(separate)
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        TYPED_SPEC.replace("size = (*pointer) as int", "size = missing"),
+        TYPED_SPEC.replace("call helper", "if size {\n        call helper\n    }"),
+        TYPED_SPEC.replace("size = (*pointer) as int", "size = <unknown>"),
+    ],
+)
+def test_fused_errors(spec):
+    with pytest.raises(SynthError) as separate:
+        Asset.load(spec)
+    with pytest.raises(SynthError) as fused:
+        Asset.load(spec, fused=True)
+
+    assert type(fused.value) is type(separate.value)
+    assert str(fused.value) == str(separate.value)
+
+
+def test_fused_template_errors():
+    # templates are evaluated by python, so their errors aren't SynthErrors,
+    # and pass straight through either way
+    spec = TEMPLATED_SPEC.replace("random.randint(1, 3)", "random.randint(")
+    with pytest.raises(SyntaxError) as separate:
+        Asset.load(spec)
+    with pytest.raises(SyntaxError) as fused:
+        Asset.load(spec, fused=True)
+
+    assert str(fused.value) == str(separate.value)
+
+
+def test_fused_bug(monkeypatch):
+    # only errors in the spec fall back to the separate passes
+    def visit_spec(self, node):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(FrontEndVisitor, "visit_spec", visit_spec)
+    with pytest.raises(RuntimeError, match="bug"):
+        Asset.load(SPEC, fused=True)
@@ -0,0 +1,70 @@
+from vulnspec import SpecCache
+from vulnspec.node import SpecNode
+from vulnspec.parser import Parser, RegexLexer
+from vulnspec.passes import PrinterVisitor
+
+SPEC = """
+chunk counter : int = 0
+
+block main {
+    counter = counter + 1
+}
+"""
+
+
+def parse(stream):
+    return Parser(RegexLexer(stream).tokens()).parse()
+
+
+def dump(spec, tmp_path):
+    output = tmp_path / "ast.txt"
+    with output.open("w") as f:
+        spec.accept(PrinterVisitor(f))
+    return output.read_text()
+
+
+def test_roundtrip(tmp_path):
+    cache = SpecCache(tmp_path / "cache")
+    assert cache.load(SPEC) is None
+
+    spec = parse(SPEC)
+    cache.store(SPEC, spec)
+
+    cached = cache.load(SPEC)
+    assert isinstance(cached, SpecNode)
+    assert dump(cached, tmp_path) == dump(spec, tmp_path)
+
+
+def test_content_addressed(tmp_path):
+    cache = SpecCache(tmp_path / "cache")
+    cache.store(SPEC, parse(SPEC))
+
+    assert cache.load(SPEC + "\n") is None
+
+
+def test_corrupted(tmp_path):
+    cache = SpecCache(tmp_path / "cache")
+    cache.store(SPEC, parse(SPEC))
+
+    for path in (tmp_path / "cache").glob("**/*.ast"):
+        path.write_bytes(b"garbage")
+
+    assert cache.load(SPEC) is None
+
+
+def test_unwritable(tmp_path, monkeypatch):
+    # the cache directory can't be created
+    (tmp_path / "cache").write_text("")
+    cache = SpecCache(tmp_path / "cache")
+    cache.store(SPEC, parse(SPEC))
+    assert cache.load(SPEC) is None
+
+    # or the entry can't be written
+    def fail(*_):
+        raise OSError(28, "No space left on device")
+
+    cache = SpecCache(tmp_path / "other")
+    monkeypatch.setattr("os.replace", fail)
+    cache.store(SPEC, parse(SPEC))
+    assert cache.load(SPEC) is None
+    assert not list((tmp_path / "other").glob("**/*.tmp"))
@@ -0,0 +1,61 @@
+import pytest
+
+from vulnspec.common.error import ErrorLocation, LineIndex, SourcePosition
+from vulnspec.parser import ParseError, Parser, RegexLexer
+
+STREAM = "first\nsecond line\n\nfourth\n"
+
+
+@pytest.mark.parametrize(
+    "offset,expected",
+    [
+        (0, (1, 1)),
+        (5, (1, 6)),
+        (6, (2, 1)),
+        (12, (2, 7)),
+        (18, (3, 1)),
+        (19, (4, 1)),
+        (100, (5, 1)),
+    ],
+)
+def test_position(offset, expected):
+    assert LineIndex.of(STREAM).position(offset) == expected
+
+
+def test_lines():
+    index = LineIndex.of(STREAM)
+    assert len(index) == 4
+    assert index.lines(0, 10) == [
+        (1, "first"),
+        (2, "second line"),
+        (3, ""),
+        (4, "fourth"),
+    ]
+
+
+def test_shared():
+    assert LineIndex.of(STREAM) is LineIndex.of(STREAM)
+
+
+def test_span():
+    stream = "block main {\n    x = 1 +\n}\n"
+    with pytest.raises(ParseError) as excinfo:
+        Parser(RegexLexer(stream).tokens()).parse()
+
+    err = excinfo.value
+    start, end = err.location.span(err.stream)
+    assert start == SourcePosition(2, 5)
+    assert end == SourcePosition(2, 5)
+
+
+def test_format():
+    location = ErrorLocation(13, 17)
+    assert location.format(STREAM) == "\n".join(
+        [
+            "       1  |  first",
+            "       2  |  second line",
+            "          |         ----^",
+            "       3  |  ",
+            "       4  |  fourth",
+        ]
+    )
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+from vulnspec.common.importtime import ImportTime, is_importtime, parse_line, report
+
+OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     vulnspec.common
+import time:       300 |        420 |   vulnspec.common.error
+import time:      1000 |       1000 |   argparse
+import time:       200 |       1620 | vulnspec
+import time:        80 |         80 | other
+"""
+
+
+def test_parse_line():
+    lines = OUTPUT.splitlines()
+    assert all(is_importtime(line) for line in lines)
+    assert not is_importtime("some other output")
+
+    assert parse_line(lines[0]) is None
+    assert parse_line(lines[1]) == ImportTime("vulnspec.common", 120, 120, 2)
+    assert parse_line(lines[4]) == ImportTime("vulnspec", 200, 1620, 0)
+
+
+def test_report():
+    times = [parse_line(line) for line in OUTPUT.splitlines()[1:]]
+    lines = report(times).splitlines()
+
+    assert [line.split()[-1] for line in lines[1:-1]] == [
+        "vulnspec",
+        "vulnspec.common.error",
+        "vulnspec.common",
+    ]
+    assert lines[-1] == (
+        "3 vulnspec modules took 0.62ms to import, out of 1.70ms of imports in total"
+    )
+
+
+def test_lazy_import():
+    # importing the package alone shouldn't pull in the pipeline
+    code = "import sys, vulnspec; print(sorted(sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-c", code], stdout=subprocess.PIPE, text=True, check=True
+    )
+    assert "vulnspec.solve" not in proc.stdout
+    assert "vulnspec.builtins" not in proc.stdout
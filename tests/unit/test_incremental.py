@@ -0,0 +1,112 @@
+import pytest
+
+from vulnspec.parser import IncrementalParser, ParseError, Parser, RegexLexer
+from vulnspec.passes import PrinterVisitor, ProcessingError, TypeCheckVisitor
+
+SPEC = """
+chunk counter : int = 0
+
+block first {
+    counter = counter + 1
+}
+
+block second {
+    call first
+}
+
+block main {
+    call second
+}
+"""
+
+
+def parse(stream):
+    return Parser(RegexLexer(stream).tokens()).parse()
+
+
+def dump(spec, tmp_path):
+    output = tmp_path / "ast.txt"
+    with output.open("w") as f:
+        spec.accept(PrinterVisitor(f))
+    return output.read_text()
+
+
+@pytest.mark.parametrize(
+    "edited",
+    [
+        SPEC.replace("counter + 1", "counter + 2"),
+        SPEC.replace("block second", "block third").replace(
+            "call second", "call third"
+        ),
+        SPEC.replace("block main", "block extra {\n}\n\nblock main"),
+        SPEC.replace("block first {\n    counter = counter + 1\n}\n", ""),
+        SPEC + "block last {\n}\n",
+        "chunk x : int = 1\n" + SPEC,
+        "",
+    ],
+)
+def test_matches_full_parse(edited, tmp_path):
+    front = IncrementalParser(SPEC)
+    front.spec  # pylint: disable=pointless-statement
+
+    spec = front.update(edited)
+    assert dump(spec, tmp_path) == dump(parse(edited), tmp_path)
+
+
+def test_edit_reuses_items():
+    front = IncrementalParser(SPEC)
+    before = front.spec
+
+    after = front.update(SPEC.replace("counter + 1", "counter + 2"))
+    assert after.blocks[1] is before.blocks[1]
+    assert after.blocks[2] is before.blocks[2]
+    assert after.blocks[0] is not before.blocks[0]
+
+
+def test_symbols_reset():
+    front = IncrementalParser(SPEC)
+    front.spec  # pylint: disable=pointless-statement
+
+    for i in range(5):
+        spec = front.update(SPEC.replace("counter + 1", f"counter + temp{i}"))
+    assert spec.symbols.lookup("temp0") is not None
+
+    # a full reparse only has the names still in use
+    with pytest.raises(ParseError):
+        front.update(SPEC.replace("block second {", "block second"))
+    spec = front.update(SPEC)
+    assert spec.symbols.lookup("temp0") is None
+    assert len(spec.symbols) == len(parse(SPEC).symbols)
+
+
+def test_error_then_recover(tmp_path):
+    front = IncrementalParser(SPEC)
+    front.spec  # pylint: disable=pointless-statement
+
+    broken = SPEC.replace("block second {", "block second")
+    with pytest.raises(ParseError) as err:
+        front.update(broken)
+    with pytest.raises(ParseError) as expected:
+        parse(broken)
+    assert str(err.value) == str(expected.value)
+
+    spec = front.update(SPEC)
+    assert dump(spec, tmp_path) == dump(parse(SPEC), tmp_path)
+
+
+def test_relocate():
+    original = SPEC.replace("call first", "call missing")
+    front = IncrementalParser(original)
+    front.spec  # pylint: disable=pointless-statement
+
+    # the broken block is reused, so still refers to the original stream
+    edited = "chunk x : int = 1\n" + original
+    spec = front.update(edited)
+    assert spec.blocks[1].token_start.stream is original
+
+    with pytest.raises(ProcessingError) as err:
+        spec.accept(TypeCheckVisitor())
+    with pytest.raises(ProcessingError) as expected:
+        parse(edited).accept(TypeCheckVisitor())
+    assert str(err.value) != str(expected.value)
+    assert str(front.relocate(err.value)) == str(expected.value)
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+
+from vulnspec.parser import Lexer, LexError, RegexLexer
+
+SPECS = [
+    *sorted(Path("examples").glob("**/*.txt")),
+    *sorted(Path("examples").glob("**/*.spec")),
+    *sorted(Path("vulnspec/data/nops").glob("*.spec")),
+]
+
+
+def lex(lexer, stream):
+    try:
+        return [
+            (token.ttype, token.position, token.length, token.lexeme)
+            for token in lexer(stream).tokens()
+        ]
+    except LexError as err:
+        return (err.msg, err.location.start, err.location.end)
+
+
+@pytest.mark.parametrize("path", SPECS, ids=str)
+def test_parity_examples(path):
+    stream = path.read_text()
+    assert lex(RegexLexer, stream) == lex(Lexer, stream)
+
+
+@pytest.mark.parametrize(
+    "stream",
+    [
+        "",
+        "\n\n  \n\t\n",
+        "a = $(foo(bar) + (1))\n$(raw statement)\n",
+        "x = $",
+        "x = $y",
+        "chunk key : [<keylen; len(key)>]char = <key>",
+        "while i < <flagtlen> {",
+        "i<j",
+        "i <= j",
+        "<a;b>",
+        "<;x>",
+        "<>>",
+        "< x>",
+        "<unfinished; def",
+        "<\n>",
+        "a = #'c' + #x + #9",
+        "printf@libc.stdio('%d', 0x1f, 0b101, 0o17, 3.25, 1.)",
+        "a...b..c.d",
+        "a == b != c >= d && e || !f & g | h ^ ~i",
+        "// comment\nx // trailing\n/* multi\nline */ y",
+        "/* a **/ b */ c",
+        "'\\x41\\n' \"quoted\"",
+        "\r@é",
+    ],
+)
+def test_parity_snippets(stream):
+    assert lex(RegexLexer, stream) == lex(Lexer, stream)
+
+
+@pytest.mark.parametrize(
+    "stream",
+    [
+        "x = $(unfinished",
+        "/* unfinished",
+        "/* unfinished *",
+        "'unfinished",
+        "'unfinished\n'",
+        "#'ab'",
+        "#!",
+        "name$",
+        "1a",
+        "0x1g",
+    ],
+)
+def test_parity_errors(stream):
+    with pytest.raises(LexError):
+        RegexLexer(stream).tokens_list()
+    assert lex(RegexLexer, stream) == lex(Lexer, stream)
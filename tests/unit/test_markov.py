@@ -0,0 +1,200 @@
+import json
+import random
+import threading
+from array import array
+
+import pytest
+
+from vulnspec.common.data import data_path
+from vulnspec.markov import (
+    MAGIC,
+    PREAMBLE,
+    VERSION,
+    Endings,
+    LengthSampler,
+    Markov,
+    MarkovLoader,
+    Models,
+    Table,
+    models,
+)
+
+MODELS = {
+    "names": {
+        "mode": "single",
+        "size": 1,
+        "terminal": "$",
+        "table": {
+            "": [[0.0, "a"], [0.5, "b"]],
+            "a": [[0.0, "b"], [0.5, "$"]],
+            "b": [[0.0, "a"], [0.5, "$"]],
+        },
+    },
+}
+
+
+class CountingModels(Models):
+    def __init__(self, path):
+        super().__init__(path)
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return super()._load()
+
+
+def test_shared_models():
+    first = MarkovLoader(exclude=None).model("vars", (1, 12))
+    second = MarkovLoader(exclude=["taken"]).model("vars", (1, 12))
+
+    assert first.markov is second.markov is models.get("vars")
+
+    # but each loader has its own exclusions
+    name = first.generate()
+    assert name in first._exclude  # pylint: disable=protected-access
+    assert name not in second._exclude  # pylint: disable=protected-access
+    assert "taken" not in first._exclude  # pylint: disable=protected-access
+
+
+def test_load_once(tmp_path):
+    path = tmp_path / "markov.json"
+    path.write_text(json.dumps(MODELS))
+    store = CountingModels(path)
+    assert store.loads == 0
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(store.get("names")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.loads == 1
+    assert all(markov is results[0] for markov in results)
+
+    wrapper = MarkovLoader(exclude=None, store=store).model("names", (1, 4))
+    assert set(wrapper.generate()) <= {"a", "b"}
+
+
+def test_table():
+    table = Table.from_lookup(MODELS["names"]["table"])
+    assert table.ranges == {"": (0, 2), "a": (2, 4), "b": (4, 6)}
+    assert table.chars == "abb$a$"
+
+    random.seed(0)
+    choices = [table.choose("a") for _ in range(100)]
+    random.seed(0)
+    assert choices == ["b" if random.random() < 0.5 else "$" for _ in range(100)]
+
+
+def test_compiled(tmp_path):
+    source = Models(data_path("markov.json"))
+    compiled = Models(data_path("markov.json"), data_path("markov.bin"))
+    assert isinstance(compiled.get("funcs").markovs[0].table.probs, memoryview)
+    assert source.get("funcs").endings is None
+    assert compiled.get("funcs").endings is not None
+    # vars fits nearly every name anyway, so it's never sampled
+    assert compiled.get("vars").endings is None
+
+    for name in ("funcs", "vars"):
+        random.seed(name)
+        expected = [source.get(name).generate() for _ in range(200)]
+        random.seed(name)
+        assert [compiled.get(name).generate() for _ in range(200)] == expected
+
+    # broken compiled models are ignored
+    path = tmp_path / "markov.bin"
+    path.write_bytes(b"VSMARKOV\xff")
+    broken = Models(data_path("markov.json"), path)
+    assert isinstance(broken.get("funcs").markovs[0].table.probs, array)
+
+    for header in (b'{"funcs": {}}', b'{"funcs": {"tables": [1]}}'):
+        path.write_bytes(PREAMBLE.pack(MAGIC, VERSION, len(header)) + header)
+        broken = Models(data_path("markov.json"), path)
+        assert isinstance(broken.get("funcs").markovs[0].table.probs, array)
+
+
+def test_generate_batch():
+    random.seed(0)
+    loader = MarkovLoader(exclude=["taken"])
+    funcs = loader.model("funcs", (3, 12))
+    names = funcs.generate_batch(50)
+
+    assert funcs.sampler is not None
+    assert len(names) == 50
+    assert len(set(names)) == 50
+    assert all(3 <= len(name) <= 12 for name in names)
+    assert "taken" not in names
+
+    # every name is excluded from being generated again
+    assert not any(funcs.allowed(name) for name in names)
+
+    # including by the other models from the same loader
+    names += loader.model("vars", (1, 12)).generate_batch(50)
+    assert len(set(names)) == 100
+
+    assert not funcs.generate_batch(0)
+
+
+def test_endings():
+    markov = Markov(Table.from_lookup(MODELS["names"]["table"]), 1, "$")
+    endings = Endings.compute(markov, 4)
+
+    # every name has a length of at least 1, and then ends with a probability
+    # of 0.5 after each character
+    for k in range(5):
+        assert endings.within("", k) == pytest.approx(1 - 0.5**k)
+        assert endings.within("a", k) == pytest.approx(1 - 0.5 ** (k + 1))
+    assert endings.within("", -1) == 0
+    assert endings.within("c", 2) == 0
+
+
+def test_length_sampler():
+    markov = Markov(Table.from_lookup(MODELS["names"]["table"]), 1, "$")
+    sampler = LengthSampler(markov, Endings.compute(markov, 4), 2, 3)
+    assert sampler.probability() == pytest.approx(0.375)
+
+    random.seed(0)
+    lengths = [len(sampler.generate()) for _ in range(2000)]
+    assert set(lengths) == {2, 3}
+    # a length of 2 is twice as likely as a length of 3
+    assert lengths.count(2) / len(lengths) == pytest.approx(2 / 3, abs=0.05)
+
+
+def test_batch_unique():
+    markov = Markov(Table.from_lookup(MODELS["names"]["table"]), 1, "$")
+    sampler = LengthSampler(markov, Endings.compute(markov, 4), 1, 4)
+
+    random.seed(0)
+    # the candidates back off from the names that the others have already
+    # finished as, like they do from excluded names
+    names = sampler.generate_batch(6, exclude={"ab"})
+    assert len(set(names)) == 6
+    assert all(len(name) <= 4 and name != "ab" for name in names)
+
+    names = markov.generate_batch(4, max_size=2)
+    assert len(set(names)) == len(names)
+    assert set(names) <= {"a", "b", "ab", "ba"}
+
+
+def test_exclude():
+    markov = Markov(Table.from_lookup(MODELS["names"]["table"]), 1, "$")
+
+    random.seed(0)
+    names = [markov.generate(exclude={"a", "b", "ab"}) for _ in range(200)]
+    assert all(len(name) >= 2 and name != "ab" for name in names)
+
+    loader = MarkovLoader(exclude=["taken"])
+    wrapper = loader.model("vars", (1, 12))
+    for name in ("taken", "int", "while", "argv", "printf", "size_t"):
+        assert not wrapper.allowed(name)
+
+    # the reserved names are shared, rather than copied into every loader
+    other = MarkovLoader(exclude=None).model("vars", (1, 12))
+    # pylint: disable=protected-access
+    assert other._exclude.reserved is wrapper._exclude.reserved
+    assert wrapper._used == {"taken"}
+    assert not other._used
@@ -0,0 +1,62 @@
+import pytest
+
+from vulnspec.node import (
+    BinaryOperationNode,
+    Operator,
+    UnaryOperationNode,
+    ValueNode,
+    VariableNode,
+)
+from vulnspec.parser import ParseError, Parser, RegexLexer
+
+
+def parse_expression(expression):
+    stream = f"block main {{\n    x = {expression}\n}}\n"
+    spec = Parser(RegexLexer(stream).tokens()).parse()
+    return spec.blocks[0].statements[0].expression
+
+
+def shape(node):
+    if isinstance(node, BinaryOperationNode):
+        return (shape(node.left), node.op.opstr(), shape(node.right))
+    if isinstance(node, UnaryOperationNode):
+        return (node.op.opstr(), shape(node.item))
+    if isinstance(node, VariableNode):
+        return node.name
+    if isinstance(node, ValueNode):
+        return str(node)
+    raise TypeError(node)
+
+
+@pytest.mark.parametrize(
+    "expression,expected",
+    [
+        ("a + b * c", ("a", "+", ("b", "*", "c"))),
+        ("a * b + c", (("a", "*", "b"), "+", "c")),
+        ("a - b - c", ("a", "-", ("b", "-", "c"))),
+        ("a & b | c ^ d", ("a", "&", ("b", "|", ("c", "^", "d")))),
+        ("a < b + 1", ("a", "<", ("b", "+", "1"))),
+        ("a < b && c || d", ((("a", "<", "b"), "&&", "c"), "||", "d")),
+        ("a || b && c", ("a", "||", ("b", "&&", "c"))),
+        ("-a * !b", (("-", "a"), "*", ("!", "b"))),
+        ("~(a + b)", ("~", ("a", "+", "b"))),
+    ],
+)
+def test_precedence(expression, expected):
+    assert shape(parse_expression(expression)) == expected
+
+
+def test_token_range():
+    node = parse_expression("a * b + c")
+    assert isinstance(node, BinaryOperationNode)
+    assert node.op == Operator.Add
+    assert node.token_start.lexeme == "a"
+    assert node.token_end.lexeme == "c"
+    assert node.left.token_start.lexeme == "a"
+    assert node.left.token_end.lexeme == "b"
+
+
+@pytest.mark.parametrize("expression", ["a < b < c", "a == b != c", "--a"])
+def test_invalid(expression):
+    with pytest.raises(ParseError):
+        parse_expression(expression)
@@ -0,0 +1,51 @@
+from vulnspec.common.symbols import SymbolTable, split_namespace
+from vulnspec.parser import Parser, RegexLexer
+
+SPEC = """
+chunk counter : int = 0
+
+block main {
+    counter = counter + 1
+    printf@libc.stdio("%d", counter)
+    call main
+}
+"""
+
+
+def test_intern():
+    symbols = SymbolTable()
+    first = symbols.intern("counter")
+    second = symbols.intern("other")
+
+    assert symbols.intern("counter") is first
+    assert first.id != second.id
+    assert symbols[second.id] is second
+    assert symbols.lookup("missing") is None
+    assert len(symbols) == 2
+
+
+def test_namespace():
+    assert split_namespace("printf@libc.stdio") == ("printf", "libc.stdio")
+    assert split_namespace("counter") == ("counter", None)
+
+    symbol = SymbolTable().intern("printf@libc.stdio")
+    assert symbol.base == "printf"
+    assert symbol.namespace == "libc.stdio"
+
+
+def test_parser_ids():
+    spec = Parser(RegexLexer(SPEC).tokens()).parse()
+
+    decl = spec.chunks[0].variables[0]
+    assign = spec.blocks[0].statements[0]
+    call = spec.blocks[0].statements[2]
+
+    assert assign.target.symbol == decl.symbol
+    assert assign.expression.left.symbol == decl.symbol
+    assert call.symbol == spec.blocks[0].symbol
+    assert spec.symbols[decl.symbol].name == "counter"
+
+
+def test_namespaces():
+    spec = Parser(RegexLexer(SPEC).tokens()).parse()
+    assert spec.symbols.namespaces() == {"libc.stdio"}
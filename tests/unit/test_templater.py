@@ -0,0 +1,126 @@
+import random
+
+import pytest
+
+from vulnspec.node import LiteralStatementNode, TemplateValueNode
+from vulnspec.parser import Parser, RegexLexer
+from vulnspec.passes import TemplaterVisitor
+from vulnspec.passes.templater import TemplatePlan, Templates, compile_definition
+
+SPEC = """
+template <total; first + second>
+template <first; 1>
+template <second; first * 2>
+
+chunk counter : int = <total>
+
+block main {
+    counter = counter + <second>
+}
+"""
+
+
+def names(templates):
+    return [templ.name for templ in templates]
+
+
+def test_plan_order():
+    spec = Parser(RegexLexer(SPEC).tokens()).parse()
+    assert names(TemplatePlan(spec.templates).order) == ["first", "second", "total"]
+
+    templater = TemplaterVisitor()
+    spec.accept(templater)
+    assert templater.instantiations == {"first": 1, "second": 2, "total": 3}
+
+
+def test_plan_written_order():
+    templates = [
+        TemplateValueNode("b", "a + 1"),
+        TemplateValueNode("a", "b + 1"),
+        TemplateValueNode("c", "1"),
+    ]
+    # cycles are left as written, to fail when they're evaluated
+    assert names(TemplatePlan(templates).order) == ["b", "a", "c"]
+
+    templates = [
+        TemplateValueNode("a", "[i for i in range(b)]"),
+        TemplateValueNode("b", "2"),
+        TemplateValueNode("c", "random.randint(1, 2)"),
+        TemplateValueNode("a", "1"),
+    ]
+    # redefined templates are left as written
+    assert names(TemplatePlan(templates).order) == ["a", "b", "c", "a"]
+    assert names(TemplatePlan(templates[:3]).order) == ["b", "a", "c"]
+
+
+def test_compile_once():
+    compile_definition.cache_clear()
+
+    templater = TemplaterVisitor()
+    for _ in range(3):
+        templater.evaluate("value", "1 + 2")
+    assert compile_definition.cache_info().misses == 1
+
+    literal = LiteralStatementNode("puts(value);")
+    assert templater.visit_literal_stmt(literal).content == "puts(value);"
+
+
+def test_lazy():
+    stream = SPEC + "template <unused; string.ascii_lowercase[first]>\n"
+    spec = Parser(RegexLexer(stream).tokens()).parse()
+
+    templater = TemplaterVisitor()
+    spec.accept(templater)
+
+    templates = templater.instantiations
+    assert "unused" in templates
+    assert templates.evaluated == {"first": 1, "second": 2, "total": 3}
+
+    # evaluated on first use, and then kept
+    assert templates["unused"] == "b"
+    assert dict(templates) == {"first": 1, "second": 2, "total": 3, "unused": "b"}
+
+
+def test_random_eager():
+    stream = SPEC + "template <unused; random.random()>\n"
+    spec = Parser(RegexLexer(stream).tokens()).parse()
+
+    random.seed(0)
+    expected = random.random()
+
+    random.seed(0)
+    templater = TemplaterVisitor()
+    spec.accept(templater)
+    random.random()
+
+    # drawn when defined, not when first used
+    assert templater.instantiations.evaluated["unused"] == expected
+
+
+def test_lazy_redefined():
+    stream = """
+    template <a; 1>
+    template <b; a + 1>
+
+    chunk x : int = <a; 5>, y : int = <b>
+    """
+    spec = Parser(RegexLexer(stream).tokens()).parse()
+
+    templater = TemplaterVisitor()
+    spec.accept(templater)
+
+    # b still sees the value that a had when b was defined
+    assert dict(templater.instantiations) == {"a": 5, "b": 2}
+    assert spec.chunks[0].variables[1].initial.value == 2
+
+
+def test_lazy_errors():
+    templates = Templates({"given": 1})
+    templates.define("loop", "loop + 1")
+    templates.define("given", "2")
+
+    assert templates["given"] == 2
+    with pytest.raises(NameError):
+        templates.resolve()
+    with pytest.raises(KeyError):
+        templates["missing"]  # pylint: disable=pointless-statement
@@ -0,0 +1,217 @@
+import itertools
+import json
+import threading
+
+from vulnspec.builtins import (
+    BUILTINS_PATH,
+    MetaTypes,
+    Names,
+    Store,
+    Table,
+    builtins_store,
+    functions,
+    load_namespaces,
+    types,
+    variables,
+)
+from vulnspec.node import (
+    ArrayTypeNode,
+    FuncTypeNode,
+    IntValueNode,
+    MetaTypeNode,
+    PointerTypeNode,
+    SimpleTypeNode,
+    TemplateValueNode,
+    intern_type,
+    type_check,
+)
+from vulnspec.node.types import _CANONICAL, _INTERNED, metatype_is_reachable
+from vulnspec.passes.typer import decode_type, parse_typestring
+
+
+def search(start, destination):
+    seen = {start}
+    stack = [start]
+    while stack:
+        for conn in types.META_GRAPH[stack.pop()]:
+            if conn not in seen:
+                seen.add(conn)
+                stack.append(conn)
+    return destination in seen
+
+
+def test_reachable_matches_graph():
+    for start, destination in itertools.product(types.METAS, repeat=2):
+        expected = search(start, destination)
+        assert metatype_is_reachable(start, destination) == expected
+
+
+def test_reachable():
+    assert metatype_is_reachable(MetaTypes.Integral, MetaTypes.Floating)
+    assert metatype_is_reachable(MetaTypes.Boolean, MetaTypes.Complex)
+    assert not metatype_is_reachable(MetaTypes.Floating, MetaTypes.Integral)
+    assert not metatype_is_reachable(MetaTypes.Void, MetaTypes.Pointer)
+
+
+def test_reachable_universal():
+    for meta in types.METAS:
+        assert metatype_is_reachable(meta, MetaTypes.Universal)
+        assert metatype_is_reachable(MetaTypes.Universal, meta)
+
+
+def test_intern_type():
+    char_pointer = intern_type(PointerTypeNode(SimpleTypeNode("char")))
+    assert intern_type(PointerTypeNode(SimpleTypeNode("char"))) is char_pointer
+    assert intern_type(char_pointer) is char_pointer
+    assert char_pointer.base is intern_type(SimpleTypeNode("char"))
+
+    assert intern_type(SimpleTypeNode("int")) is not intern_type(
+        MetaTypeNode(MetaTypes.Integral)
+    )
+    assert intern_type(SimpleTypeNode("int")) is not intern_type(
+        SimpleTypeNode("int@libc.stdio")
+    )
+
+    array = ArrayTypeNode(SimpleTypeNode("int"), IntValueNode(4, 10))
+    assert intern_type(array) is intern_type(
+        ArrayTypeNode(SimpleTypeNode("int"), IntValueNode(4, 10))
+    )
+    assert intern_type(array) is not intern_type(
+        ArrayTypeNode(SimpleTypeNode("int"), IntValueNode(8, 10))
+    )
+
+    func = FuncTypeNode(SimpleTypeNode("int"), [char_pointer], variadic=True)
+    assert intern_type(func) is intern_type(
+        FuncTypeNode(SimpleTypeNode("int"), [char_pointer], variadic=True)
+    )
+    assert intern_type(func) is not intern_type(
+        FuncTypeNode(SimpleTypeNode("int"), [char_pointer])
+    )
+
+
+def test_intern_type_copies():
+    node = SimpleTypeNode("int")
+    assert intern_type(node) is not node
+
+    size = IntValueNode(16, 10)
+    size.token_start = size.token_end = object()
+    canonical = intern_type(ArrayTypeNode(SimpleTypeNode("char"), size))
+    assert canonical.size is not size
+    assert canonical.size.value == 16
+    assert canonical.size.token_start is None
+
+
+def test_intern_type_uninstantiated():
+    before = len(_INTERNED), len(_CANONICAL)
+
+    array = ArrayTypeNode(SimpleTypeNode("int"), TemplateValueNode("n", None))
+    pointer = PointerTypeNode(array)
+    func = FuncTypeNode(SimpleTypeNode("int"), [pointer])
+    for tp in (array, pointer, func):
+        assert intern_type(tp) is tp
+        assert type_check(tp, tp)
+
+    assert (len(_INTERNED), len(_CANONICAL)) == before
+
+
+def test_type_check_interned():
+    integral = intern_type(MetaTypeNode(MetaTypes.Integral))
+    for _ in range(2):
+        assert type_check(intern_type(SimpleTypeNode("int")), integral)
+        assert type_check(intern_type(SimpleTypeNode("double")), integral)
+        assert not type_check(integral, intern_type(SimpleTypeNode("double")))
+        assert not type_check(
+            intern_type(PointerTypeNode(SimpleTypeNode("char"))),
+            intern_type(PointerTypeNode(SimpleTypeNode("int"))),
+        )
+
+
+def test_parsed_builtins():
+    for parsed, typestrings, name in [
+        (functions.PARSED, functions.SIGNATURES, "printf@libc.stdio"),
+        (functions.PARSED, functions.SIGNATURES, "memcpy@libc.string"),
+        (variables.PARSED, variables.TYPES, "daylight@libc.time"),
+    ]:
+        encoded = parsed.get(name)
+        assert encoded is not None
+        assert decode_type(encoded) is parse_typestring(typestrings[name])
+
+    # each kind only has its own builtins
+    assert "daylight@libc.time" not in functions.PARSED
+    assert "printf@libc.stdio" not in variables.PARSED
+
+
+def test_meta_types():
+    for name in vars(MetaTypes):
+        if not name.startswith("_") and name != "Universal":
+            assert types.meta(getattr(MetaTypes, name))
+
+
+def test_builtins_lookup():
+    assert functions.TRANSLATIONS["printf@libc.stdio"] == "printf"
+    assert functions.TRANSLATIONS.get("printf") is None
+    assert "printf@libc.stdio" in functions.SIGNATURES
+    assert "printf" not in functions.SIGNATURES
+    assert len(functions.PATHS) == len(list(functions.PATHS))
+
+    assert "printf" in functions.CLAIMED
+    assert "printf" not in variables.CLAIMED
+    assert "int" in types.CLAIMED
+
+
+def test_builtins_iterate(monkeypatch):
+    table = Table(builtins_store, "functions_paths")
+    queries = []
+    entries = builtins_store.entries
+    monkeypatch.setattr(
+        builtins_store, "entries", lambda name: queries.append(name) or entries(name)
+    )
+
+    assert len(table) == len(list(table)) == len(functions.PATHS)
+    assert table["printf@libc.stdio"] == functions.PATHS["printf@libc.stdio"]
+    assert queries == ["functions_paths"]
+
+
+def test_builtins_threads():
+    store = Store(BUILTINS_PATH / "builtins.db")
+    table = Table(store, "functions_paths")
+    names = Names(store, "functions_claimed")
+    expected = dict(functions.PATHS)
+    claimed = ["printf", "memcpy", "not_a_builtin"]
+
+    errors = []
+
+    def lookup(offset):
+        try:
+            for name in list(expected)[offset::8]:
+                assert table[name] == expected[name]
+            for name in claimed:
+                assert (name in names) == (name in functions.CLAIMED)
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+
+    threads = [threading.Thread(target=lookup, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert dict(table) == expected
+
+
+def test_builtins_store():
+    # the database is built from the JSON files, and must match them
+    for builtins, kind in [(functions, "functions"), (variables, "variables")]:
+        with (BUILTINS_PATH / f"{kind}.json").open() as f:
+            data = json.load(f)
+        assert dict(builtins.TRANSLATIONS) == data["translations"]
+        assert dict(builtins.PARSED) == data["parsed"]
+
+
+def test_builtins_namespaces():
+    load_namespaces(["libc.string", "libc.missing"])
+    assert functions.TRANSLATIONS["memcpy@libc.string"] == "memcpy"
+    assert "printf@libc.string" not in functions.TRANSLATIONS
+    assert "memcpy@libc.missing" not in functions.TRANSLATIONS
+    assert types.TRANSLATIONS["int"] == "int"
@@ -0,0 +1,32 @@
+import argparse
+
+from . import (
+    expressions,
+    frontend,
+    incremental,
+    markov,
+    nodes,
+    startup,
+    templates,
+    typecheck,
+)
+
+BENCHMARKS = {
+    "expressions": expressions.run,
+    "frontend": frontend.run,
+    "incremental": incremental.run,
+    "markov": markov.run,
+    "nodes": nodes.run,
+    "startup": startup.run,
+    "templates": templates.run,
+    "typecheck": typecheck.run,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("benchmark", choices=BENCHMARKS.keys())
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.repeat)
@@ -0,0 +1,78 @@
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from vulnspec.node import SpecNode
+from vulnspec.parser import Parser, RegexLexer
+
+EXAMPLES_DIRECTORY = Path(__file__).parent.parent.parent / "examples"
+
+
+def protostar() -> Dict[str, str]:
+    return {
+        path.stem: path.read_text()
+        for path in sorted((EXAMPLES_DIRECTORY / "protostar").glob("**/*.txt"))
+    }
+
+
+def synthetic(statements: int = 10000, depth: int = 2, seed: int = 0) -> str:
+    """
+    Generate a large, but otherwise unremarkable, specification.
+
+    The statements are a mix of assignments, calls, conditionals and loops
+    over a small set of variables, roughly in the proportions found in the
+    example specifications, with expressions nested up to the given depth.
+    """
+
+    rng = random.Random(seed)
+    variables = [f"v{i}" for i in range(16)]
+
+    def expression(level: int = 0) -> str:
+        choice = rng.random()
+        if level > depth or choice < 0.3:
+            return rng.choice(variables)
+        if choice < 0.5:
+            return str(rng.randint(0, 1000))
+        if choice < 0.6:
+            return f"({expression(level + 1)})"
+        op = rng.choice(["+", "-", "*", "/", "&", "|", "^"])
+        return f"{expression(level + 1)} {op} {expression(level + 1)}"
+
+    def statement() -> List[str]:
+        choice = rng.random()
+        if choice < 0.6:
+            return [f"{rng.choice(variables)} = {expression()}"]
+        if choice < 0.8:
+            return [f'printf@libc.stdio("%d\\n", {expression()})']
+        if choice < 0.9:
+            header = f"if {expression()} < {expression()} {{"
+        else:
+            header = f"while {rng.choice(variables)} > 0 {{"
+        return [header, f"    {rng.choice(variables)} = 0", "}"]
+
+    lines = []
+    lines.append("chunk " + ", ".join(f"{var}: int = 0" for var in variables))
+    lines.append("block main {")
+    for _ in range(statements):
+        lines.extend(f"    {line}" for line in statement())
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def parse(stream: str) -> SpecNode:
+    return Parser(RegexLexer(stream).tokens()).parse()
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """
+    Time a function, taking the best of a number of runs, in milliseconds.
+    """
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings) * 1000
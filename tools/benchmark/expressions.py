@@ -0,0 +1,44 @@
+import sys
+from functools import partial
+from typing import Any
+
+from .corpus import measure, parse, protostar, synthetic
+
+
+def run(repeat: int):
+    corpus = {f"protostar/{name}": stream for name, stream in protostar().items()}
+    corpus["synthetic-2k-deep"] = synthetic(2000, depth=6)
+
+    print(f"{'spec':<24} {'parse ms':>10} {'calls':>10} {'max depth':>10}")
+    for name, stream in corpus.items():
+        elapsed = measure(partial(parse, stream), repeat)
+        calls, depth = profile(stream)
+        print(f"{name:<24} {elapsed:>10.2f} {calls:>10} {depth:>10}")
+
+
+def profile(stream: str):
+    """
+    Count the number of python function calls made while parsing, and the
+    deepest the stack gets.
+    """
+
+    calls = 0
+    depth = 0
+    max_depth = 0
+
+    def tracer(_frame: Any, event: str, _arg: Any):
+        nonlocal calls, depth, max_depth
+        if event == "call":
+            calls += 1
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif event == "return":
+            depth -= 1
+
+    sys.setprofile(tracer)
+    try:
+        parse(stream)
+    finally:
+        sys.setprofile(None)
+
+    return calls, max_depth
@@ -0,0 +1,53 @@
+from functools import partial
+from typing import List
+
+from vulnspec.node import SpecNode
+from vulnspec.passes import (
+    BlockifyVisitor,
+    ChunkifyVisitor,
+    FrontEndVisitor,
+    TemplaterVisitor,
+    TypeCheckVisitor,
+)
+
+from .corpus import measure, parse, protostar, synthetic
+
+
+def run(repeat: int):
+    corpus = {f"protostar/{name}": stream for name, stream in protostar().items()}
+    corpus["synthetic-10k"] = synthetic(10000)
+
+    print(f"{'spec':<24} {'separate ms':>12} {'fused ms':>10} {'speedup':>8}")
+    for name, stream in corpus.items():
+        # every pass rewrites the tree as it goes, so each run needs its own
+        separate = measure(partial(passes, trees(stream, repeat)), repeat)
+        fused = measure(partial(front_end, trees(stream, repeat)), repeat)
+        print(f"{name:<24} {separate:>12.2f} {fused:>10.2f} {separate / fused:>7.2f}x")
+
+
+def trees(stream: str, count: int) -> List[SpecNode]:
+    return [parse(stream) for _ in range(count)]
+
+
+def passes(specs: List[SpecNode]):
+    spec = specs.pop()
+    spec.accept(TemplaterVisitor())
+
+    type_visitor = TypeCheckVisitor()
+    spec.accept(type_visitor)
+
+    chunk_visitor = ChunkifyVisitor()
+    spec.accept(chunk_visitor)
+
+    block_visitor = BlockifyVisitor(
+        chunk_visitor.chunks, chunk_visitor.extern, type_visitor.types
+    )
+    spec.accept(block_visitor)
+    block_visitor.result()
+
+
+def front_end(specs: List[SpecNode]):
+    spec = specs.pop()
+    visitor = FrontEndVisitor()
+    spec.accept(visitor)
+    visitor.result()
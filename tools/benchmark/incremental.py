@@ -0,0 +1,59 @@
+import random
+from functools import partial
+from typing import Callable, Dict
+
+from vulnspec.parser import IncrementalParser
+
+from .corpus import measure, parse
+
+
+def run(repeat: int):
+    stream = blocks(2000)
+    middle = stream.index("block b1000 {")
+
+    edits: Dict[str, Callable[[str], str]] = {
+        "in-block": lambda s: s.replace("v0 = 1", "v0 = 12345", 1),
+        "new block": lambda s: s[:middle]
+        + "block extra {\n    v1 = 2\n}\n"
+        + s[middle:],
+        "rename": lambda s: s.replace("block b1000 {", "block renamed {", 1),
+        "append": lambda s: s + "block last {\n    v2 = 3\n}\n",
+    }
+
+    print(f"{'edit':<12} {'full ms':>10} {'incremental ms':>16}")
+    for name, edit in edits.items():
+        edited = edit(stream)
+        full = measure(partial(parse, edited), repeat)
+
+        front = IncrementalParser(stream)
+        front.spec  # pylint: disable=pointless-statement
+        # each run applies the edit and then undoes it again
+        incremental = measure(partial(toggle, front, stream, edited), repeat) / 2
+        print(f"{name:<12} {full:>10.2f} {incremental:>16.3f}")
+
+
+def toggle(front: IncrementalParser, stream: str, edited: str):
+    front.update(edited)
+    front.update(stream)
+
+
+def blocks(count: int, seed: int = 0) -> str:
+    """
+    Generate a specification made up of many small blocks, as a stand-in for
+    a large specification being edited one block at a time.
+    """
+
+    rng = random.Random(seed)
+
+    lines = ["chunk " + ", ".join(f"v{i}: int = 0" for i in range(4))]
+    for i in range(count):
+        lines.append(f"block b{i} {{")
+        for _ in range(rng.randint(3, 8)):
+            lines.append(f"    v{rng.randrange(4)} = v{rng.randrange(4)} + 1")
+        if i == count // 2:
+            lines.append("    v0 = 1")
+        if i + 1 < count:
+            lines.append(f"    call b{i + 1}")
+        lines.append("}")
+    lines.append("block main {\n    call b0\n}")
+    return "\n".join(lines) + "\n"
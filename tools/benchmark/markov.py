@@ -0,0 +1,95 @@
+import random
+import tracemalloc
+from functools import partial
+from pathlib import Path
+from typing import Optional
+
+from vulnspec.common.data import data_path
+from vulnspec.markov import NAME_SIZES, Endings, LengthSampler, MarkovLoader, Models
+
+from .corpus import measure
+
+FORMATS = {
+    "json": None,
+    "compiled": data_path("markov.bin"),
+}
+
+
+def run(repeat: int):
+    print(f"{'format':<10} {'load ms':>10} {'memory KiB':>11} {'loader ms':>10}")
+    for name, compiled in FORMATS.items():
+        cold = measure(partial(load, compiled), repeat)
+        memory = allocated(compiled)
+
+        store = Models(data_path("markov.json"), compiled)
+        store.get("funcs")
+        warm = measure(partial(loader, store), repeat)
+        print(f"{name:<10} {cold:>10.2f} {memory / 1024:>11.0f} {warm:>10.2f}")
+    print()
+
+    store = Models(data_path("markov.json"), data_path("markov.bin"))
+
+    # rejecting names of the wrong length, against only generating the right
+    # lengths to begin with (excluded names are never generated either way)
+    print(
+        f"{'model':<8} {'size':>8} {'fits':>5} {'names':>8} {'rejecting ms':>13} "
+        f"{'rejected':>9} {'sampling ms':>12} {'rejected':>9}"
+    )
+    for name, size in NAME_SIZES.items():
+        markov = store.get(name)
+        # only the models that are sampled have their endings compiled
+        endings = markov.endings or Endings.compute(markov, size[1])
+        fits = LengthSampler(markov, endings, *size).probability()
+        for count in (20, 1000):
+            results = []
+            for sampling in (False, True):
+                results.append(
+                    measure(
+                        partial(generate, store, name, size, count, sampling), repeat
+                    )
+                )
+                results.append(generate(store, name, size, count, sampling))
+            print(
+                f"{name:<8} {str(size):>8} {fits:>5.2f} {count:>8} {results[0]:>13.2f} "
+                f"{results[1]:>9} {results[2]:>12.2f} {results[3]:>9}"
+            )
+
+
+def load(compiled: Optional[Path]):
+    """
+    Load the models, as if for the first time in a new process.
+    """
+
+    Models(data_path("markov.json"), compiled).get("funcs")
+
+
+def allocated(compiled: Optional[Path]) -> int:
+    """
+    Measure the memory allocated by loading the models (which doesn't include
+    any pages that are mapped from a file).
+    """
+
+    tracemalloc.start()
+    try:
+        store = Models(data_path("markov.json"), compiled)
+        store.get("funcs")
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return memory
+
+
+def loader(store: Models):
+    mloader = MarkovLoader(exclude=None, store=store)
+    mloader.model("funcs", (3, 12))
+    mloader.model("vars", (1, 12))
+
+
+def generate(store: Models, name: str, size, count: int, sampling: bool) -> int:
+    random.seed(0)
+    model = MarkovLoader(exclude=None, store=store).model(name, size)
+    if not sampling:
+        model.sampler = None
+    model.generate_batch(count)
+    return model.rejected
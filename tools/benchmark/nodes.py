@@ -0,0 +1,71 @@
+import sys
+import tracemalloc
+from functools import partial
+from typing import Iterator
+
+from vulnspec.node import MapVisitor, TraversalVisitor
+from vulnspec.node.base import Node
+
+from .corpus import measure, parse, protostar, synthetic
+
+
+def run(repeat: int):
+    corpus = {f"protostar/{name}": stream for name, stream in protostar().items()}
+    corpus["synthetic-10k"] = synthetic(10000)
+
+    print(
+        f"{'spec':<24} {'nodes':>8} {'node KiB':>10} {'tree KiB':>10} "
+        f"{'traverse ms':>12} {'map ms':>8}"
+    )
+    for name, stream in corpus.items():
+        tracemalloc.start()
+        spec = parse(stream)
+        tree_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        nodes = list(walk(spec))
+        node_size = sum(sizeof(node) for node in nodes)
+
+        traverse = measure(partial(spec.accept, TraversalVisitor()), repeat)
+        remap = measure(partial(spec.accept, MapVisitor()), repeat)
+
+        print(
+            f"{name:<24} {len(nodes):>8} {node_size / 1024:>10.1f} "
+            f"{tree_size / 1024:>10.1f} {traverse:>12.2f} {remap:>8.2f}"
+        )
+
+
+def walk(node: Node) -> Iterator[Node]:
+    """
+    Yield every node reachable from a root node.
+
+    This deliberately avoids the visitors, so that the nodes are found the same
+    way regardless of how they store their attributes.
+    """
+
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+
+        for value in attributes(current):
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, Node))
+
+
+def attributes(node: Node) -> Iterator[object]:
+    if hasattr(node, "__dict__"):
+        yield from vars(node).values()
+    for cls in type(node).__mro__:
+        for slot in getattr(cls, "__slots__", ()):
+            if hasattr(node, slot):
+                yield getattr(node, slot)
+
+
+def sizeof(node: Node) -> int:
+    size = sys.getsizeof(node)
+    if hasattr(node, "__dict__"):
+        size += sys.getsizeof(vars(node))
+    return size
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+from .corpus import EXAMPLES_DIRECTORY
+
+SCENARIOS = {
+    "import": "import vulnspec",
+    "lookup": (
+        "from vulnspec.builtins import functions, types\n"
+        "functions.TRANSLATIONS['printf@libc.stdio']\n"
+        "'printf' in functions.CLAIMED or 'printf' in types.CLAIMED"
+    ),
+    "synthesize": (
+        "import vulnspec\n"
+        f"spec = open({str(EXAMPLES_DIRECTORY / 'protostar' / 'stack' / 'stack0.txt')!r}).read()\n"
+        "asset, program = vulnspec.synthesize(spec, seed='0')\n"
+        "from vulnspec.graph import CodeGen\n"
+        "CodeGen(program).generate()"
+    ),
+}
+
+# run after each scenario in the same interpreter, to report how long it took
+# from interpreter start and how much memory it needed
+REPORT = """
+import resource, time
+print(time.perf_counter() - START)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def run(repeat: int):
+    print(f"{'scenario':<12} {'ms':>10} {'max rss KiB':>14}")
+    for name, scenario in SCENARIOS.items():
+        source = "import time\nSTART = time.perf_counter()\n" + scenario + REPORT
+
+        results = []
+        for _ in range(repeat):
+            proc = subprocess.run(
+                [sys.executable, "-c", source],
+                stdout=subprocess.PIPE,
+                check=True,
+                text=True,
+            )
+            timing, usage = proc.stdout.split()[-2:]
+            results.append((float(timing) * 1000, int(usage)))
+
+        elapsed = min(result[0] for result in results)
+        rss = min(result[1] for result in results)
+        print(f"{name:<12} {elapsed:>10.2f} {rss:>14}")
@@ -0,0 +1,75 @@
+import random
+from functools import partial
+from typing import List
+
+from vulnspec.node import SpecNode
+from vulnspec.parser import Lexer, RegexLexer
+from vulnspec.passes import TemplaterVisitor
+
+from .corpus import EXAMPLES_DIRECTORY, measure, parse, protostar
+
+
+def run(repeat: int):
+    corpus = {f"protostar/{name}": stream for name, stream in protostar().items()}
+    for path in sorted((EXAMPLES_DIRECTORY / "server" / "challenges").glob("*.spec")):
+        corpus[f"challenges/{path.stem}"] = path.read_text()
+    corpus["comparisons-10k"] = comparisons(10000)
+
+    print(
+        f"{'spec':<24} {'<s':>8} {'scan ms':>10} {'Lexer ms':>10} "
+        f"{'RegexLexer ms':>14} {'instantiate ms':>15}"
+    )
+    for name, stream in corpus.items():
+        starts = [i for i, ch in enumerate(stream) if ch == "<"]
+        scanning = measure(partial(scan, stream, starts), repeat)
+        lexer = measure(partial(lex, Lexer, stream), repeat)
+        regex_lexer = measure(partial(lex, RegexLexer, stream), repeat)
+        specs = [parse(stream) for _ in range(repeat)]
+        instantiating = measure(partial(instantiate, specs), repeat)
+        print(
+            f"{name:<24} {len(starts):>8} {scanning:>10.2f} {lexer:>10.2f} "
+            f"{regex_lexer:>14.2f} {instantiating:>15.2f}"
+        )
+
+
+def lex(lexer, stream: str):
+    for _ in lexer(stream).tokens():
+        pass
+
+
+def instantiate(specs: List[SpecNode]):
+    # templates are instantiated in place, so each run needs its own tree
+    specs.pop().accept(TemplaterVisitor({"seed": 0}))
+
+
+def scan(stream: str, starts: List[int]):
+    """
+    Attempt to read a template at each of the given positions, isolating the
+    cost of template recognition from the rest of the lexer.
+    """
+
+    lexer = Lexer(stream)
+    for start in starts:
+        lexer.n = start
+        lexer.ch = stream[start]
+        lexer._try_read_template()  # pylint: disable=protected-access
+
+
+def comparisons(statements: int, seed: int = 0) -> str:
+    """
+    Generate a specification full of comparisons, some against templates,
+    so that most "<"s are not the start of a template.
+    """
+
+    rng = random.Random(seed)
+
+    lines = ["template <flagtlen; random.randint(8, 32)>"]
+    lines.append("chunk i: int = 0, n: int = <n; random.randint(4, 16)>")
+    lines.append("block main {")
+    for _ in range(statements):
+        rhs = rng.choice(["n", "<n>", "i + 1", "<flagtlen>", "n * 2"])
+        lines.append(f"    if i < {rhs} && n <= i {{")
+        lines.append("        i = i + 1")
+        lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+import itertools
+import random
+from functools import partial
+
+from vulnspec.builtins import types
+from vulnspec.node import SpecNode
+from vulnspec.node import types as node_types
+from vulnspec.passes import TemplaterVisitor, TypeCheckVisitor, typer
+
+from .corpus import measure, parse, protostar
+
+
+def run(repeat: int):
+    corpus = {f"protostar/{name}": stream for name, stream in protostar().items()}
+    corpus["arguments-5k"] = arguments(5000)
+
+    # count how often the metatypes are compared, by wrapping the function
+    # that type_check calls
+    calls = 0
+    reachable = node_types.metatype_is_reachable
+
+    def counted(*args):
+        nonlocal calls
+        calls += 1
+        return reachable(*args)
+
+    print(f"{'spec':<24} {'meta checks':>12} {'type check ms':>14} {'cold ms':>8}")
+    for name, stream in corpus.items():
+        spec = parse(stream)
+        spec.accept(TemplaterVisitor())
+
+        calls = 0
+        node_types.metatype_is_reachable = counted
+        try:
+            spec.accept(TypeCheckVisitor())
+        finally:
+            node_types.metatype_is_reachable = reachable
+
+        checking = measure(partial(check, spec), repeat)
+        cold = measure(partial(cold_check, spec), repeat)
+        print(f"{name:<24} {calls:>12} {checking:>14.2f} {cold:>8.2f}")
+
+    pairs = list(itertools.product([*types.METAS, "universal"], repeat=2))
+    lookups = measure(partial(lookup, pairs, 10000), repeat)
+    print()
+    print(f"{len(pairs) * 10000} metatype lookups: {lookups:.2f}ms")
+
+
+def check(spec: SpecNode):
+    spec.accept(TypeCheckVisitor())
+
+
+def cold_check(spec: SpecNode):
+    """
+    Type check, as if for the first time in a new process.
+    """
+
+    typer.parse_typestring.cache_clear()
+    typer.builtin_variable_type.cache_clear()
+    typer.builtin_function_type.cache_clear()
+    check(spec)
+
+
+def lookup(pairs, count: int):
+    reachable = node_types.metatype_is_reachable
+    for _ in range(count):
+        for start, destination in pairs:
+            reachable(start, destination)
+
+
+def arguments(calls: int, seed: int = 0) -> str:
+    """
+    Generate a specification made up of calls with many arguments of mixed
+    types, so that almost every argument needs its metatypes comparing.
+    """
+
+    rng = random.Random(seed)
+    variables = {
+        "c": "char",
+        "i": "int",
+        "u": "unsigned",
+        "l": "long",
+        "f": "float",
+        "d": "double",
+        "b": "bool",
+    }
+
+    lines = ["chunk " + ", ".join(f"{var}: {tp}" for var, tp in variables.items())]
+    lines.append("block main {")
+    for _ in range(calls):
+        args = [rng.choice(list(variables)) for _ in range(rng.randint(2, 8))]
+        fmt = " ".join("%d" for _ in args)
+        lines.append(f'    printf@libc.stdio("{fmt}", {", ".join(args)})')
+        lhs = rng.choice(["f", "d"])
+        rhs = rng.choice(list(variables))
+        lines.append(f"    {lhs} = fabs@libc.math({rhs}) + {lhs}")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
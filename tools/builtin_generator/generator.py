@@ -6,6 +6,8 @@ from typing import Any, Collection, Dict, List, Tuple
 import yaml
 
 from .library import Library
+from .signatures import encode_types
+from .store import build_store
 from .tags import Tag, TagKind
 from .translate import translate_type, translate_types
 
@@ -36,6 +38,8 @@ def main():
         with path.open("w") as f:
             json.dump(generator(), f, indent=4)
 
+    build_store(root)
+
 
 class Generator:
     def __init__(self, config: Dict[str, Any], build=True):
@@ -74,7 +78,7 @@ class Generator:
         tags = self._extract_tags(
             (TagKind.UNION, TagKind.STRUCT, TagKind.ENUM, TagKind.TYPEDEF)
         )
-        for (tag, lib) in tags:
+        for tag, lib in tags:
             name = f"{tag.name}@{lib.name}.{tag.shortpath}"
             paths[name] = tag.path
             if tag.kind in (TagKind.UNION, TagKind.STRUCT, TagKind.ENUM):
@@ -100,7 +104,7 @@ class Generator:
         signatures = {}
 
         tags = self._extract_tags((TagKind.FUNCTION, TagKind.PROTOTYPE))
-        for (tag, lib) in tags:
+        for tag, lib in tags:
             name = f"{tag.name}@{lib.name}.{tag.shortpath}"
 
             paths[name] = tag.path
@@ -113,6 +117,7 @@ class Generator:
         return {
             "translations": translations,
             "signatures": signatures,
+            "parsed": encode_types(signatures),
             "paths": paths,
         }
 
@@ -122,7 +127,7 @@ class Generator:
         types = {}
 
         tags = self._extract_tags((TagKind.VARIABLE, TagKind.EXTERN))
-        for (tag, lib) in tags:
+        for tag, lib in tags:
             name = f"{tag.name}@{lib.name}.{tag.shortpath}"
 
             paths[name] = tag.path
@@ -133,6 +138,7 @@ class Generator:
         return {
             "translations": translations,
             "types": types,
+            "parsed": encode_types(types),
             "paths": paths,
         }
 
@@ -148,7 +154,7 @@ class Generator:
         type_tags = self._extract_tags(
             (TagKind.UNION, TagKind.STRUCT, TagKind.ENUM, TagKind.TYPEDEF)
         )
-        for (tag, lib) in type_tags:
+        for tag, lib in type_tags:
             if tag.kind in (TagKind.UNION, TagKind.STRUCT, TagKind.ENUM):
                 original = f"{tag.kind.value} {tag.name}"
             else:
@@ -198,7 +204,7 @@ class Generator:
 
         types = []
         for kind in kinds:
-            for (tag, lib) in self.buckets[kind]:
+            for tag, lib in self.buckets[kind]:
                 types.append((tag, lib))
 
         return types
@@ -0,0 +1,77 @@
+from typing import Dict, List, Optional
+
+from vulnspec.node import (
+    ArrayTypeNode,
+    FuncTypeNode,
+    IntValueNode,
+    MetaTypeNode,
+    PointerTypeNode,
+    SimpleTypeNode,
+    TypeNode,
+)
+from vulnspec.parser import LexError, ParseError, Parser, RegexLexer
+
+# Pre-parsed versions of the typestrings used by the builtins, so that
+# vulnspec never has to lex and parse them at runtime.
+#
+# These are written alongside the typestrings, as "parsed" in functions.json
+# and variables.json, for every typestring that can be parsed.
+#
+# Each type is encoded in prefix order, as a space separated list of parts,
+# where each part is a single letter tag, followed by some data:
+#   s<core>                     simple type
+#   m<metatype>                 meta type
+#   p <base>                    pointer
+#   a[size] <base>              array, with an optional size
+#   f<argc>[v] <ret> <args...>  function, with a "v" if variadic
+#
+# See vulnspec.passes.typer.decode_type for the other half of this.
+
+
+def encode_types(typestrings: Dict[str, str]) -> Dict[str, str]:
+    encoded = {}
+    for name, typestr in typestrings.items():
+        result = encode_typestring(typestr)
+        if result is not None:
+            encoded[name] = result
+
+    return encoded
+
+
+def encode_typestring(typestr: str) -> Optional[str]:
+    try:
+        parser = Parser(RegexLexer(typestr).tokens())
+        parser.advance()
+        tp = parser.declaration_type()
+    except (LexError, ParseError):
+        # leave these to be parsed (and rejected) at runtime as before
+        return None
+
+    parts: List[str] = []
+    encode_type(tp, parts)
+    return " ".join(parts)
+
+
+def encode_type(tp: TypeNode, parts: List[str]):
+    if isinstance(tp, SimpleTypeNode):
+        parts.append(f"s{tp.core}")
+    elif isinstance(tp, MetaTypeNode):
+        parts.append(f"m{tp.core}")
+    elif isinstance(tp, PointerTypeNode):
+        parts.append("p")
+        encode_type(tp.base, parts)
+    elif isinstance(tp, ArrayTypeNode):
+        if tp.size is None:
+            parts.append("a")
+        elif isinstance(tp.size, IntValueNode):
+            parts.append(f"a{tp.size.value}")
+        else:
+            raise ValueError("builtin array sizes cannot be templates")
+        encode_type(tp.base, parts)
+    elif isinstance(tp, FuncTypeNode):
+        parts.append(f"f{len(tp.args)}{'v' if tp.variadic else ''}")
+        encode_type(tp.ret, parts)
+        for arg in tp.args:
+            encode_type(arg, parts)
+    else:
+        raise RuntimeError()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict
+
+# The builtins are stored in a single sqlite database, so that vulnspec can
+# look up the handful of builtins that a specification uses without loading
+# all of them. It's built from the JSON files, which remain the source of
+# truth, and must be rebuilt whenever they change.
+#
+# Each field of each kind of builtin (e.g. "functions" and "translations") is
+# stored in its own table, named "<kind>_<field>", depending on its type:
+#   mappings of names to strings    (namespace TEXT PRIMARY KEY, entries TEXT)
+#   sets of names                   (name TEXT PRIMARY KEY)
+#   anything else                   a JSON row in the "json" table
+#
+# Mappings are sharded by the namespace of each name (e.g. "libc.stdio" for
+# "gets@libc.stdio", or "" for names without one), with all the entries of a
+# shard stored as a single JSON object, so that all the builtins from a single
+# library can be loaded at once, without a query for each one.
+#
+# See vulnspec.builtins for the other half of this.
+
+
+KINDS = ("types", "functions", "variables")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("directory", type=Path)
+    args = arg_parser.parse_args()
+
+    build_store(args.directory)
+
+
+def build_store(directory: Path):
+    builtins = {}
+    for kind in KINDS:
+        with (directory / f"{kind}.json").open() as f:
+            builtins[kind] = json.load(f)
+
+    # the claimed names are derived from the translations, rather than being
+    # computed on every import
+    types = builtins["types"]
+    types["claimed"] = {
+        part for tp in types["translations"].values() for part in tp.split()
+    }
+    for kind in ("functions", "variables"):
+        builtins[kind]["claimed"] = set(builtins[kind]["translations"].values())
+
+    write_store(directory / "builtins.db", builtins)
+
+
+def write_store(path: Path, builtins: Dict[str, Dict[str, Any]]):
+    if path.exists():
+        path.unlink()
+
+    with closing(sqlite3.connect(path)) as conn:
+        with conn:
+            conn.execute(
+                "CREATE TABLE json (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            for kind, fields in builtins.items():
+                for field, data in fields.items():
+                    write_field(conn, f"{kind}_{field}", data)
+
+        conn.execute("VACUUM")
+
+
+def write_field(conn: sqlite3.Connection, table: str, data: Any):
+    if isinstance(data, dict) and all(
+        isinstance(value, str) for value in data.values()
+    ):
+        shards: Dict[str, Dict[str, str]] = {}
+        for name, value in sorted(data.items()):
+            shards.setdefault(name.partition("@")[2], {})[name] = value
+
+        conn.execute(
+            f"CREATE TABLE {table} "
+            "(namespace TEXT PRIMARY KEY, entries TEXT NOT NULL)"
+        )
+        conn.executemany(
+            f"INSERT INTO {table} VALUES (?, ?)",
+            [(namespace, json.dumps(shard)) for namespace, shard in shards.items()],
+        )
+    elif isinstance(data, set):
+        conn.execute(f"CREATE TABLE {table} (name TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.executemany(
+            f"INSERT INTO {table} VALUES (?)", [(name,) for name in sorted(data)]
+        )
+    else:
+        conn.execute("INSERT INTO json VALUES (?, ?)", (table, json.dumps(data)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from vulnspec.markov import (
+    NAME_SIZES,
+    Endings,
+    LengthSampler,
+    Markov,
+    MultiMarkov,
+    Table,
+)
+
+# The compiled markov models are a JSON header describing every model, followed
+# by the cumulative probabilities of each table as a contiguous array of
+# doubles, so that vulnspec can mmap them instead of parsing them.
+#
+# The models that vulnspec samples by length also get their endings
+# precomputed, the probabilities that it uses to only generate names of the
+# right length. These are single precision floats, since they're only ever
+# compared against a random number, and are most of the file.
+#
+# See vulnspec.markov for the layout, and the other half of this.
+
+MAGIC = b"VSMARKOV"
+VERSION = 3
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+# the longest names that endings are precomputed for
+HORIZON = 12
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("source", type=Path)
+    arg_parser.add_argument("destination", type=Path)
+    args = arg_parser.parse_args()
+
+    with args.source.open() as f:
+        models = json.load(f)
+    write_compiled(args.destination, models)
+
+
+def write_compiled(path: Path, models: Dict[str, Dict[str, Any]]):
+    header: Dict[str, Dict[str, Any]] = {}
+    tables: List[array] = []
+    offset = 0
+    for name, model in models.items():
+        model = dict(model)
+        if model["mode"] == "single":
+            lookups = [model.pop("table")]
+        else:
+            lookups = model.pop("tables")
+
+        model["tables"] = []
+        for lookup in lookups:
+            table, probs = compile_table(lookup)
+            table["offset"] = offset
+            offset = align(offset + len(probs) * probs.itemsize)
+
+            model["tables"].append(table)
+            tables.append(probs)
+
+        compiled = compile_endings(name, model, lookups)
+        if compiled is not None:
+            endings, probs = compiled
+            endings["offset"] = offset
+            offset = align(offset + len(probs) * probs.itemsize)
+            model["endings"] = endings
+            tables.append(probs)
+
+        header[name] = model
+
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    preamble = PREAMBLE.pack(MAGIC, VERSION, len(encoded))
+    padding = align(len(preamble) + len(encoded)) - len(preamble) - len(encoded)
+
+    with path.open("wb") as f:
+        f.write(preamble)
+        f.write(encoded)
+        f.write(b"\0" * padding)
+        for probs in tables:
+            if sys.byteorder != "little":
+                probs.byteswap()
+            data = probs.tobytes()
+            f.write(data)
+            f.write(b"\0" * (align(len(data)) - len(data)))
+
+
+def compile_table(
+    lookup: Dict[str, List[Tuple[float, str]]],
+) -> Tuple[Dict[str, Any], array]:
+    prefixes: List[str] = []
+    starts: List[int] = [0]
+    chars: List[str] = []
+    probs = array("d")
+    for prefix, entries in lookup.items():
+        prefixes.append(prefix)
+        for prob, ch in entries:
+            if len(ch) != 1:
+                raise ValueError(f"expected a single character, not {ch!r}")
+            probs.append(prob)
+            chars.append(ch)
+        starts.append(len(probs))
+
+    table = {
+        "prefixes": prefixes,
+        "starts": starts,
+        "chars": "".join(chars),
+        "count": len(probs),
+    }
+    return table, probs
+
+
+def compile_endings(
+    name: str, model: Dict[str, Any], lookups: List[Dict[str, List[Tuple[float, str]]]]
+) -> Optional[Tuple[Dict[str, Any], array]]:
+    """
+    Precompute the endings of a model, or return None if vulnspec would never
+    use them, since it would reject names of the wrong length instead.
+    """
+
+    if name not in NAME_SIZES:
+        return None
+
+    tables = [Table.from_lookup(lookup) for lookup in lookups]
+    markov: Markov
+    if model["mode"] == "single":
+        markov = Markov(tables[0], model["size"], model["terminal"])
+    else:
+        markov = MultiMarkov(tables, model["max_size"], model["terminal"])
+
+    endings = Endings.compute(markov, HORIZON)
+    if not LengthSampler(markov, endings, *NAME_SIZES[name]).worthwhile():
+        return None
+
+    info = {
+        "states": endings.states,
+        "horizon": endings.horizon,
+        "count": len(endings.probs),
+    }
+    return info, array("f", endings.probs)
+
+
+def align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+if __name__ == "__main__":
+    main()
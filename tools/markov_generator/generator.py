@@ -8,6 +8,8 @@ from typing import Any, Dict, List, Set, Tuple
 from builtin_generator.library import Library
 from builtin_generator.tags import TagKind
 
+from .compiled import write_compiled
+
 INCLUDE_FILE = Path(__file__).parent / "markov.py"
 
 
@@ -15,6 +17,9 @@ def main():
     arg_parser = argparse.ArgumentParser()
     arg_parser.add_argument("library", type=Path)
     arg_parser.add_argument("--skip-build", dest="build", action="store_false")
+    arg_parser.add_argument(
+        "--compiled", type=Path, help="also write the compiled models to this path"
+    )
     args = arg_parser.parse_args()
 
     lib = Library("", args.library, ".", [])
@@ -44,6 +49,8 @@ def main():
 
     result = {name: table.dump_dict() for name, table in tables.items()}
     json.dump(result, sys.stdout, indent=4)
+    if args.compiled:
+        write_compiled(args.compiled, result)
 
 
 class Table:
@@ -1,6 +1,42 @@
-from .common.dump import DumpType
-from .common.error import SynthError
-from .config import Configuration
-from .parser import LexError, ParseError
-from .passes import ProcessingError
-from .vulnspec import gen_code, gen_solve, main, run_commands, synthesize
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# The exports are only imported when first used, so that subcommands which
+# don't need the whole pipeline (e.g. `vulnspec build`) start quickly.
+_EXPORTS = {
+    "SpecCache": ".cache",
+    "DumpType": ".common.dump",
+    "SynthError": ".common.error",
+    "Configuration": ".config",
+    "LexError": ".parser",
+    "ParseError": ".parser",
+    "ProcessingError": ".passes",
+    "gen_code": ".vulnspec",
+    "gen_solve": ".vulnspec",
+    "main": ".vulnspec",
+    "run_commands": ".vulnspec",
+    "synthesize": ".vulnspec",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+if TYPE_CHECKING:
+    from .cache import SpecCache
+    from .common.dump import DumpType
+    from .common.error import SynthError
+    from .config import Configuration
+    from .parser import LexError, ParseError
+    from .passes import ProcessingError
+    from .vulnspec import gen_code, gen_solve, main, run_commands, synthesize
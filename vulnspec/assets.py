@@ -1,20 +1,39 @@
+import random
+from contextlib import ExitStack, suppress
 from io import TextIOWrapper
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, TextIO, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Union,
+)
 
+from .builtins import load_namespaces
 from .common.dump import DumpType
-from .graph import Block, Chunk
-from .parser import Lexer, Parser
-from .parser.token import TokenType
+from .common.error import SynthError
+from .graph import Block, BlockItem, Call, Chunk
+from .node import BlockNode, SpecNode
+from .parser import LexError, ParseError, Parser, RegexLexer
+from .parser.token import Token, TokenType
 from .passes import (
     BlockifyVisitor,
     ChunkifyVisitor,
+    FrontEndVisitor,
     PrinterVisitor,
     TemplaterVisitor,
     TypeCheckVisitor,
     VisualizerVisitor,
 )
 
+if TYPE_CHECKING:
+    from .cache import SpecCache
+
 
 class Asset:
     def __init__(
@@ -24,6 +43,8 @@ class Asset:
         chunks: List[Chunk],
         extern: Chunk,
         includes: List[str],
+        *,
+        lazy: Optional["_LazyBodies"] = None,
     ):
         self.name = name
 
@@ -35,16 +56,32 @@ class Asset:
 
         self.attachments: Dict[str, Any] = {}
 
+        # bodies of blocks that are yet to be loaded, see resolve()
+        self._lazy = lazy
+
     @staticmethod
     def load(
         source: Union[str, TextIO, Path],
         external: bool = False,
         templates: Optional[Dict[str, Union[str, int, float, bool]]] = None,
         dump: Optional[Dict[DumpType, Optional[Path]]] = None,
+        cache: Optional["SpecCache"] = None,
+        *,
+        parsed: Optional[SpecNode] = None,
+        lazy: bool = False,
+        fused: bool = False,
     ) -> "Asset":
         if isinstance(source, str):
             return Asset._load(
-                "", source, external=external, templates=templates, dump=dump
+                "",
+                source,
+                external=external,
+                templates=templates,
+                dump=dump,
+                cache=cache,
+                parsed=parsed,
+                lazy=lazy,
+                fused=fused,
             )
         elif isinstance(source, Path):
             return Asset._load(
@@ -53,6 +90,10 @@ class Asset:
                 external=external,
                 templates=templates,
                 dump=dump,
+                cache=cache,
+                parsed=parsed,
+                lazy=lazy,
+                fused=fused,
             )
         elif isinstance(source, TextIOWrapper):
             return Asset._load(
@@ -61,6 +102,10 @@ class Asset:
                 external=external,
                 templates=templates,
                 dump=dump,
+                cache=cache,
+                parsed=parsed,
+                lazy=lazy,
+                fused=fused,
             )
         else:
             raise TypeError()
@@ -69,22 +114,32 @@ class Asset:
     def _load(
         name: str,
         stream: str,
+        *,
         external: bool = False,
         templates: Optional[Dict[str, Union[str, int, float, bool]]] = None,
         dump: Optional[Dict[DumpType, Optional[Path]]] = None,
+        cache: Optional["SpecCache"] = None,
+        parsed: Optional[SpecNode] = None,
+        lazy: bool = False,
+        fused: bool = False,
     ) -> "Asset":
-        lex = Lexer(stream)
-        tokens = lex.tokens_list()
-        if dump and (output := dump.get(DumpType.Tokens)):
-            with output.open("w") as f:
-                for token in tokens:
-                    if token.ttype in (TokenType.Newline, TokenType.EOF):
-                        print(token.show(), file=f)
-                    else:
-                        print(token.show(), end=", ", file=f)
-
-        parser = Parser(tokens)
-        spec = parser.parse()
+        # a tree that has already been parsed (such as by an incremental
+        # front end) is used as-is, and is modified by the passes below
+        spec = parsed
+        if lazy:
+            # lazily parsed trees are cheap to produce, and shouldn't be
+            # mixed up with fully parsed ones in the cache
+            cache = None
+        if spec is None and cache and not (dump and dump.get(DumpType.Tokens)):
+            spec = cache.load(stream)
+        if spec is None:
+            spec = Asset._parse(stream, dump, lazy)
+            if cache:
+                cache.store(stream, spec)
+
+        # fetch the builtins from every library the spec refers to in one go
+        load_namespaces(spec.symbols.namespaces())
+
         if dump and (output := dump.get(DumpType.AST)):
             with output.open("w") as f:
                 printer = PrinterVisitor(f)
@@ -94,6 +149,15 @@ class Asset:
                 visualizer = VisualizerVisitor(f)
                 spec.accept(visualizer)
 
+        if fused and not lazy:
+            asset = Asset._front_end(name, spec, external, templates)
+            if asset is not None:
+                return asset
+
+            # the separate passes report errors in a different order, so
+            # leave finding the right one to them, on the tree as it was
+            spec = Asset._parse(stream)
+
         template_visitor = TemplaterVisitor(templates)
         spec.accept(template_visitor)
 
@@ -105,20 +169,179 @@ class Asset:
         chunks = chunk_visitor.chunks
         extern = chunk_visitor.extern
 
-        block_visitor = BlockifyVisitor(chunks, extern)
+        block_visitor = BlockifyVisitor(chunks, extern, type_visitor.types)
         spec.accept(block_visitor)
         blocks = block_visitor.result()
 
-        asset = Asset(name, blocks, chunks, extern, spec.includes)
+        bodies = None
+        if lazy:
+            bodies = _LazyBodies(
+                stream, spec, template_visitor, type_visitor, block_visitor
+            )
+
+        asset = Asset(name, blocks, chunks, extern, spec.includes, lazy=bodies)
         asset.attachments["templates"] = template_visitor.instantiations
         return asset
 
+    @staticmethod
+    def _front_end(
+        name: str,
+        spec: SpecNode,
+        external: bool,
+        templates: Optional[Dict[str, Union[str, int, float, bool]]],
+    ) -> Optional["Asset"]:
+        """
+        Load an asset using the FrontEndVisitor, or return None if it raises a
+        SynthError - any other exception is a bug, and propagates as usual.
+
+        Anything the front end changes before failing (the random state, the
+        templates, or the tree itself) has to be undone before the separate
+        passes run, so that they fail in exactly the same way.
+        """
+
+        state = random.getstate()
+        front_end = FrontEndVisitor(
+            dict(templates) if templates else None, require_main=not external
+        )
+        try:
+            spec.accept(front_end)
+        except SynthError:
+            random.setstate(state)
+            return None
+
+        instantiations = front_end.templater.instantiations
+        if templates:
+            # like the TemplaterVisitor, fill in the given templates
+            templates.update(instantiations.evaluated)
+            instantiations.evaluated = templates
+
+        asset = Asset(
+            name, front_end.result(), front_end.chunks, front_end.extern, spec.includes
+        )
+        asset.attachments["templates"] = instantiations
+        return asset
+
+    def resolve(self, block: Block):
+        """
+        Finish loading a block, along with every block that it calls.
+
+        For assets loaded with lazy=True, the bodies of blocks are only
+        parsed, checked and blockified once they are needed - until then, they
+        have no statements.
+        """
+
+        if self._lazy is None or not self._lazy.nodes:
+            return
+
+        seen = set()
+        pending = [block]
+        while pending:
+            current = pending.pop()
+            if current.name in seen:
+                continue
+            seen.add(current.name)
+
+            node = self._lazy.nodes.pop(current.name, None)
+            if node is not None:
+                self._lazy.load(node)
+
+            def collect(item: BlockItem):
+                if isinstance(item, Call):
+                    pending.append(item.block)
+
+            current.traverse(collect)
+
+        # splitting a body may have produced some new blocks
+        known = {block.name for block in self.blocks}
+        for new in self._lazy.blockifier.result():
+            if new.name not in known:
+                self.blocks.append(new)
+
+    @staticmethod
+    def _parse(
+        stream: str,
+        dump: Optional[Dict[DumpType, Optional[Path]]] = None,
+        lazy: bool = False,
+    ) -> SpecNode:
+        lex = RegexLexer(stream)
+        with ExitStack() as stack:
+            tokens = lex.tokens()
+            output = dump.get(DumpType.Tokens) if dump else None
+            if output:
+                f = stack.enter_context(output.open("w"))
+                tokens = _dump_tokens(tokens, f)
+
+            parser = Parser(tokens, lazy=lazy)
+            try:
+                return parser.parse()
+            except ParseError:
+                # finish off the token dump, since it's most useful for
+                # diagnosing exactly this kind of failure
+                if output:
+                    with suppress(LexError):
+                        for _ in tokens:
+                            pass
+                raise
+
+
+def _dump_tokens(tokens: Iterable[Token], f: TextIO) -> Iterator[Token]:
+    for token in tokens:
+        if token.ttype in (TokenType.Newline, TokenType.EOF):
+            print(token.show(), file=f)
+        else:
+            print(token.show(), end=", ", file=f)
+
+        yield token
+
+
+class _LazyBodies:
+    """
+    The unparsed block bodies of a lazily loaded asset, along with the state of
+    the passes needed to load them.
+    """
+
+    def __init__(
+        self,
+        stream: str,
+        spec: SpecNode,
+        templater: TemplaterVisitor,
+        typer: TypeCheckVisitor,
+        blockifier: BlockifyVisitor,
+    ):
+        self.stream = stream
+        self.symbols = spec.symbols
+        self.nodes: Dict[str, BlockNode] = {
+            block.name: block for block in spec.blocks if block.body is not None
+        }
+
+        self.templater = templater
+        self.typer = typer
+        self.blockifier = blockifier
+
+    def load(self, node: BlockNode):
+        assert node.body is not None
+        start, _ = node.body
+
+        parser = Parser(RegexLexer(self.stream, start).tokens(), self.symbols)
+        parser.advance()
+        node.statements = parser.scope()
+        node.body = None
+
+        node.accept(self.templater)
+        node.accept(self.typer)
+        node.accept(self.blockifier)
+
 
 class AssetLoader:
     def __init__(self, root: Path, extension: str = "spec"):
         self.root = root
         self.extension = extension
 
-    def list(self, external: bool = False) -> Iterable[Asset]:
+    def list(
+        self,
+        external: bool = False,
+        cache: Optional["SpecCache"] = None,
+        lazy: bool = False,
+    ) -> Iterable[Asset]:
         for path in self.root.glob(f"**/*.{self.extension}"):
-            yield Asset.load(path, external=external)
+            yield Asset.load(path, external=external, cache=cache, lazy=lazy)
@@ -1,9 +1,27 @@
+import functools
 import json
+import threading
 from pathlib import Path
-from typing import NewType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NewType,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from .common.data import data_path
 
+if TYPE_CHECKING:
+    import sqlite3
+
 BUILTINS_PATH = data_path("builtins")
 
 
@@ -17,53 +35,236 @@ BUILTINS_PATH = data_path("builtins")
 #     synthesis
 #   TYPES/SIGNATURES are mappings from vulnspec names to their respective
 #     vulnspec types which can be parsed by the parser for type checking
+#   PARSED is a pre-parsed version of TYPES/SIGNATURES, see
+#     tools/builtin_generator/signatures.py for the encoding
+#
+# All of these are backed by an sqlite database (see
+# tools/builtin_generator/store.py), which is only opened on the first lookup,
+# and then only read as far as is needed - the mappings a namespace (e.g.
+# libc.stdio) at a time, and the sets a name at a time.
+#
+# The connection is shared between threads, so every query (and every lazy
+# load into a cache) holds the store's lock.
 
 
-class BuiltinBase:
+class Store:
     def __init__(self, path: Path):
-        with path.open() as f:
-            self._data = json.load(f)
+        self.path = path
+        self.tables: List["Table"] = []
+        self.lock = threading.RLock()
+        self._connection: Optional["sqlite3.Connection"] = None
 
+    @property
+    def connection(self) -> "sqlite3.Connection":
+        # only used with the lock held
+        if self._connection is None:
+            # imported here, since it's not needed until the first lookup
+            import sqlite3  # pylint: disable=import-outside-toplevel
 
-class Functions(BuiltinBase):
-    def __init__(self, path: Path):
-        super().__init__(path)
+            uri = self.path.resolve().as_uri() + "?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._connection
 
-        self.SIGNATURES = self._data["signatures"]
-        self.TRANSLATIONS = self._data["translations"]
-        self.PATHS = self._data["paths"]
+    def lookup(self, table: str, name: str) -> Optional[Tuple[str, ...]]:
+        with self.lock:
+            return self.connection.execute(
+                f"SELECT * FROM {table} WHERE name = ?", (name,)
+            ).fetchone()
 
-        self.CLAIMED = set(self.TRANSLATIONS.values())
+    def shards(self, table: str, namespaces: List[str]) -> Dict[str, str]:
+        params = ", ".join("?" * len(namespaces))
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT entries FROM {table} WHERE namespace IN ({params})",
+                namespaces,
+            ).fetchall()
 
+        entries: Dict[str, str] = {}
+        for (shard,) in rows:
+            entries.update(json.loads(shard))
+        return entries
 
-class Variables(BuiltinBase):
-    def __init__(self, path: Path):
-        super().__init__(path)
+    def names(self, table: str) -> Set[str]:
+        with self.lock:
+            rows = self.connection.execute(f"SELECT name FROM {table}").fetchall()
+        return {name for (name,) in rows}
+
+    def entries(self, table: str) -> Dict[str, str]:
+        with self.lock:
+            rows = self.connection.execute(f"SELECT entries FROM {table}").fetchall()
+
+        entries: Dict[str, str] = {}
+        for (shard,) in rows:
+            entries.update(json.loads(shard))
+        return entries
+
+    def json(self, table: str) -> Any:
+        row = self.lookup("json", table)
+        if row is None:
+            raise KeyError(table)
+        return json.loads(row[1])
+
+
+class Table(Mapping[str, str]):
+    """
+    Read-only mapping from names to strings, looked up lazily from the store.
+
+    Entries are loaded a namespace at a time, on the first lookup of a name in
+    that namespace, or all at once when iterating over the table.
+    """
+
+    def __init__(self, store: Store, table: str):
+        self._store = store
+        self._table = table
+        self._cache: Dict[str, str] = {}
+        self._loaded: Set[str] = set()
+        self._complete = False
+
+        store.tables.append(self)
+
+    def load(self, namespaces: Iterable[str]):
+        with self._store.lock:
+            if self._complete:
+                return
+            missing = [
+                namespace for namespace in namespaces if namespace not in self._loaded
+            ]
+            if missing:
+                # the cache is filled before the namespaces are marked as
+                # loaded, so lookups without the lock never miss an entry
+                self._cache.update(self._store.shards(self._table, missing))
+                self._loaded.update(missing)
+
+    def _lookup(self, name: str) -> Optional[str]:
+        value = self._cache.get(name)
+        if value is None:
+            _, _, namespace = name.partition("@")
+            if not self._complete and namespace not in self._loaded:
+                self.load([namespace])
+            value = self._cache.get(name)
+        return value
+
+    def _entries(self) -> Dict[str, str]:
+        with self._store.lock:
+            if not self._complete:
+                self._cache = self._store.entries(self._table)
+                self._complete = True
+            return self._cache
+
+    def __getitem__(self, name: str) -> str:
+        value = self._lookup(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._lookup(name) is not None
+
+    def get(self, key: str, default=None):
+        value = self._lookup(key)
+        return default if value is None else value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries())
+
+    def __len__(self) -> int:
+        return len(self._entries())
 
-        self.TYPES = self._data["types"]
-        self.TRANSLATIONS = self._data["translations"]
-        self.PATHS = self._data["paths"]
 
-        self.CLAIMED = set(self.TRANSLATIONS.values())
+class Names(Container[str]):
+    """
+    Read-only set of names, looked up lazily from the store.
+    """
+
+    def __init__(self, store: Store, table: str):
+        self._store = store
+        self._table = table
+        self._cache: Dict[str, bool] = {}
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+
+        try:
+            return self._cache[name]
+        except KeyError:
+            found = self._cache[name] = (
+                self._store.lookup(self._table, name) is not None
+            )
+            return found
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.names(self._table))
+
+
+class Functions:
+    def __init__(self, store: Store):
+        self.SIGNATURES = Table(store, "functions_signatures")
+        self.PARSED = Table(store, "functions_parsed")
+        self.TRANSLATIONS = Table(store, "functions_translations")
+        self.PATHS = Table(store, "functions_paths")
+
+        self.CLAIMED = Names(store, "functions_claimed")
+
+
+class Variables:
+    def __init__(self, store: Store):
+        self.TYPES = Table(store, "variables_types")
+        self.PARSED = Table(store, "variables_parsed")
+        self.TRANSLATIONS = Table(store, "variables_translations")
+        self.PATHS = Table(store, "variables_paths")
+
+        self.CLAIMED = Names(store, "variables_claimed")
 
 
 MetaType = NewType("MetaType", str)
 
 
-class Types(BuiltinBase):
-    def __init__(self, path: Path):
-        super().__init__(path)
+class Types:
+    def __init__(self, store: Store):
+        self._store = store
+
+        self.TRANSLATIONS = Table(store, "types_translations")
+        self.PATHS = Table(store, "types_paths")
+
+        self.CLAIMED = Names(store, "types_claimed")
+
+    @functools.cached_property
+    def METAS(self) -> List[str]:  # pylint: disable=invalid-name
+        return self._store.json("types_metas")
+
+    @functools.cached_property
+    def META_GRAPH(self) -> Dict[str, List[str]]:  # pylint: disable=invalid-name
+        return self._store.json("types_meta_graph")
 
-        self.METAS = self._data["metas"]
-        self.META_GRAPH = self._data["meta_graph"]
-        self.META_PARENTS = self._data["meta_parents"]
+    @functools.cached_property
+    def META_PARENTS(self) -> Dict[str, MetaType]:  # pylint: disable=invalid-name
+        # small, and used for every simple type, so loaded all at once
+        return {
+            name: MetaType(meta)
+            for name, meta in self._store.entries("types_meta_parents").items()
+        }
 
-        self.TRANSLATIONS = self._data["translations"]
-        self.PATHS = self._data["paths"]
+    @functools.cached_property
+    def META_IDS(self) -> Dict[str, int]:  # pylint: disable=invalid-name
+        return {meta: i for i, meta in enumerate(self.METAS)}
 
-        self.CLAIMED = set(
-            part for tp in self.TRANSLATIONS.values() for part in tp.split()
-        )
+    @functools.cached_property
+    def META_REACHABLE(self) -> List[int]:  # pylint: disable=invalid-name
+        # transitive closure of META_GRAPH - for each metatype id, a bitset of
+        # the ids of all the metatypes reachable from it (including itself)
+        reachable = [1 << i for i in range(len(self.METAS))]
+        for meta, conns in self.META_GRAPH.items():
+            for conn in conns:
+                reachable[self.META_IDS[meta]] |= 1 << self.META_IDS[conn]
+
+        # Warshall's algorithm, with each row of the matrix as a bitset
+        for k in range(len(reachable)):
+            for i, row in enumerate(reachable):
+                if row >> k & 1:
+                    reachable[i] = row | reachable[k]
+
+        return reachable
 
     def meta(self, tp: str) -> MetaType:
         if tp in self.METAS:
@@ -72,18 +273,32 @@ class Types(BuiltinBase):
             raise KeyError(tp)
 
 
-functions = Functions(BUILTINS_PATH / "functions.json")
-variables = Variables(BUILTINS_PATH / "variables.json")
-types = Types(BUILTINS_PATH / "types.json")
+builtins_store = Store(BUILTINS_PATH / "builtins.db")
+functions = Functions(builtins_store)
+variables = Variables(builtins_store)
+types = Types(builtins_store)
+
+
+def load_namespaces(namespaces: Iterable[str]):
+    """
+    Load all the builtins in the given namespaces at once, ahead of them being
+    looked up one by one.
+    """
+
+    namespaces = list(namespaces)
+    for table in builtins_store.tables:
+        table.load(namespaces)
 
 
 class MetaTypes:
-    Pointer = types.meta("pointer")
-    Void = types.meta("void")
-    Boolean = types.meta("boolean")
-    Integral = types.meta("integral")
-    Floating = types.meta("floating")
-    Complex = types.meta("complex")
+    # not checked against types.METAS here, so that the builtins don't need to
+    # be opened just to import this
+    Pointer = MetaType("pointer")
+    Void = MetaType("void")
+    Boolean = MetaType("boolean")
+    Integral = MetaType("integral")
+    Floating = MetaType("floating")
+    Complex = MetaType("complex")
 
     # not part of the graph, but useful for entirely avoiding constraints
     Universal = MetaType("universal")
@@ -0,0 +1,114 @@
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from .node import SpecNode
+
+PACKAGE_DIRECTORY = Path(__file__).parent
+
+# The modules that determine the shape of a parsed specification (including
+# its symbol table) - if any of these change, then previously cached trees can
+# no longer be trusted.
+FINGERPRINT_MODULES = ("parser", "node", "common")
+
+
+class SpecCache:
+    """
+    Content-addressed on-disk cache of parsed specifications.
+
+    Entries are keyed on the text of the specification, the version of
+    vulnspec, and the source of the lexer, parser and AST nodes, so stale
+    entries are never returned, they simply stop being looked up.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        if root is None:
+            cache_home = os.getenv("XDG_CACHE_HOME")
+            if cache_home:
+                root = Path(cache_home) / "vulnspec"
+            else:
+                root = Path.home() / ".cache" / "vulnspec"
+
+        self.root = root
+
+    def load(self, stream: str) -> Optional[SpecNode]:
+        """
+        Load the parsed tree for a specification, or None if it has not been
+        cached yet.
+        """
+
+        try:
+            data = self._path(stream).read_bytes()
+            spec = pickle.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError):
+            # a corrupted entry is no worse than a missing one
+            return None
+
+        if not isinstance(spec, SpecNode):
+            return None
+        return spec
+
+    def store(self, stream: str, spec: SpecNode):
+        """
+        Save the parsed tree for a specification.
+
+        This must be called before any passes have modified the tree.
+        """
+
+        try:
+            data = zlib.compress(pickle.dumps(spec, pickle.HIGHEST_PROTOCOL), 1)
+        except RecursionError:
+            # exceptionally deep trees just don't get cached
+            return
+
+        path = self._path(stream)
+        tmpname = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            # write to a temporary file first, so concurrent readers never see
+            # a partially written entry
+            fd, tmpname = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmpname, path)
+        except OSError:
+            # an unwritable cache is no worse than a missing one
+            if tmpname is not None:
+                with contextlib.suppress(OSError):
+                    Path(tmpname).unlink()
+
+    def _path(self, stream: str) -> Path:
+        digest = hashlib.sha256()
+        digest.update(_fingerprint().encode())
+        digest.update(stream.encode())
+
+        key = digest.hexdigest()
+        return self.root / key[:2] / f"{key[2:]}.ast"
+
+
+@functools.lru_cache(maxsize=None)
+def _fingerprint() -> str:
+    # slow to import, and only needed once something is actually cached
+    from importlib import metadata  # pylint: disable=import-outside-toplevel
+
+    try:
+        version = metadata.version("vulnspec")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+
+    digest = hashlib.sha256(version.encode())
+    for module in FINGERPRINT_MODULES:
+        for path in sorted((PACKAGE_DIRECTORY / module).glob("*.py")):
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+
+    return digest.hexdigest()
@@ -1,3 +1,8 @@
+import bisect
+import functools
+from typing import List, NamedTuple, Tuple
+
+
 class SynthError(BaseException):
     pass
 
@@ -6,6 +11,83 @@ class ConstraintError(BaseException):
     pass
 
 
+class SourcePosition(NamedTuple):
+    """
+    A 1-indexed line and column position in a source stream.
+    """
+
+    line: int
+    column: int
+
+
+class LineIndex:
+    """
+    Index of the offsets where each line of a source stream begins.
+
+    This allows converting an offset into a line and column with a binary
+    search, instead of walking the stream from the beginning each time.
+    """
+
+    def __init__(self, stream: str):
+        self.stream = stream
+
+        self.starts = [0]
+        pos = stream.find("\n")
+        while pos != -1:
+            self.starts.append(pos + 1)
+            pos = stream.find("\n", pos + 1)
+
+    @staticmethod
+    def of(stream: str) -> "LineIndex":
+        """
+        Get the shared line index for a stream, building it if needed.
+        """
+
+        return _line_index(stream)
+
+    def __len__(self) -> int:
+        # a trailing newline doesn't start a new line
+        if self.starts[-1] < len(self.stream):
+            return len(self.starts)
+        else:
+            return len(self.starts) - 1
+
+    def position(self, offset: int) -> SourcePosition:
+        """
+        Find the line and column of an offset into the stream.
+        """
+
+        offset = max(0, min(offset, len(self.stream)))
+        line = bisect.bisect_right(self.starts, offset)
+        return SourcePosition(line, offset - self.starts[line - 1] + 1)
+
+    def line(self, line: int) -> str:
+        """
+        Get the content of a 1-indexed line, without the trailing newline.
+        """
+
+        start = self.starts[line - 1]
+        if line < len(self.starts):
+            return self.stream[start : self.starts[line] - 1]
+        else:
+            return self.stream[start:]
+
+    def lines(self, first: int, last: int) -> List[Tuple[int, str]]:
+        """
+        Get the numbers and contents of the lines in the half-open range
+        [first, last).
+        """
+
+        first = max(first, 1)
+        last = min(last, len(self) + 1)
+        return [(i, self.line(i)) for i in range(first, last)]
+
+
+@functools.lru_cache(maxsize=16)
+def _line_index(stream: str) -> LineIndex:
+    return LineIndex(stream)
+
+
 class ErrorLocation:
     """
     Utility class to represent the location of an error.
@@ -19,52 +101,31 @@ class ErrorLocation:
         self.start = start
         self.end = end
 
+    def span(self, stream: str) -> Tuple[SourcePosition, SourcePosition]:
+        """
+        Find the line-column positions of the start and end of the error in
+        the original stream used to parse everything.
+        """
+
+        index = LineIndex.of(stream)
+        return index.position(self.start), index.position(self.end)
+
     def format(self, stream: str):
         """
         Format a nice printout for the error location given the original
         stream used to parse everything.
         """
 
-        # track line-column positions of the token
-        start_line = 1
-        start_column = 1
-        end_line = 1
-        end_column = 1
-
-        # track lines
-        count = 1
-        pos = 0
-
-        lines = []
-        i = 0
-        for i, ch in enumerate(stream):
-            if ch == "\n":
-                lines.append((count, stream[pos:i]))
-                pos = i + 1
-                count += 1
-
-                if i < self.end:
-                    end_column = 1
-                    end_line += 1
-                if i < self.start:
-                    start_column = 1
-                    start_line += 1
-            else:
-                if i < self.end:
-                    end_column += 1
-                if i < self.start:
-                    start_column += 1
-
-        left_over = stream[pos:]
-        if left_over:
-            lines.append((count, left_over))
+        index = LineIndex.of(stream)
+        start_line, start_column = index.position(self.start)
+        end_line, end_column = index.position(self.end)
 
         parts = []
         CONTEXT = 2
 
         # before context
         before_ctx = max(0, end_line - CONTEXT - 1)
-        for i, line in lines[before_ctx:end_line]:
+        for i, line in index.lines(before_ctx + 1, end_line + 1):
             prefix = f"  {str(i).rjust(6)}"
             parts.append(f"{prefix}  |  {line}")
 
@@ -78,7 +139,7 @@ class ErrorLocation:
 
         # after context
         after_ctx = end_line + CONTEXT
-        for i, line in lines[end_line:after_ctx]:
+        for i, line in index.lines(end_line + 1, after_ctx + 1):
             prefix = f"  {str(i).rjust(6)}"
             parts.append(f"{prefix}  |  {line}")
 
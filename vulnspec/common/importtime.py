@@ -0,0 +1,66 @@
+import re
+from typing import Iterable, List, NamedTuple, Optional
+
+# A line of output from `python -X importtime`, e.g.
+#   import time:       449 |       1215 |   vulnspec.parser
+LINE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \| ( *)(\S+)$")
+PREFIX = "import time:"
+
+
+class ImportTime(NamedTuple):
+    """
+    The time taken to import a single module, in microseconds.
+    """
+
+    module: str
+    self_time: int
+    cumulative: int
+    depth: int
+
+
+def parse_line(line: str) -> Optional[ImportTime]:
+    """
+    Parse a single line of `-X importtime` output, or None if the line is
+    something else (including the header).
+    """
+
+    match = LINE.match(line)
+    if not match:
+        return None
+
+    self_time, cumulative, indent, module = match.groups()
+    return ImportTime(module, int(self_time), int(cumulative), len(indent) // 2)
+
+
+def is_importtime(line: str) -> bool:
+    return line.startswith(PREFIX)
+
+
+def report(times: Iterable[ImportTime], package: str = "vulnspec") -> str:
+    """
+    Summarize the import times of all the modules in a package, most expensive
+    (including everything that they import) first.
+    """
+
+    times = list(times)
+    total = sum(time.cumulative for time in times if time.depth == 0)
+    modules = [
+        time
+        for time in times
+        if time.module == package or time.module.startswith(package + ".")
+    ]
+    modules.sort(key=lambda time: time.cumulative, reverse=True)
+
+    lines: List[str] = []
+    lines.append(f"{'self ms':>10} {'cumulative ms':>14}  module")
+    for time in modules:
+        lines.append(
+            f"{time.self_time / 1000:>10.2f} {time.cumulative / 1000:>14.2f}  "
+            f"{time.module}"
+        )
+    own = sum(time.self_time for time in modules)
+    lines.append(
+        f"{len(modules)} {package} modules took {own / 1000:.2f}ms to import, "
+        f"out of {total / 1000:.2f}ms of imports in total"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,90 @@
+import functools
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+@functools.lru_cache(maxsize=None)
+def split_namespace(name: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a name like printf@libc.stdio into its base and namespace.
+    """
+
+    base, sep, namespace = name.partition("@")
+    if sep:
+        return base, namespace
+    else:
+        return base, None
+
+
+class Symbol:
+    """
+    A unique name that appears in a specification.
+
+    Everything that can be worked out from the name alone is resolved once,
+    when the symbol is first interned.
+    """
+
+    __slots__ = ("id", "name", "base", "namespace")
+
+    def __init__(self, sid: int, name: str):
+        self.id = sid
+        self.name = name
+        self.base, self.namespace = split_namespace(name)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.id} {self.name}>"
+
+
+class SymbolTable:
+    """
+    Table of all the names used in a single compilation.
+
+    Each name is interned once and given an integer id, so that later passes
+    can key on the id instead of repeatedly hashing the name.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._symbols: List[Symbol] = []
+
+    def intern(self, name: str) -> Symbol:
+        """
+        Get the symbol for a name, adding it to the table if it's new.
+        """
+
+        sid = self._ids.get(name)
+        if sid is None:
+            sid = len(self._symbols)
+            self._ids[name] = sid
+            self._symbols.append(Symbol(sid, name))
+
+        return self._symbols[sid]
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        """
+        Get the symbol for a name, or None if it has never been interned.
+        """
+
+        sid = self._ids.get(name)
+        if sid is None:
+            return None
+        else:
+            return self._symbols[sid]
+
+    def namespaces(self) -> Set[str]:
+        """
+        Get all the namespaces (i.e. builtin libraries) referred to by names in
+        the table.
+        """
+
+        return {
+            symbol.namespace for symbol in self._symbols if symbol.namespace is not None
+        }
+
+    def __getitem__(self, sid: int) -> Symbol:
+        return self._symbols[sid]
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __iter__(self) -> Iterator[Symbol]:
+        return iter(self._symbols)
@@ -22,6 +22,10 @@ MappingFunc = Callable[[BI], BI]
 class BlockItem:
     _counter = 0
 
+    # the type of an expression, as resolved by the type checker (see
+    # BlockifyVisitor), or None if it isn't known
+    vtype: Optional[TypeNode] = None
+
     def __init__(self, known_id: Optional[int] = None):
         if known_id is None:
             self.id = BlockItem.new_id()
@@ -34,6 +38,11 @@ class BlockItem:
         BlockItem._counter += 1
         return i
 
+    def with_type(self: BI, vtype: Optional[TypeNode]) -> BI:
+        if vtype is not None:
+            self.vtype = vtype
+        return self
+
     def traverse(self, func: TraversalFunc):
         pass
 
@@ -165,7 +174,7 @@ class Deref(BlockItem):
         self.target.traverse(func)
 
     def map(self, func: MappingFunc) -> "Deref":
-        return func(Deref(self.target.map(func), self.id))
+        return func(Deref(self.target.map(func), self.id).with_type(self.vtype))
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.target}>"
@@ -181,7 +190,7 @@ class Ref(BlockItem):
         self.target.traverse(func)
 
     def map(self, func: MappingFunc) -> "Ref":
-        return func(Ref(self.target.map(func), self.id))
+        return func(Ref(self.target.map(func), self.id).with_type(self.vtype))
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.target}>"
@@ -201,7 +210,11 @@ class Array(BlockItem):
         self.index.traverse(func)
 
     def map(self, func: MappingFunc) -> "Array":
-        return func(Array(self.target.map(func), self.index.map(func), self.id))
+        return func(
+            Array(self.target.map(func), self.index.map(func), self.id).with_type(
+                self.vtype
+            )
+        )
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.index} {self.target}>"
@@ -318,7 +331,7 @@ class Variable(BlockItem):
         func(self)
 
     def map(self, func: MappingFunc) -> "Variable":
-        return func(Variable(self.variable, self.id))
+        return func(Variable(self.variable, self.id).with_type(self.vtype))
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.variable}>"
@@ -343,7 +356,9 @@ class Function(BlockItem):
 
     def map(self, func: MappingFunc) -> "Function":
         return func(
-            Function(self.func.map(func), [arg.map(func) for arg in self.args], self.id)
+            Function(
+                self.func.map(func), [arg.map(func) for arg in self.args], self.id
+            ).with_type(self.vtype)
         )
 
 
@@ -369,7 +384,7 @@ class Operation(BlockItem):
                 self.op,
                 [expr.map(func) for expr in self.operands],
                 self.id,
-            )
+            ).with_type(self.vtype)
         )
 
 
@@ -382,7 +397,7 @@ class Value(BlockItem):
         func(self)
 
     def map(self, func: MappingFunc) -> "Value":
-        return func(Value(self.value, self.id))
+        return func(Value(self.value, self.id).with_type(self.vtype))
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} {self.value}>"
@@ -397,7 +412,7 @@ class SizeOfType(BlockItem):
         func(self)
 
     def map(self, func: MappingFunc) -> "SizeOfType":
-        return func(SizeOfType(self.target, self.id))
+        return func(SizeOfType(self.target, self.id).with_type(self.vtype))
 
 
 class SizeOfExpr(BlockItem):
@@ -409,7 +424,7 @@ class SizeOfExpr(BlockItem):
         func(self)
 
     def map(self, func: MappingFunc) -> "SizeOfExpr":
-        return func(SizeOfExpr(self.target, self.id))
+        return func(SizeOfExpr(self.target, self.id).with_type(self.vtype))
 
 
 class Cast(BlockItem):
@@ -423,4 +438,4 @@ class Cast(BlockItem):
         self.expr.traverse(func)
 
     def map(self, func: MappingFunc) -> "Cast":
-        return func(Cast(self.expr.map(func), self.cast, self.id))
+        return func(Cast(self.expr.map(func), self.cast, self.id).with_type(self.vtype))
@@ -1,6 +1,8 @@
-from typing import List, Optional, Set
+import functools
+from typing import Dict, List, Optional, Set, Tuple
 
 from ..builtins import functions, types, variables
+from ..node import TypeNode
 from .block import (
     Array,
     Assignment,
@@ -26,12 +28,31 @@ from .chunk import ChunkVariable
 from .program import Program
 
 
+@functools.lru_cache(maxsize=None)
+def _translate_name(name: str) -> Tuple[str, Optional[str]]:
+    """
+    Find the C name for a variable, along with the header that it needs (if
+    it's a builtin).
+    """
+
+    if name in variables.TRANSLATIONS:
+        return variables.TRANSLATIONS[name], variables.PATHS[name]
+    elif name in functions.TRANSLATIONS:
+        return functions.TRANSLATIONS[name], functions.PATHS[name]
+    else:
+        return name, None
+
+
 class CodeGen:
     def __init__(self, program: Program):
         self.program = program
 
         self._includes: Set[str] = set(program.includes)
 
+        # type names for the canonical types that were resolved by the type
+        # checker (see BlockItem.vtype), which are shared between expressions
+        self._typestrs: Dict[TypeNode, str] = {}
+
     def generate(self) -> str:
         return self._gen_program(self.program)
 
@@ -72,6 +93,17 @@ class CodeGen:
         else:
             return var.typename()
 
+    def _gen_typestr(self, tp: TypeNode, canonical: Optional[TypeNode]) -> str:
+        if canonical is None:
+            return self._gen_decl(ChunkVariable("", tp, None))
+
+        typestr = self._typestrs.get(canonical)
+        if typestr is None:
+            typestr = self._typestrs[canonical] = self._gen_decl(
+                ChunkVariable("", canonical, None)
+            )
+        return typestr
+
     def _gen_func_decl(self, func: FunctionDefinition) -> Optional[str]:
         if func.func == "main":
             return None
@@ -152,14 +184,9 @@ class CodeGen:
     def _gen_expr(self, expr: Expression, force_parens: bool = False) -> str:
         result: str
         if isinstance(expr, Variable):
-            if expr.variable.name in variables.TRANSLATIONS:
-                vname = variables.TRANSLATIONS[expr.variable.name]
-                self._includes.add(variables.PATHS[expr.variable.name])
-            elif expr.variable.name in functions.TRANSLATIONS:
-                vname = functions.TRANSLATIONS[expr.variable.name]
-                self._includes.add(functions.PATHS[expr.variable.name])
-            else:
-                vname = expr.variable.name
+            vname, path = _translate_name(expr.variable.name)
+            if path is not None:
+                self._includes.add(path)
             result = vname
         elif isinstance(expr, Function):
             fname = self._gen_expr(expr.func)
@@ -189,9 +216,9 @@ class CodeGen:
         elif isinstance(expr, SizeOfExpr):
             result = f"sizeof({self._gen_expr(expr.target)})"
         elif isinstance(expr, Cast):
-            # FIXME: this is a bit hacky
-            var = ChunkVariable("", expr.cast, None)
-            result = f"({self._gen_decl(var)}) {self._gen_expr(expr.expr)}"
+            # the type of a cast expression is the type being cast to
+            typestr = self._gen_typestr(expr.cast, expr.vtype)
+            result = f"({typestr}) {self._gen_expr(expr.expr)}"
         elif isinstance(expr, Deref):
             result = "*" + self._gen_expr(expr.target)
             if not force_parens:
@@ -1,5 +1,5 @@
 from functools import reduce
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 from ..graph import (
     Array,
@@ -13,7 +13,7 @@ from ..graph import (
     Value,
     Variable,
 )
-from ..node import ArrayTypeNode, PointerTypeNode
+from ..node import ArrayTypeNode, PointerTypeNode, TypeNode
 
 
 class Lifter:
@@ -148,6 +148,10 @@ class UsageCapture:
     def _nvar(self, target: Expression) -> ChunkVariable:
         if isinstance(target, Variable):
             return target.variable
+        elif target.vtype is not None and isinstance(target, (Ref, Array, Deref)):
+            # already resolved by the type checker
+            var = self._nvar(target.target)
+            return ChunkVariable(var.name, target.vtype, var.chunk)
         elif isinstance(target, Ref):
             var = self._nvar(target.target)
             if var.vtype is None:
@@ -181,11 +185,15 @@ class UsageCapture:
         elif isinstance(target, Ref):
             result = self._replace(target.target, new)
             assert isinstance(result, (Variable, Array, Deref))
-            return Ref(result, target.id)
+            return Ref(result, target.id).with_type(target.vtype)
         elif isinstance(target, Deref):
-            return Deref(self._replace(target.target, new), target.id)
+            return Deref(self._replace(target.target, new), target.id).with_type(
+                target.vtype
+            )
         elif isinstance(target, Array):
-            return Array(self._replace(target.target, new), target.index, target.id)
+            return Array(
+                self._replace(target.target, new), target.index, target.id
+            ).with_type(target.vtype)
         else:
             raise RuntimeError()
 
@@ -214,6 +222,8 @@ class UsageCapture:
 
         result = self._simplify(target.target)
 
+        # simplifying never changes the value of an expression, so the types
+        # of the rebuilt parts stay the same
         if isinstance(target, Variable):
             return target
         elif isinstance(target, Ref):
@@ -222,14 +232,14 @@ class UsageCapture:
             # elif isinstance(result, Array):
             #     return result.target
             else:
-                return Ref(result)
+                return Ref(result).with_type(target.vtype)
         elif isinstance(target, Deref):
             if isinstance(result, Ref):
                 return result.target
             else:
-                return Deref(result)
+                return Deref(result).with_type(target.vtype)
         elif isinstance(target, Array):
-            return Array(result, target.index)
+            return Array(result, target.index).with_type(target.vtype)
             # if isinstance(result, Ref):
             #     return result.target
             # else:
@@ -241,38 +251,62 @@ class UsageCapture:
         if isinstance(first, Ref) and isinstance(second, Ref):
             common = self._maximal(first.target, second.target)
             assert isinstance(common, (Variable, Array, Deref))
-            return Ref(common)
+            return Ref(common).with_type(_wrapped_type(common, first, second))
         elif isinstance(first, Ref):
             common = self._maximal(first.target, second)
             assert isinstance(common, (Variable, Array, Deref))
-            return Ref(common)
+            return Ref(common).with_type(_wrapped_type(common, first))
         elif isinstance(second, Ref):
             common = self._maximal(first, second.target)
             assert isinstance(common, (Variable, Array, Deref))
-            return Ref(common)
+            return Ref(common).with_type(_wrapped_type(common, second))
         elif isinstance(first, Variable):
             return first
         elif isinstance(second, Variable):
             return second
         elif isinstance(first, Deref) and isinstance(second, Deref):
             common = self._maximal(first.target, second.target)
-            return Deref(common)
+            return Deref(common).with_type(_wrapped_type(common, first, second))
         elif isinstance(first, Array) and isinstance(second, Array):
+            common = self._maximal(first.target, second.target)
+            vtype = _wrapped_type(common, first, second)
             if (
                 isinstance(first.index, Value)
                 and isinstance(second.index, Value)
                 and first.index.value == second.index.value
             ):
-                common = self._maximal(first.target, second.target)
-                return Array(common, first.index)
+                return Array(common, first.index).with_type(vtype)
             else:
-                return Deref(self._maximal(first.target, second.target))
+                return Deref(common).with_type(vtype)
         elif isinstance(first, Deref) and isinstance(second, Array):
-            return Deref(self._maximal(first.target, second.target))
+            common = self._maximal(first.target, second.target)
+            return Deref(common).with_type(_wrapped_type(common, first, second))
         elif isinstance(first, Array) and isinstance(second, Deref):
-            return Deref(self._maximal(first.target, second.target))
+            common = self._maximal(first.target, second.target)
+            return Deref(common).with_type(_wrapped_type(common, first, second))
         else:
             raise RuntimeError()
 
     def __repr__(self) -> str:
         return repr(self.capture)
+
+
+def _wrapped_type(
+    common: Expression, *sources: Union[Ref, Array, Deref]
+) -> Optional[TypeNode]:
+    """
+    Find the type of an expression that wraps common in the same way that one
+    of the sources wraps its target, without recomputing it.
+
+    The type of a wrapper only depends on the type of what it wraps, so if
+    common has the same type as a source's target, the source's type can be
+    reused as-is (types from the type checker are canonical, so comparing
+    them is cheap).
+    """
+
+    if common.vtype is None:
+        return None
+    for source in sources:
+        if source.target.vtype is common.vtype:
+            return source.vtype
+    return None
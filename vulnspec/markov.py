@@ -1,111 +1,577 @@
+import bisect
+import functools
 import json
+import mmap
 import random
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import (
+    Any,
+    Container,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from .builtins import functions, types, variables
 from .common.data import data_path
 from .parser.token import RESERVED_WORDS
 
+# The models are either loaded from markov.json, or from a compiled version of
+# it, which has the layout:
+#   magic       8 bytes, b"VSMARKOV"
+#   version     uint32, little-endian
+#   length      uint32, little-endian, the length of the header
+#   header      JSON, the models without their probabilities, with each table as
+#               {"prefixes": [...], "starts": [...], "chars": "...",
+#                "offset": ..., "count": ...}
+#   padding     up to a multiple of 8 bytes
+#   tables      the probabilities of every table, each a contiguous run of
+#               "count" little-endian doubles, starting "offset" bytes into
+#               this section (and so always aligned)
+#
+# The probabilities for prefixes[i] are at indices starts[i] to starts[i + 1]
+# of the table, with the matching next characters at the same indices of chars.
+#
+# Each model in the header may also have precomputed endings, as
+# {"states": "...", "horizon": ..., "offset": ..., "count": ...}, where states
+# are every state of the model separated by spaces, and the little-endian
+# floats (not doubles) at offset are the probability of ending within k more
+# characters from states[i], at index i * (horizon + 1) + k. Only the models
+# that are sampled by length (see LengthSampler.worthwhile) have endings.
+#
+# See tools/markov_generator/compiled.py for the other half of this.
+MAGIC = b"VSMARKOV"
+VERSION = 3
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+# the lengths of the names generated from each model
+NAME_SIZES = {
+    "funcs": (3, 12),
+    "vars": (1, 12),
+}
+
+
+class Models:
+    """
+    The markov models, loaded on first use, at most once per process.
+
+    The models are loaded from the compiled models if they exist, or from the
+    JSON models otherwise. Either way, they're never modified after loading, so
+    they're shared between every MarkovLoader, including across threads.
+    """
+
+    def __init__(self, path: Path, compiled: Optional[Path] = None):
+        self.path = path
+        self.compiled = compiled
+        self._lock = threading.Lock()
+        self._markovs: Optional[Dict[str, "Markov"]] = None
+
+    def get(self, name: str) -> "Markov":
+        markovs = self._markovs
+        if markovs is None:
+            with self._lock:
+                if self._markovs is None:
+                    self._markovs = self._load()
+                markovs = self._markovs
+
+        return markovs[name]
+
+    def _load(self) -> Dict[str, "Markov"]:
+        if self.compiled is not None:
+            try:
+                return load_compiled(self.compiled)
+            except (OSError, ValueError, KeyError, IndexError, TypeError):
+                # fallback to the uncompiled models, if they're missing or
+                # malformed
+                pass
+
+        with self.path.open() as f:
+            data = json.load(f)
+
+        return {
+            name: _create(
+                model,
+                [Table.from_lookup(lookup) for lookup in _lookups(model)],
+            )
+            for name, model in data.items()
+        }
+
+
+def load_compiled(path: Path) -> Dict[str, "Markov"]:
+    with path.open("rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(data) < PREAMBLE.size:
+        raise ValueError("truncated markov models")
+    magic, version, length = PREAMBLE.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("unknown markov model format")
+    header = json.loads(data[PREAMBLE.size : PREAMBLE.size + length])
+    base = (PREAMBLE.size + length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    view = memoryview(data)
+    markovs: Dict[str, Markov] = {}
+    for name, model in header.items():
+        tables: List[Table] = []
+        for table in model["tables"]:
+            probs = _floats(view, base + table["offset"], table["count"], "d")
+            starts = table["starts"]
+            ranges = {
+                sys.intern(prefix): (starts[i], starts[i + 1])
+                for i, prefix in enumerate(table["prefixes"])
+            }
+            tables.append(Table(ranges, probs, table["chars"]))
+
+        endings = None
+        if "endings" in model:
+            info = model["endings"]
+            endings = Endings(
+                info["states"],
+                _floats(view, base + info["offset"], info["count"], "f"),
+                info["horizon"],
+            )
+
+        markovs[name] = _create(model, tables, endings)
+
+    return markovs
+
+
+def _floats(
+    view: memoryview, start: int, count: int, typecode: Literal["d", "f"]
+) -> Sequence[float]:
+    end = start + count * struct.calcsize(typecode)
+    if end > len(view):
+        raise ValueError("truncated markov models")
+
+    if sys.byteorder == "little":
+        return view[start:end].cast(typecode)
+
+    probs = array(typecode, view[start:end])
+    probs.byteswap()
+    return probs
+
+
+def _lookups(model: Dict[str, Any]) -> List[Dict[str, List[Tuple[float, str]]]]:
+    if model["mode"] == "single":
+        return [model["table"]]
+    elif model["mode"] == "multi":
+        return model["tables"]
+    else:
+        raise KeyError()
+
+
+def _create(
+    model: Dict[str, Any], tables: List["Table"], endings: Optional["Endings"] = None
+) -> "Markov":
+    if model["mode"] == "single":
+        return Markov(tables[0], model["size"], model["terminal"], endings)
+    elif model["mode"] == "multi":
+        return MultiMarkov(tables, model["max_size"], model["terminal"], endings)
+    else:
+        raise KeyError()
+
+
+models = Models(data_path("markov.json"), data_path("markov.bin"))
+
 
 class MarkovLoader:
-    def __init__(self, exclude: Optional[Iterable[str]]):
-        self._exclude: Set[str]
-        if exclude:
-            self._exclude = set(exclude)
-        else:
-            self._exclude = set()
+    """
+    Create generators from the shared markov models.
 
-        with data_path("markov.json").open() as f:
-            self.data = json.load(f)
+    All the generators from a single loader share the same set of used names,
+    so that they never generate the same name twice. The reserved names are
+    checked separately, so that they're shared by every loader rather than
+    copied into each one.
+    """
+
+    def __init__(self, exclude: Optional[Iterable[str]], store: Models = models):
+        self._used = set(exclude) if exclude else set()
+        self._store = store
 
     def model(self, name: str, size: Tuple[int, int]) -> "MarkovWrapper":
-        return self._create(self.data[name], size)
+        return MarkovWrapper(self._store.get(name), size, self._used)
+
 
-    def _create(self, model: Dict[Any, Any], size: Tuple[int, int]) -> "MarkovWrapper":
-        if model["mode"] == "single":
-            markov = Markov(model["table"], model["size"], model["terminal"])
-        elif model["mode"] == "multi":
-            markov = MultiMarkov(model["tables"], model["max_size"], model["terminal"])
-        else:
-            raise KeyError()
+class Table:
+    """
+    The transitions of a markov chain, from each prefix to the next character.
 
-        return MarkovWrapper(markov, size, self._exclude)
+    The cumulative probabilities of the characters that can follow a prefix
+    are stored contiguously in probs, between the start and end of the range
+    of that prefix, with each character at the same index in chars.
+    """
+
+    __slots__ = ("ranges", "probs", "chars")
+
+    def __init__(
+        self, ranges: Dict[str, Tuple[int, int]], probs: Sequence[float], chars: str
+    ):
+        self.ranges = ranges
+        self.probs = probs
+        self.chars = chars
+
+    @staticmethod
+    def from_lookup(lookup: Dict[str, List[Tuple[float, str]]]) -> "Table":
+        ranges: Dict[str, Tuple[int, int]] = {}
+        probs = array("d")
+        chars: List[str] = []
+        for prefix, entries in lookup.items():
+            start = len(probs)
+            for prob, ch in entries:
+                probs.append(prob)
+                chars.append(ch)
+            ranges[prefix] = (start, len(probs))
+
+        return Table(ranges, probs, "".join(chars))
+
+    def choose(self, prefix: str) -> str:
+        # raises a KeyError for an unknown prefix, before using any randomness
+        start, end = self.ranges[prefix]
+        return self.pick(start, end)
+
+    def pick(self, start: int, end: int) -> str:
+        n = random.random()
+        return self.chars[bisect.bisect_right(self.probs, n, start, end) - 1]
+
+    def transitions(self, prefix: str) -> List[Tuple[str, float]]:
+        span = self.ranges.get(prefix)
+        if span is None:
+            return []
+
+        start, end = span
+        probs = self.probs
+        return [
+            (self.chars[i], (probs[i + 1] if i + 1 < end else 1.0) - probs[i])
+            for i in range(start, end)
+        ]
 
 
 class Markov:
     def __init__(
-        self, lookup: Dict[str, List[Tuple[float, str]]], size: int, terminal: str
+        self,
+        table: Table,
+        size: int,
+        terminal: str,
+        endings: Optional["Endings"] = None,
     ):
-        self.lookup = lookup
+        self.table = table
 
         self.size = size
         self.terminal = terminal
+        self.endings = endings
 
-    def generate(self) -> str:
-        complete = ""
-        while True:
-            ch = self.choose(complete)
-            if ch == self.terminal:
-                break
+    def generate(self, exclude: Container[str] = ()) -> str:
+        """
+        Generate a string, which is never one of exclude.
 
-            complete += ch
+        If the string would end as one of exclude, its last character is
+        dropped and chosen again, rather than starting it all over.
+        """
 
-        return complete
+        return self.generate_batch(1, exclude=exclude)[0]
 
-    def choose(self, prefix: str) -> str:
-        # TODO: use random.choices
+    def generate_batch(
+        self,
+        count: int,
+        max_size: Optional[int] = None,
+        exclude: Container[str] = (),
+    ) -> List[str]:
+        """
+        Generate many strings together, a character of each at a time.
+
+        The strings are all different, and each is excluded from the others
+        in the same way as exclude. Any string that grows longer than max_size
+        is dropped as soon as it does, so fewer than count strings may be
+        returned.
+        """
+
+        choose = self.choose
+        terminal = self.terminal
+
+        # a dict rather than a set, to keep the order they were completed in
+        complete: Dict[str, None] = {}
+        active = [""] * count
+        while active:
+            growing = []
+            for prefix in active:
+                ch = choose(prefix)
+                if ch == terminal:
+                    if prefix not in exclude and prefix not in complete:
+                        complete[prefix] = None
+                    else:
+                        growing.append(prefix[:-1])
+                elif max_size is None or len(prefix) < max_size:
+                    growing.append(prefix + ch)
+            active = growing
+
+        return list(complete)
 
+    def choose(self, prefix: str) -> str:
         prefix = prefix[-self.size :]
         assert len(prefix) <= self.size
 
-        sub = self.lookup[prefix]
-        n = random.random()
-
-        start = 0
-        end = len(sub) - 1
-        while start < end:
-            i = (start + end) // 2
-            if start == i:
-                # assert start + 1 == end
-                if n > sub[end][0]:
-                    start = end
-                break
-
-            if n < sub[i][0]:
-                end = i - 1
-            else:
-                start = i
+        return self.table.choose(prefix)
 
-        # if start + 1 == len(sub):
-        #     assert sub[start][0] <= n
-        # else:
-        #     assert sub[start][0] <= n <= sub[start + 1][0]
+    def transitions(self, state: str) -> List[Tuple[str, float]]:
+        """
+        Get the probability of each character that choose could pick after a
+        string ending with state.
+        """
 
-        return sub[start][1]
+        return self.table.transitions(state[-self.size :])
 
 
 class MultiMarkov(Markov):
     def __init__(
         self,
-        lookups: List[Dict[str, List[Tuple[float, str]]]],
+        tables: List[Table],
         max_size: int,
         terminal: str,
+        endings: Optional["Endings"] = None,
     ):
-        super().__init__({}, max_size, terminal)
+        super().__init__(Table({}, array("d"), ""), max_size, terminal, endings)
 
         self.markovs = [
-            Markov(lookup, i + 1, terminal) for i, lookup in enumerate(lookups)
+            Markov(table, i + 1, terminal) for i, table in enumerate(tables)
         ]
         assert len(self.markovs) == self.size
 
     def choose(self, prefix: str) -> str:
+        markovs = self.markovs
         while True:
-            markov = self.markovs[int(random.triangular(0, len(self.markovs)))]
-            try:
-                return markov.choose(prefix)
-            except KeyError:
-                # oh boi
-                continue
+            markov = markovs[int(random.triangular(0, len(markovs)))]
+
+            # not every prefix is in every table, so keep trying until one is
+            span = markov.table.ranges.get(prefix[-markov.size :])
+            if span is not None:
+                return markov.table.pick(*span)
+
+    def transitions(self, state: str) -> List[Tuple[str, float]]:
+        weights = _triangular(len(self.markovs))
+        known = [
+            (weight, markov)
+            for weight, markov in zip(weights, self.markovs)
+            if state[-markov.size :] in markov.table.ranges
+        ]
+        total = sum(weight for weight, _ in known)
+
+        probs: Dict[str, float] = {}
+        for weight, markov in known:
+            for ch, prob in markov.transitions(state):
+                probs[ch] = probs.get(ch, 0.0) + weight / total * prob
+        return list(probs.items())
+
+
+@functools.lru_cache(maxsize=None)
+def _triangular(count: int) -> List[float]:
+    """
+    Get the probability of int(random.triangular(0, count)) being each of
+    0 to count - 1.
+    """
+
+    mode = count / 2
+
+    def cdf(x: float) -> float:
+        if x <= mode:
+            return x * x / (count * mode)
+        return 1 - (count - x) ** 2 / (count * (count - mode))
+
+    return [cdf(i + 1) - cdf(i) for i in range(count)]
+
+
+class Endings:
+    """
+    The probability of a markov model ending a string within k more
+    characters, from each of its states, for every k up to horizon.
+
+    The state of a markov model is the end of the string it has generated so
+    far, as long as the longest prefix the model looks at. The states are kept
+    separated by spaces in a single string, and only split when first used.
+    """
+
+    __slots__ = ("states", "probs", "horizon", "_index")
+
+    def __init__(self, states: str, probs: Sequence[float], horizon: int):
+        self.states = states
+        self.probs = probs
+        self.horizon = horizon
+        self._index: Optional[Dict[str, int]] = None
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """
+        The offset of the probabilities for each state.
+        """
+
+        if self._index is None:
+            stride = self.horizon + 1
+            self._index = {
+                state: i * stride for i, state in enumerate(self.states.split(" "))
+            }
+        return self._index
+
+    def within(self, state: str, k: int) -> float:
+        if k < 0:
+            return 0.0
+        assert k <= self.horizon
+
+        offset = self.index.get(state)
+        if offset is None:
+            return 0.0
+        return self.probs[offset + k]
+
+    @staticmethod
+    def compute(markov: Markov, horizon: int) -> "Endings":
+        # find every state reachable from the empty string
+        states = [""]
+        index = {"": 0}
+        ends: List[float] = []
+        moves: List[List[Tuple[float, int]]] = []
+        while len(moves) < len(states):
+            state = states[len(moves)]
+            end = 0.0
+            move = []
+            for ch, prob in markov.transitions(state):
+                if ch == markov.terminal:
+                    end += prob
+                    continue
+
+                following = (state + ch)[-markov.size :]
+                if following not in index:
+                    index[following] = len(states)
+                    states.append(following)
+                move.append((prob, index[following]))
+            ends.append(end)
+            moves.append(move)
+
+        probs = array("d", [0.0]) * (len(states) * (horizon + 1))
+        exact = ends
+        within = [0.0] * len(states)
+        for k in range(horizon + 1):
+            if k > 0:
+                # ending in exactly k more is moving on, and then ending in k - 1
+                exact = [sum(prob * exact[j] for prob, j in move) for move in moves]
+            for i, prob in enumerate(exact):
+                within[i] += prob
+                probs[i * (horizon + 1) + k] = within[i]
+
+        if any(" " in state for state in states):
+            raise ValueError("states cannot contain spaces")
+        return Endings(" ".join(states), probs, horizon)
+
+
+class LengthSampler:
+    """
+    Generate strings from a markov model with lengths between min_size and
+    max_size, without generating (and rejecting) any others.
+
+    Each character is drawn from the model as usual, but only kept with the
+    probability that the string can still end at an allowed length after it
+    (and is otherwise drawn again), which gives the same distribution as
+    generating whole strings until one is the right length.
+    """
+
+    def __init__(self, markov: Markov, endings: Endings, min_size: int, max_size: int):
+        assert max_size <= endings.horizon
+
+        self.markov = markov
+        self.endings = endings
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def probability(self) -> float:
+        """
+        Get the probability of the markov model generating a string of an
+        allowed length by itself.
+        """
+
+        endings = self.endings
+        return endings.within("", self.max_size) - endings.within("", self.min_size - 1)
+
+    def worthwhile(self) -> bool:
+        """
+        Check whether enough strings have a length that isn't allowed for
+        sampling to be worth checking every character.
+        """
+
+        # if nearly every string has an allowed length anyway, rejecting the
+        # few that don't is quicker than checking every character
+        return 0 < self.probability() < 0.9
+
+    def generate(self, exclude: Container[str] = ()) -> str:
+        return self.generate_batch(1, exclude)[0]
+
+    def generate_batch(self, count: int, exclude: Container[str] = ()) -> List[str]:
+        """
+        Generate count different strings together, a character of each at a
+        time.
+        """
+
+        choose = self.markov.choose
+        index = self.endings.index
+        probs = self.endings.probs
+        size = self.markov.size
+        terminal = self.markov.terminal
+        min_size = self.min_size
+        max_size = self.max_size
+
+        # a dict rather than a set, to keep the order they were completed in
+        complete: Dict[str, None] = {}
+        active = [""] * count
+        while active:
+            growing = []
+            for result in active:
+                ch = choose(result)
+                if ch == terminal:
+                    if len(result) < min_size:
+                        growing.append(result)
+                    elif result not in exclude and result not in complete:
+                        complete[result] = None
+                    else:
+                        # drop the last character to choose it again, as in
+                        # Markov.generate_batch
+                        growing.append(result[:-1])
+                    continue
+
+                # the lengths the rest of the string can have after this
+                # character
+                lower = min_size - len(result) - 1
+                upper = max_size - len(result) - 1
+                offset = index.get((result + ch)[-size:])
+                if upper >= 0 and offset is not None:
+                    # keep the character with the probability of ending within
+                    # upper more characters, but not within lower - 1
+                    n = random.random()
+                    if n < probs[offset + upper] and (
+                        lower <= 0 or probs[offset + lower - 1] <= n
+                    ):
+                        result += ch
+                growing.append(result)
+            active = growing
+
+        return list(complete)
+
+
+@functools.lru_cache(maxsize=None)
+def _sampler(markov: Markov, min_size: int, max_size: int) -> Optional[LengthSampler]:
+    if markov.endings is None or max_size > markov.endings.horizon:
+        return None
+
+    sampler = LengthSampler(markov, markov.endings, min_size, max_size)
+    if not sampler.worthwhile():
+        return None
+    return sampler
 
 
 class MarkovWrapper:
@@ -119,37 +585,100 @@ class MarkovWrapper:
 
         self.min_size, self.max_size = size_range
 
-        self._exclude: Set[str]
-        if exclude is None:
-            self._exclude = set()
-        else:
-            self._exclude = exclude
+        self._used = set() if exclude is None else exclude
+        self._exclude = Exclusions(self._used)
+
+        # names are only generated with an allowed length, if the model has
+        # the precomputed endings to do so
+        self.sampler = _sampler(markov, self.min_size, self.max_size)
+        self.rejected = 0
 
     def generate(self) -> str:
         while True:
-            result = self.markov.generate()
-            if not self.min_size <= len(result) <= self.max_size:
-                continue
-            if result in self._exclude:
-                continue
-            if result in RESERVED_WORDS:
-                continue
-            if result in C_RESERVED_WORDS:
-                continue
-            if result in ("argc", "argv"):
-                continue
-            if (
-                result in types.CLAIMED
-                or result in functions.CLAIMED
-                or result in variables.CLAIMED
-            ):
-                continue
-
-            break
-
-        self._exclude.add(result)
+            if self.sampler is None:
+                result = self.markov.generate(self._exclude)
+            else:
+                result = self.sampler.generate(self._exclude)
+            if self.allowed(result):
+                break
+
+            self.rejected += 1
+
+        self._used.add(result)
         return result
 
+    def generate_batch(self, count: int) -> List[str]:
+        """
+        Generate count unique names at once.
+
+        This is quicker than calling generate repeatedly, since the candidates
+        are grown together, and without a sampler, any that grow too long are
+        abandoned straight away, rather than being finished and then rejected.
+        """
+
+        results: List[str] = []
+        while len(results) < count:
+            needed = count - len(results)
+            if self.sampler is None:
+                candidates = self.markov.generate_batch(
+                    needed, self.max_size, self._exclude
+                )
+            else:
+                candidates = self.sampler.generate_batch(needed, self._exclude)
+            self.rejected += needed - len(candidates)
+
+            for result in candidates:
+                if self.allowed(result):
+                    self._used.add(result)
+                    results.append(result)
+                else:
+                    self.rejected += 1
+
+        return results
+
+    def allowed(self, name: str) -> bool:
+        if not self.min_size <= len(name) <= self.max_size:
+            return False
+        if name in self._exclude:
+            return False
+
+        return True
+
+
+class Exclusions(Container[str]):
+    """
+    The names that can't be generated: every reserved name, along with the
+    names that have already been used.
+    """
+
+    __slots__ = ("reserved", "used")
+
+    def __init__(self, used: Set[str]):
+        self.reserved = _reserved()
+        self.used = used
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.reserved or name in self.used
+
+
+@functools.lru_cache(maxsize=None)
+def _reserved() -> FrozenSet[str]:
+    """
+    Get every name that can never be generated, in a single set.
+
+    The claimed builtins are loaded all at once, rather than looking up each
+    generated name in the database.
+    """
+
+    return frozenset().union(
+        RESERVED_WORDS,
+        C_RESERVED_WORDS,
+        ("argc", "argv"),
+        types.CLAIMED,
+        functions.CLAIMED,
+        variables.CLAIMED,
+    )
+
 
 C_RESERVED_WORDS = {
     "and",
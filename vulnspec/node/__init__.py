@@ -37,6 +37,7 @@ from .types import (
     PointerTypeNode,
     SimpleTypeNode,
     TypeNode,
+    intern_type,
     type_check,
 )
 from .value import (
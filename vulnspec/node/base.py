@@ -6,6 +6,8 @@ X = TypeVar("X")
 
 
 class Node:
+    __slots__ = ("token_start", "token_end")
+
     def __init__(self):
         self.token_start = None
         self.token_end = None
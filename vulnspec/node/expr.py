@@ -94,6 +94,8 @@ BITWISE_OPERATORS = (
 
 
 class SizeOfExprNode(Node):
+    __slots__ = ("target",)
+
     def __init__(self, target: ExpressionNode):
         super().__init__()
         self.target = target
@@ -103,6 +105,8 @@ class SizeOfExprNode(Node):
 
 
 class SizeOfTypeNode(Node):
+    __slots__ = ("target",)
+
     def __init__(self, target: TypeNode):
         super().__init__()
         self.target = target
@@ -112,6 +116,8 @@ class SizeOfTypeNode(Node):
 
 
 class LiteralExpressionNode(Node):
+    __slots__ = ("content",)
+
     def __init__(self, content: str):
         super().__init__()
         self.content = content
@@ -121,6 +127,8 @@ class LiteralExpressionNode(Node):
 
 
 class CastNode(Node):
+    __slots__ = ("expr", "cast")
+
     def __init__(self, expr: ExpressionNode, tp: TypeNode):
         super().__init__()
         self.expr = expr
@@ -131,15 +139,20 @@ class CastNode(Node):
 
 
 class VariableNode(Node):
-    def __init__(self, name: str):
+    __slots__ = ("name", "symbol")
+
+    def __init__(self, name: str, symbol: int):
         super().__init__()
         self.name = name
+        self.symbol = symbol
 
     def accept(self, visitor: Visitor[X]) -> X:
         return visitor.visit_variable(self)
 
 
 class DerefNode(Node):
+    __slots__ = ("target",)
+
     def __init__(self, target: ExpressionNode):
         super().__init__()
         self.target = target
@@ -149,6 +162,8 @@ class DerefNode(Node):
 
 
 class ArrayNode(Node):
+    __slots__ = ("target", "index")
+
     def __init__(self, target: ExpressionNode, index: ExpressionNode):
         super().__init__()
         self.target = target
@@ -159,6 +174,8 @@ class ArrayNode(Node):
 
 
 class RefNode(Node):
+    __slots__ = ("target",)
+
     def __init__(self, target: LvalueNode):
         super().__init__()
         self.target = target
@@ -168,6 +185,8 @@ class RefNode(Node):
 
 
 class UnaryOperationNode(Node):
+    __slots__ = ("op", "item")
+
     def __init__(self, op: Operator, item: ExpressionNode):
         super().__init__()
         self.op = op
@@ -178,6 +197,8 @@ class UnaryOperationNode(Node):
 
 
 class BinaryOperationNode(Node):
+    __slots__ = ("op", "left", "right")
+
     def __init__(self, op: Operator, left: ExpressionNode, right: ExpressionNode):
         super().__init__()
         self.op = op
@@ -189,6 +210,8 @@ class BinaryOperationNode(Node):
 
 
 class FunctionNode(Node):
+    __slots__ = ("target", "arguments")
+
     def __init__(self, target: ExpressionNode, arguments: List[ExpressionNode]):
         super().__init__()
         self.target = target
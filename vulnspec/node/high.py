@@ -1,5 +1,6 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+from ..common.symbols import SymbolTable
 from .base import Node, X
 from .expr import ExpressionNode
 from .stmt import StatementNode
@@ -9,11 +10,18 @@ from .visitor import Visitor
 
 
 class DeclarationNode(Node):
+    __slots__ = ("name", "symbol", "vartype", "initial")
+
     def __init__(
-        self, name: str, vartype: TypeNode, initial: Optional[ExpressionNode] = None
+        self,
+        name: str,
+        symbol: int,
+        vartype: TypeNode,
+        initial: Optional[ExpressionNode] = None,
     ):
         super().__init__()
         self.name = name
+        self.symbol = symbol
         self.vartype = vartype
         self.initial = initial
 
@@ -22,6 +30,8 @@ class DeclarationNode(Node):
 
 
 class ChunkNode(Node):
+    __slots__ = ("variables", "constraints")
+
     def __init__(self, variables: List[DeclarationNode], constraints: List[str]):
         super().__init__()
         self.variables = variables
@@ -32,6 +42,8 @@ class ChunkNode(Node):
 
 
 class ExternChunkNode(ChunkNode):
+    __slots__ = ()
+
     def __init__(self, variables: List[DeclarationNode]):
         super().__init__(variables, [])
 
@@ -40,31 +52,47 @@ class ExternChunkNode(ChunkNode):
 
 
 class BlockNode(Node):
+    __slots__ = ("name", "symbol", "statements", "constraints", "body")
+
     def __init__(
-        self, name: str, statements: List[StatementNode], constraints: List[str]
+        self,
+        name: str,
+        symbol: int,
+        statements: List[StatementNode],
+        constraints: List[str],
+        body: Optional[Tuple[int, int]] = None,
     ):
         super().__init__()
         self.name = name
+        self.symbol = symbol
         self.statements = statements
         self.constraints = constraints
 
+        # the span of a body that has been skipped over by a lazy parse, and
+        # is yet to be parsed into statements
+        self.body = body
+
     def accept(self, visitor: Visitor[X]) -> X:
         return visitor.visit_block(self)
 
 
 class SpecNode(Node):
+    __slots__ = ("chunks", "blocks", "templates", "includes", "symbols")
+
     def __init__(
         self,
         chunks: List[ChunkNode],
         blocks: List[BlockNode],
         templates: List[TemplateValueNode],
         includes: List[str],
+        symbols: SymbolTable,
     ):
         super().__init__()
         self.chunks = chunks
         self.blocks = blocks
         self.templates = templates
         self.includes = includes
+        self.symbols = symbols
 
     def accept(self, visitor: Visitor[X]) -> X:
         return visitor.visit_spec(self)
@@ -16,6 +16,8 @@ StatementNode = Union[
 
 
 class LiteralStatementNode(Node):
+    __slots__ = ("content",)
+
     def __init__(self, content: str):
         super().__init__()
         self.content = content
@@ -25,20 +27,27 @@ class LiteralStatementNode(Node):
 
 
 class CallNode(Node):
-    def __init__(self, target: str):
+    __slots__ = ("target", "symbol")
+
+    def __init__(self, target: str, symbol: int):
         super().__init__()
         self.target = target
+        self.symbol = symbol
 
     def accept(self, visitor: Visitor[X]) -> X:
         return visitor.visit_call(self)
 
 
 class SplitNode(Node):
+    __slots__ = ()
+
     def accept(self, visitor: Visitor[X]) -> X:
         return visitor.visit_split(self)
 
 
 class AssignmentNode(Node):
+    __slots__ = ("target", "expression")
+
     def __init__(self, target: LvalueNode, expression: ExpressionNode):
         super().__init__()
         self.target = target
@@ -49,6 +58,8 @@ class AssignmentNode(Node):
 
 
 class IfNode(Node):
+    __slots__ = ("condition", "statements", "else_if", "else_statements")
+
     def __init__(
         self,
         condition: ExpressionNode,
@@ -73,6 +84,8 @@ class IfNode(Node):
 
 
 class WhileNode(Node):
+    __slots__ = ("condition", "statements")
+
     def __init__(
         self,
         condition: ExpressionNode,
@@ -87,6 +100,8 @@ class WhileNode(Node):
 
 
 class ExpressionStatementNode(Node):
+    __slots__ = ("expression",)
+
     def __init__(self, expression: ExpressionNode):
         super().__init__()
         self.expression = expression
@@ -1,6 +1,7 @@
-from typing import List, Union
+from typing import Any, Dict, List, Set, Tuple, Union
 
 from ..builtins import MetaType, MetaTypes, types
+from ..common.symbols import split_namespace
 from .base import Node, X
 from .value import IntValueNode, TemplateValueNode
 from .visitor import Visitor
@@ -15,6 +16,8 @@ TypeNode = Union[
 
 
 class SimpleTypeNode(Node):
+    __slots__ = ("core",)
+
     def __init__(self, core: str):
         super().__init__()
         self.core = core
@@ -31,6 +34,8 @@ class SimpleTypeNode(Node):
 
 
 class MetaTypeNode(Node):
+    __slots__ = ("core",)
+
     def __init__(self, core: MetaType):
         super().__init__()
         self.core = core
@@ -49,6 +54,8 @@ class MetaTypeNode(Node):
 
 
 class PointerTypeNode(Node):
+    __slots__ = ("base",)
+
     def __init__(self, base: TypeNode):
         super().__init__()
         self.base = base
@@ -65,6 +72,8 @@ class PointerTypeNode(Node):
 
 
 class ArrayTypeNode(Node):
+    __slots__ = ("base", "size")
+
     def __init__(
         self, base: TypeNode, size: Union[None, IntValueNode, TemplateValueNode]
     ):
@@ -84,6 +93,8 @@ class ArrayTypeNode(Node):
 
 
 class FuncTypeNode(Node):
+    __slots__ = ("ret", "args", "variadic")
+
     def __init__(self, ret: TypeNode, args: List[TypeNode], variadic: bool = False):
         super().__init__()
         self.ret = ret
@@ -108,32 +119,119 @@ def metatype_is_reachable(start: MetaType, destination: MetaType) -> bool:
     if MetaTypes.Universal in (start, destination):
         return True
 
-    stack = [start]
-    while len(stack) > 0:
-        expand = stack.pop()
-        for conn in types.META_GRAPH[expand]:
-            if conn in stack:
-                continue
+    # precomputed when the builtins were loaded
+    dest = types.META_IDS.get(destination)
+    if dest is None:
+        return False
+    return bool(types.META_REACHABLE[types.META_IDS[start]] >> dest & 1)
+
+
+# canonical instances of each type, see intern_type()
+_INTERNED: Dict[Tuple[Any, ...], TypeNode] = {}
+_CANONICAL: Set[int] = set()
+
+# results of type_check() on canonical types, keyed on their ids (which are
+# never reused, since canonical types live forever)
+_CHECKED: Dict[Tuple[int, int, bool], bool] = {}
+
+
+def intern_type(tp: TypeNode) -> TypeNode:
+    """
+    Get the canonical instance of a type, so that structurally equal types are
+    always the same object.
+
+    Canonical types are shared, so they have no position in the source, and
+    must never be modified.
+
+    Arrays with a size that isn't an integer (and anything built from them)
+    can't be compared structurally, so they're returned as they are, instead
+    of being kept alive forever in the interning tables.
+    """
+
+    if id(tp) in _CANONICAL:
+        return tp
+
+    key: Tuple[Any, ...]
+    if isinstance(tp, SimpleTypeNode):
+        key = (SimpleTypeNode, tp.core)
+    elif isinstance(tp, MetaTypeNode):
+        key = (MetaTypeNode, tp.core)
+    elif isinstance(tp, PointerTypeNode):
+        base = intern_type(tp.base)
+        if id(base) not in _CANONICAL:
+            return tp
+        key = (PointerTypeNode, id(base))
+    elif isinstance(tp, ArrayTypeNode):
+        base = intern_type(tp.base)
+        if id(base) not in _CANONICAL:
+            return tp
+        if tp.size is None:
+            key = (ArrayTypeNode, id(base), None)
+        elif isinstance(tp.size, IntValueNode):
+            key = (ArrayTypeNode, id(base), tp.size.value)
+        else:
+            # templates should have been instantiated by now, so don't try
+            # to share these
+            return tp
+    elif isinstance(tp, FuncTypeNode):
+        ret = intern_type(tp.ret)
+        args = [intern_type(arg) for arg in tp.args]
+        if any(id(part) not in _CANONICAL for part in (ret, *args)):
+            return tp
+        key = (FuncTypeNode, id(ret), *(id(arg) for arg in args), tp.variadic)
+    else:
+        raise RuntimeError()
+
+    canonical = _INTERNED.get(key)
+    if canonical is None:
+        if isinstance(tp, SimpleTypeNode):
+            canonical = SimpleTypeNode(tp.core)
+        elif isinstance(tp, MetaTypeNode):
+            canonical = MetaTypeNode(tp.core)
+        elif isinstance(tp, PointerTypeNode):
+            canonical = PointerTypeNode(base)
+        elif isinstance(tp, ArrayTypeNode):
+            size = None
+            if isinstance(tp.size, IntValueNode):
+                # a copy without a position, so that the source isn't kept
+                # alive along with the canonical type
+                size = IntValueNode(tp.size.value, tp.size.base)
+            canonical = ArrayTypeNode(base, size)
+        else:
+            canonical = FuncTypeNode(ret, args, tp.variadic)
+
+        _INTERNED[key] = canonical
+        _CANONICAL.add(id(canonical))
+
+    return canonical
+
+
+VOID_TYPE = intern_type(MetaTypeNode(MetaTypes.Void))
 
-            if conn == destination:
-                return True
 
-            stack.append(conn)
+def type_check(ctx: TypeNode, tp: TypeNode, strict: bool = False) -> bool:
+    if id(ctx) in _CANONICAL and id(tp) in _CANONICAL:
+        key = (id(ctx), id(tp), strict)
+        result = _CHECKED.get(key)
+        if result is None:
+            result = _type_check(ctx, tp, strict)
+            _CHECKED[key] = result
+        return result
 
-    return False
+    return _type_check(ctx, tp, strict)
 
 
-def type_check(ctx: TypeNode, tp: TypeNode, strict: bool = False) -> bool:
+def _type_check(ctx: TypeNode, tp: TypeNode, strict: bool = False) -> bool:
     if isinstance(ctx, MetaTypeNode) or isinstance(tp, MetaTypeNode):
         return metatype_is_reachable(tp.meta, ctx.meta)
     elif isinstance(ctx, SimpleTypeNode) and isinstance(tp, SimpleTypeNode):
         if ctx.core == "void":
-            return type_check(MetaTypeNode(MetaTypes.Void), tp, strict=strict)
+            return type_check(VOID_TYPE, tp, strict=strict)
         if tp.core == "void":
-            return type_check(ctx, MetaTypeNode(MetaTypes.Void), strict=strict)
+            return type_check(ctx, VOID_TYPE, strict=strict)
 
-        lcore = ctx.core.split("@")[0]
-        rcore = tp.core.split("@")[0]
+        lcore, _ = split_namespace(ctx.core)
+        rcore, _ = split_namespace(tp.core)
         if lcore == rcore:
             return True
     elif isinstance(ctx, (ArrayTypeNode, PointerTypeNode)) and isinstance(
@@ -6,11 +6,15 @@ from .visitor import Visitor
 
 
 class ValueNode(Node):
+    __slots__ = ()
+
     def accept(self, visitor: Visitor[X]) -> X:
         return visitor.visit_value(self)
 
 
 class IntValueNode(ValueNode):
+    __slots__ = ("value", "base")
+
     def __init__(self, value: int, base: int):
         super().__init__()
         self.value = value
@@ -21,6 +25,8 @@ class IntValueNode(ValueNode):
 
 
 class FloatValueNode(ValueNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left: int, right: int):
         super().__init__()
         self.left = left
@@ -31,6 +37,8 @@ class FloatValueNode(ValueNode):
 
 
 class BoolValueNode(ValueNode):
+    __slots__ = ("value",)
+
     def __init__(self, value: bool):
         super().__init__()
         self.value = value
@@ -43,6 +51,8 @@ class BoolValueNode(ValueNode):
 
 
 class StringValueNode(ValueNode):
+    __slots__ = ("value",)
+
     def __init__(self, value: str):
         super().__init__()
         self.value = value
@@ -52,6 +62,8 @@ class StringValueNode(ValueNode):
 
 
 class TemplateValueNode(ValueNode):
+    __slots__ = ("name", "definition")
+
     def __init__(self, name: str, definition: Optional[str]):
         super().__init__()
         self.name = name
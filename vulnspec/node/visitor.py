@@ -402,7 +402,7 @@ class MapVisitor(Visitor[Any]):
         return node
 
     def visit_sizeof_expr(self, node: "SizeOfExprNode") -> "SizeOfExprNode":
-        node.target.accept(self)
+        node.target = node.target.accept(self)
         return node
 
     def visit_sizeof_type(self, node: "SizeOfTypeNode") -> "SizeOfTypeNode":
@@ -23,6 +23,9 @@ class NopTransformer:
         self._chunk_links: Dict[Block, Set[Chunk]] = {}
         self._extern_links: Dict[Block, Set[Chunk]] = {}
 
+        # the asset each nop came from, so that it can be loaded on demand
+        self._assets: Dict[Block, Asset] = {}
+
         for asset in assets:
             have_added = False
             for block in asset.blocks:
@@ -33,20 +36,7 @@ class NopTransformer:
 
                 self._blocks.append(block)
                 self._names.add(block.name)
-
-                trace = Tracer(block)
-                block_vars = trace.variables[block]
-                self._block_links[block] = trace.blocks - set([block])
-                self._chunk_links[block] = {
-                    var.chunk
-                    for var in block_vars
-                    if var.chunk and var.chunk in asset.chunks
-                }
-                self._extern_links[block] = {
-                    var.chunk
-                    for var in block_vars
-                    if var.chunk and var in asset.extern.variables
-                }
+                self._assets[block] = asset
 
             if not have_added:
                 raise RuntimeError("no nops were loaded from asset")
@@ -58,6 +48,29 @@ class NopTransformer:
         if len(self._blocks) == 0:
             raise RuntimeError("no assets were found")
 
+    def _load(self, block: Block):
+        """
+        Load a nop (if it was lazily loaded) and find everything it links to.
+        """
+
+        if block in self._block_links:
+            return
+
+        asset = self._assets[block]
+        asset.resolve(block)
+
+        trace = Tracer(block)
+        block_vars = trace.variables[block]
+        self._block_links[block] = trace.blocks - set([block])
+        self._chunk_links[block] = {
+            var.chunk for var in block_vars if var.chunk and var.chunk in asset.chunks
+        }
+        self._extern_links[block] = {
+            var.chunk
+            for var in block_vars
+            if var.chunk and var in asset.extern.variables
+        }
+
     def transform(self, asset: Asset) -> Asset:
         # check for name collisions
         for block in asset.blocks:
@@ -86,6 +99,7 @@ class NopTransformer:
 
             # create a variation of the block
             nop = random.choice(self._blocks)
+            self._load(nop)
             nblock = Block(
                 generate_unique_name(6),
                 [stmt.map(copier) for stmt in nop.statements],
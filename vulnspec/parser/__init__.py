@@ -1,4 +1,5 @@
 from .error import LexError, ParseError
-from .lexer import Lexer
+from .incremental import IncrementalParser
+from .lexer import Lexer, RegexLexer
 from .parser import Parser
 from .token import Token, TokenType
@@ -0,0 +1,295 @@
+import bisect
+from typing import Iterator, List, Optional, Tuple, TypeVar
+
+from ..common.error import ErrorLocation, SynthError
+from ..common.symbols import SymbolTable
+from ..node import BlockNode, ChunkNode, SpecNode, TemplateValueNode
+from .error import LexError, ParseError
+from .lexer import RegexLexer
+from .parser import Parser, TopLevelItem
+from .token import Token, TokenType
+
+E = TypeVar("E", bound=SynthError)
+
+
+class RegionOverrun(Exception):
+    """
+    Indicates that an edited region can't be parsed independently of the rest
+    of the stream.
+    """
+
+
+class _Item:
+    """
+    A single top-level item of a specification, along with the region of the
+    stream that it covers.
+    """
+
+    __slots__ = ("start", "shift", "first", "node")
+
+    def __init__(self, start: int, first: Token, node: TopLevelItem):
+        # where this item's region of the stream begins - this runs up to the
+        # start of the next item, so the regions tile the whole stream
+        self.start = start
+
+        # how far this item has moved since it was lexed, since the tokens
+        # still refer to the stream as it was at that time
+        self.shift = 0
+
+        self.first = first
+        self.node = node
+
+
+class IncrementalParser:
+    """
+    Front end that keeps the parsed items of a specification between edits.
+
+    After an edit, only the top-level chunks, blocks, templates and includes
+    that the edit touches are lexed and parsed again - everything else is
+    reused as-is. Whenever the damage can't be contained to those items, this
+    falls back to parsing the whole stream, so the resulting tree (and any
+    errors) are always the same as those that Parser would produce.
+    """
+
+    def __init__(self, stream: str = ""):
+        self.stream = stream
+        self.symbols = SymbolTable()
+
+        self._items: Optional[List[_Item]] = None
+        self._spec: Optional[SpecNode] = None
+
+    @property
+    def spec(self) -> SpecNode:
+        """
+        The tree for the current stream, parsing it if needed.
+        """
+
+        if self._spec is None:
+            self._reparse()
+        assert self._spec is not None
+        return self._spec
+
+    def update(self, stream: str) -> SpecNode:
+        """
+        Replace the entire stream, working out which part of it has changed.
+        """
+
+        old = self.stream
+
+        # find the common prefix and suffix by bisection, since comparing
+        # slices is much faster than comparing character by character
+        lo, hi = 0, min(len(old), len(stream))
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if old[lo:mid] == stream[lo:mid]:
+                lo = mid
+            else:
+                hi = mid - 1
+        prefix = lo
+
+        lo, hi = 0, min(len(old), len(stream)) - prefix
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if (
+                old[len(old) - mid : len(old) - lo]
+                == stream[len(stream) - mid : len(stream) - lo]
+            ):
+                lo = mid
+            else:
+                hi = mid - 1
+        suffix = lo
+
+        return self.edit(
+            prefix, len(old) - suffix, stream[prefix : len(stream) - suffix]
+        )
+
+    def edit(self, start: int, end: int, text: str) -> SpecNode:
+        """
+        Replace the section of the stream from start to end with some text.
+        """
+
+        old = self.stream
+        self.stream = old[:start] + text + old[end:]
+        delta = len(text) - (end - start)
+
+        items = self._items
+        if not items:
+            return self._reparse()
+
+        starts = [item.start for item in items]
+
+        # an edit right at the boundary between two items may well affect the
+        # item before (for example, by deleting the newline between them)
+        first = bisect.bisect_right(starts, start) - 1
+        if first > 0 and starts[first] == start:
+            first -= 1
+        last = bisect.bisect_right(starts, end) - 1
+
+        region_start = starts[first]
+        if last + 1 < len(items):
+            region_end = starts[last + 1] + delta
+        else:
+            region_end = len(self.stream)
+
+        # if anything goes wrong, the items no longer match the stream, and
+        # the next edit must start again from scratch
+        self._items = None
+        self._spec = None
+        try:
+            replacements = self._parse_region(region_start, region_end)
+        except (LexError, ParseError, RegionOverrun):
+            # this may be an error, or the edit may have changed the meaning
+            # of the items around it, so get a definitive answer
+            return self._reparse()
+        self._items = items
+
+        for item in items[last + 1 :]:
+            item.start += delta
+            item.shift += delta
+        items[first : last + 1] = replacements
+        if items:
+            items[0].start = 0
+
+        self._spec = self._build()
+        return self._spec
+
+    def relocate(self, err: E) -> E:
+        """
+        Move the location of an error raised against an old version of the
+        stream (by a later pass over a reused item) onto the current stream.
+        """
+
+        stream = getattr(err, "stream", None)
+        location = getattr(err, "location", None)
+        if stream is None or location is None:
+            return err
+        if stream is self.stream or not self._items:
+            return err
+
+        found = None
+        for item in self._items:
+            if item.first.stream is not stream:
+                continue
+            if item.start - item.shift > location.start:
+                break
+            found = item
+
+        if found is not None:
+            location = ErrorLocation(
+                location.start + found.shift, location.end + found.shift
+            )
+            setattr(err, "location", location)
+            setattr(err, "stream", self.stream)
+
+        return err
+
+    def _reparse(self) -> SpecNode:
+        self._items = None
+        self._spec = None
+
+        # start a new symbol table, so it doesn't keep every name that's ever
+        # been typed over the course of many edits
+        self.symbols = SymbolTable()
+
+        self._items = self._parse_region(0, len(self.stream))
+        self._spec = self._build()
+        return self._spec
+
+    def _parse_region(self, start: int, end: int) -> List[_Item]:
+        """
+        Parse the items in a region of the stream.
+        """
+
+        parser = Parser(self._region_tokens(start, end), self.symbols)
+        parser.advance()
+
+        items: List[_Item] = []
+        for first, node in parser.items():
+            if items:
+                item_start, _ = _token_range(first)
+            else:
+                item_start = start
+            items.append(_Item(item_start, first, node))
+
+        return items
+
+    def _region_tokens(self, start: int, end: int) -> Iterator[Token]:
+        """
+        Lex the tokens in a region of the stream, ending with an EOF.
+
+        If the region doesn't end cleanly between two items, or the parser
+        tries to read past the end of the region, this raises RegionOverrun.
+        """
+
+        tokens = RegexLexer(self.stream, start).tokens()
+        if end == len(self.stream):
+            # this is the real end of the stream
+            yield from tokens
+            return
+
+        for token in tokens:
+            token_start, token_end = _token_range(token)
+            if token_start == end and token.ttype != TokenType.EOF:
+                break
+            if token.ttype == TokenType.EOF or token_end > end:
+                raise RegionOverrun()
+
+            yield token
+
+        yield Token(self.stream, end, 1, TokenType.EOF)
+
+        # accepting the EOF pulls in one more token, but a parser that tries
+        # to go any further than that has run on past the end of the region
+        yield Token(self.stream, end, 0, TokenType.Unknown)
+        raise RegionOverrun()
+
+    def _build(self) -> SpecNode:
+        assert self._items is not None
+
+        chunks = []
+        blocks = []
+        templs = []
+        includes = []
+        for item in self._items:
+            if isinstance(item.node, ChunkNode):
+                chunks.append(item.node)
+            elif isinstance(item.node, BlockNode):
+                blocks.append(item.node)
+            elif isinstance(item.node, TemplateValueNode):
+                templs.append(item.node)
+            else:
+                includes.append(item.node)
+
+        spec = SpecNode(chunks, blocks, templs, includes, self.symbols)
+
+        # the spec covers the whole of the current stream
+        if self._items:
+            first = self._items[0].first
+            spec.token_start = Token(
+                self.stream,
+                first.position + self._items[0].shift,
+                first.length,
+                first.ttype,
+                first.lexeme,
+            )
+        else:
+            spec.token_start = Token(self.stream, len(self.stream), 1, TokenType.EOF)
+        spec.token_end = Token(self.stream, len(self.stream), 1, TokenType.EOF)
+
+        return spec
+
+
+def _token_range(token: Token) -> Tuple[int, int]:
+    """
+    Find the start and end offsets of a token in its stream.
+    """
+
+    if token.ttype == TokenType.Newline:
+        return token.position, token.position + 1
+    elif token.ttype == TokenType.Literal:
+        # literals are positioned at their start, with their end as the length
+        return token.position, token.length
+    elif token.ttype == TokenType.EOF:
+        return token.position, token.position
+    else:
+        return token.position - token.length, token.position
@@ -1,3 +1,4 @@
+import re
 import string
 from typing import Dict, Iterable, List, Optional, Tuple, Union
 
@@ -305,38 +306,61 @@ class Lexer:
         return s
 
     def _try_read_template(self) -> Optional[Tuple[str, Optional[str]]]:
-        state = (self.n, self.ch, self.ch_prev)
-        try:
-            if self.ch != "<":
-                raise LexError(
-                    self.stream, state[0], self.n, "start of template not found"
-                )
-            self._advance()
+        """
+        Attempt to read a template, in the form <name> or <name; definition>.
 
-            name = self._read_name()
-            while self._isspace() and self.ch != "\n":
-                self._advance()
+        Since most "<"s are just comparisons, this is a lookahead over the
+        stream that only moves the lexer forward once it's certain that it's
+        found a template.
+        """
 
-            if self.ch == ";":
-                self._advance()
-                start = self.n
-                while self.ch is not None and self.ch != ">":
-                    self._advance()
-                if self.ch != ">":
-                    raise LexError(self.stream, state[0], self.n, "unfinished template")
+        if self.ch != "<":
+            return None
 
-                self._advance()
-                return (name, self.stream[start : self.n - 1].strip())
-            elif self.ch == ">":
-                self._advance()
-                return (name, None)
-            else:
-                raise LexError(self.stream, state[0], self.n, "invalid template")
-        except LexError:
-            pass
+        stream = self.stream
+        length = len(stream)
+
+        # the first character of the name can be anything
+        start = self.n + 1
+        if start >= length:
+            return None
 
-        self.n, self.ch, self.ch_prev = state
-        return None
+        i = start + 1
+        in_type = False
+        while i < length:
+            ch = stream[i]
+            if ch == "@":
+                in_type = True
+            elif not (
+                ch == "_"
+                or "a" <= ch <= "z"
+                or "A" <= ch <= "Z"
+                or "0" <= ch <= "9"
+                or (in_type and ch == ".")
+            ):
+                break
+            i += 1
+        name = stream[start:i]
+
+        while i < length and stream[i] in (" ", "\t"):
+            i += 1
+
+        definition = None
+        if i >= length:
+            return None
+        elif stream[i] == ">":
+            i += 1
+        elif stream[i] == ";":
+            close = stream.find(">", i + 1)
+            if close == -1:
+                return None
+            definition = stream[i + 1 : close].strip()
+            i = close + 1
+        else:
+            return None
+
+        self._skip(i - self.n)
+        return (name, definition)
 
     def _advance(self):
         self.ch_prev = self.ch
@@ -384,3 +408,207 @@ class Lexer:
             or "A" <= self.ch <= "Z"
             or "0" <= self.ch <= "9"
         )
+
+
+FOLLOW_CHARS = frozenset(" \t\n") | frozenset(SIMPLE_TOKENS)
+
+
+def _simple_token_table() -> Dict[str, TokenType]:
+    table: Dict[str, TokenType] = {}
+    for first, ttype in SIMPLE_TOKENS.items():
+        if isinstance(ttype, dict):
+            table.update(ttype)
+        else:
+            table[first] = ttype
+    return table
+
+
+SIMPLE_TOKEN_TABLE = _simple_token_table()
+
+# Horizontal whitespace never produces a token, so it is skipped as part of
+# matching whichever token follows it.
+MASTER_PATTERN = re.compile(
+    r"[ \t]*(?:"
+    + "|".join(
+        [
+            r"(?P<newline>\n[ \t]*)",
+            r"(?P<comment>//[^\n]*|/\*(?:[^*]|\*[^/])*\*/)",
+            r"(?P<template><(?P<template_name>(?s:.)[A-Za-z0-9_]*(?:@[A-Za-z0-9_@.]*)?)"
+            + r"[ \t]*(?:;(?P<template_def>[^>]*))?>)",
+            r"(?P<name>[A-Za-z_][A-Za-z0-9_]*(?:@[A-Za-z0-9_@.]*)?)",
+            r"(?P<number>0x[0-9a-f]*|0b[01]*|0o[0-7]*|[0-9]+(?:\.[0-9]*)?)",
+            r"(?P<string>\"[^\"\n]*\"|'[^'\n]*')",
+            r"(?P<simple>"
+            + "|".join(
+                re.escape(target) if target != "/" else r"/(?!\*)"
+                for target in sorted(SIMPLE_TOKEN_TABLE, key=len, reverse=True)
+            )
+            + ")",
+        ]
+    )
+    + ")"
+)
+SPACE_PATTERN = re.compile(r"[ \t]*")
+COMMENT_BODY_PATTERN = re.compile(r"(?:[^*]|\*[^/])*")
+PARENS_PATTERN = re.compile(r"[()]")
+NUMBER_BASES = {"0x": 16, "0b": 2, "0o": 8}
+
+
+class RegexLexer(Lexer):
+    """
+    Table-driven alternative to Lexer, producing an identical token stream.
+
+    Instead of stepping through the input one character at a time, each token
+    is recognised by a single match of a compiled master pattern, with only
+    the rare cases (literals, character literals and errors) handled by hand.
+
+    Lexing may also begin part way through the stream, in which case token
+    positions are still relative to the start of the whole stream.
+    """
+
+    def __init__(self, stream: str, start: int = 0):
+        super().__init__(stream)
+        self.n = start
+
+    def token(self) -> Optional[Token]:
+        stream = self.stream
+        start = self.n
+
+        if start >= len(stream):
+            return Token(stream, start, 1, TokenType.EOF)
+
+        match = MASTER_PATTERN.match(stream, start)
+        if match is None:
+            spaces = SPACE_PATTERN.match(stream, start)
+            assert spaces is not None
+            self.n = spaces.end()
+            if self.n != start:
+                return None
+            return self._token_special()
+
+        kind = match.lastgroup
+        assert kind is not None
+        start = match.start(kind)
+        end = match.end()
+        self.n = end
+
+        # branches are ordered roughly by how common each token kind is
+        if kind == "name":
+            self._check_follow(start, end, "invalid word")
+            name = match.group(kind)
+            if name in RESERVED_WORDS:
+                return Token(stream, end, len(name), TokenType.Reserved, name)
+            else:
+                return Token(stream, end, len(name), TokenType.Name, name)
+        elif kind == "simple":
+            target = match.group(kind)
+            return Token(stream, end, len(target), SIMPLE_TOKEN_TABLE[target])
+        elif kind == "newline":
+            return Token(stream, start, 1, TokenType.Newline)
+        elif kind == "number":
+            self._check_follow(start, end, "invalid number")
+            number = match.group(kind)
+            base = NUMBER_BASES.get(number[:2], 10)
+            if base == 10 and "." in number:
+                lhs, rhs = number.split(".")
+                return Token(
+                    stream, end, len(lhs) + 1 + len(rhs), TokenType.Float, (lhs, rhs)
+                )
+            else:
+                return Token(
+                    stream, end, len(number), TokenType.Integer, (number, base)
+                )
+        elif kind == "string":
+            s = self._unescape(match.group(kind)[1:-1])
+            return Token(stream, end, len(s) + 2, TokenType.String, s)
+        elif kind == "template":
+            # the template group is the outermost group of its alternative, so
+            # lastgroup names it rather than one of its subgroups
+            definition = match.group("template_def")
+            if definition is not None:
+                definition = definition.strip()
+            lexeme = (match.group("template_name"), definition)
+            return Token(stream, end, end - start, TokenType.Template, lexeme)
+        else:
+            # comments produce no tokens
+            return None
+
+    def _token_special(self) -> Token:
+        stream = self.stream
+        start = self.n
+        ch = stream[start]
+
+        if ch == "$" and stream.startswith("(", start + 1):
+            opened = 1
+            end = None
+            for paren in PARENS_PATTERN.finditer(stream, start + 2):
+                opened += 1 if paren.group() == "(" else -1
+                if opened == 0:
+                    end = paren.end()
+                    break
+            if end is None:
+                raise LexError(stream, start + 2, len(stream), "unfinished literal")
+
+            self.n = end
+            return Token(
+                stream,
+                start,
+                self.n,
+                TokenType.Literal,
+                stream[start + 2 : self.n - 1].strip(),
+            )
+        elif ch == "$":
+            # the character lexer swallows the character following a stray $
+            self.n = start + 2
+            return Token(stream, self.n, 1, TokenType.Unknown)
+        elif ch == "/":
+            # only reachable for a multi-line comment that is never closed
+            body = COMMENT_BODY_PATTERN.match(stream, start + 2)
+            assert body is not None
+            end = len(stream) if body.end() == len(stream) else len(stream) + 1
+            raise LexError(stream, start + 1, end, "unfinished comment")
+        elif ch in ("'", '"'):
+            # only reachable for a string that is never closed
+            self._read_str_end(start)
+            raise RuntimeError()
+        elif ch == "#":
+            start += 1
+            if start < len(stream) and stream[start] in ("'", '"'):
+                end = self._read_str_end(start)
+                s = self._unescape(stream[start + 1 : end - 1])
+                if len(s) != 1:
+                    raise LexError(stream, start, end, "char literal is too long")
+
+                self.n = end
+                return Token(stream, end, len(s) + 3, TokenType.Integer, ord(s))
+            elif start < len(stream) and (
+                stream[start] in string.ascii_letters or stream[start] in string.digits
+            ):
+                self.n = start + 1
+                return Token(stream, self.n, 2, TokenType.Integer, ord(stream[start]))
+            else:
+                raise LexError(stream, start, start, "invalid character literal")
+
+        self.n = start + 1
+        return Token(stream, self.n, 1, TokenType.Unknown)
+
+    def _read_str_end(self, start: int) -> int:
+        quote = self.stream[start]
+        for end in range(start + 1, len(self.stream)):
+            ch = self.stream[end]
+            if ch == quote:
+                return end + 1
+            elif ch == "\n":
+                break
+        else:
+            end = len(self.stream)
+
+        raise LexError(self.stream, start, end - 1, "end of string not found")
+
+    def _check_follow(self, start: int, end: int, msg: str):
+        if end < len(self.stream) and self.stream[end] not in FOLLOW_CHARS:
+            raise LexError(self.stream, start, end, msg)
+
+    @staticmethod
+    def _unescape(s: str) -> str:
+        return s.encode("utf8").decode("unicode_escape")
@@ -1,6 +1,8 @@
-from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
 
+from ..common.symbols import SymbolTable
 from ..node import (
+    COMPARISON_OPERATORS,
     ArrayNode,
     ArrayTypeNode,
     AssignmentNode,
@@ -45,23 +47,125 @@ from .token import PRINTABLE_NAMES, ReservedWord, Token, TokenType
 
 N = TypeVar("N", bound=Node)
 
+# Chunks, blocks and templates are parsed to nodes, but includes are just the
+# name of the included file.
+TopLevelItem = Union[ChunkNode, BlockNode, TemplateValueNode, str]
+
+# Binary operators grouped by precedence, from loosest to tightest binding.
+# Every level is right-associative, apart from comparisons which can't be
+# chained at all.
+PRECEDENCE_LEVELS = [
+    (Operator.Or,),
+    (Operator.And,),
+    COMPARISON_OPERATORS,
+    (
+        Operator.Add,
+        Operator.Subtract,
+        Operator.BitwiseAnd,
+        Operator.BitwiseOr,
+        Operator.BitwiseXor,
+    ),
+    (Operator.Multiply, Operator.Divide),
+]
+PRECEDENCE = {op: level for level, ops in enumerate(PRECEDENCE_LEVELS, 1) for op in ops}
+NONASSOCIATIVE_LEVELS = {PRECEDENCE[Operator.Eq]}
+
+BINARY_OPERATORS = {
+    ttype: (op, PRECEDENCE[op])
+    for ttype, op in {
+        TokenType.BooleanOr: Operator.Or,
+        TokenType.BooleanAnd: Operator.And,
+        TokenType.CompareNE: Operator.Neq,
+        TokenType.CompareEQ: Operator.Eq,
+        TokenType.CompareLT: Operator.Lt,
+        TokenType.CompareLE: Operator.Lte,
+        TokenType.CompareGT: Operator.Gt,
+        TokenType.CompareGE: Operator.Gte,
+        TokenType.Plus: Operator.Add,
+        TokenType.Minus: Operator.Subtract,
+        TokenType.BitwiseAnd: Operator.BitwiseAnd,
+        TokenType.BitwiseOr: Operator.BitwiseOr,
+        TokenType.BitwiseXor: Operator.BitwiseXor,
+        TokenType.Times: Operator.Multiply,
+        TokenType.Divide: Operator.Divide,
+    }.items()
+}
+UNARY_OPERATORS = {
+    TokenType.BooleanNot: Operator.Not,
+    TokenType.BitwiseNot: Operator.BitwiseNot,
+    TokenType.Minus: Operator.Negate,
+}
+
+
+class TokenWindow:
+    """
+    Random-access view over a stream of tokens that only keeps the tokens the
+    parser may still need to look at.
+
+    Tokens are pulled from the underlying iterator on demand, and are dropped
+    once the parser releases them, so a lazily produced stream never has to
+    be held in memory all at once.
+    """
+
+    def __init__(self, tokens: Iterable[Token]):
+        self._source = iter(tokens)
+        self._window: List[Token] = []
+        self._offset = 0
+
+    def get(self, pos: int) -> Optional[Token]:
+        """
+        Get the token at an absolute position in the stream, or None if the
+        stream ends before it.
+        """
+
+        assert pos >= self._offset, "token has already been released"
+
+        idx = pos - self._offset
+        while idx >= len(self._window):
+            token = next(self._source, None)
+            if token is None:
+                return None
+            self._window.append(token)
+
+        return self._window[idx]
+
+    def release(self, pos: int):
+        """
+        Discard all tokens before an absolute position in the stream.
+        """
+
+        count = min(pos - self._offset, len(self._window))
+        if count > 0:
+            del self._window[:count]
+            self._offset += count
+
 
 class Parser:
     """
     Producer for an Abstract Syntax Tree given a valid well-structured series
     of tokens.
-    """
 
-    def __init__(self, tokens: List[Token]):
-        assert len(tokens) >= 0
+    The tokens are consumed lazily, so they may be passed directly from
+    Lexer.tokens() to lex and parse in a single pass.
+    """
 
+    def __init__(
+        self,
+        tokens: Iterable[Token],
+        symbols: Optional[SymbolTable] = None,
+        lazy: bool = False,
+    ):
         self.pos = -1
-        self.tokens = tokens
+        self.tokens = TokenWindow(tokens)
+        self.symbols = SymbolTable() if symbols is None else symbols
+
+        # skip over the bodies of blocks, leaving them to be parsed on demand
+        self.lazy = lazy
 
         self.current: Optional[Token] = None
         self.last: Optional[Token] = None
 
-        self.starts: List[int] = []
+        self.starts: List[Optional[Token]] = []
 
     def parse(self) -> SpecNode:
         """
@@ -86,23 +190,45 @@ class Parser:
         blocks = []
         templs = []
         includes = []
-        while self.pos < len(self.tokens):
+        for _, item in self.items():
+            if isinstance(item, ChunkNode):
+                chunks.append(item)
+            elif isinstance(item, BlockNode):
+                blocks.append(item)
+            elif isinstance(item, TemplateValueNode):
+                templs.append(item)
+            else:
+                includes.append(item)
+
+        return self.node_exit(SpecNode(chunks, blocks, templs, includes, self.symbols))
+
+    def items(self) -> Iterator[Tuple[Token, TopLevelItem]]:
+        """
+        Parse each top-level item in turn, along with the token it starts at.
+        """
+
+        while self.current is not None:
+            # nothing before the next top-level item can be backtracked to
+            self.tokens.release(self.pos)
+
             if self.accept(TokenType.EOF):
                 break
             elif self.accept(TokenType.Newline):
                 continue
 
-            assert self.current is not None
-            if self.current.ttype != TokenType.Reserved:
-                raise ParseError(self.current, "expected opening statement")
-
-            if self.current.lexeme == ReservedWord.Chunk:
-                chunks.append(self.chunk())
-            elif self.current.lexeme == ReservedWord.Extern:
-                chunks.append(self.extern_chunk())
-            elif self.current.lexeme == ReservedWord.Block:
-                blocks.append(self.block())
-            elif self.current.lexeme == ReservedWord.Template:
+            start = self.current
+            assert start is not None
+            if start.ttype != TokenType.Reserved:
+                raise ParseError(start, "expected opening statement")
+
+            item: TopLevelItem
+            if start.lexeme == ReservedWord.Chunk:
+                item = self.chunk()
+            elif start.lexeme == ReservedWord.Extern:
+                item = self.extern_chunk()
+            elif start.lexeme == ReservedWord.Block:
+                item = self.block()
+            elif start.lexeme == ReservedWord.Template:
                 self.node_enter()
 
                 self.advance()
@@ -110,16 +236,15 @@ class Parser:
 
                 assert self.last is not None
                 name, definition = self.last.lexeme
-                templ = self.node_exit(TemplateValueNode(name, definition))
-                templs.append(templ)
-            elif self.current.lexeme == ReservedWord.Include:
+                item = self.node_exit(TemplateValueNode(name, definition))
+            elif start.lexeme == ReservedWord.Include:
                 self.advance()
                 include = self.expect(TokenType.String)
-                includes.append(include.lexeme)
+                item = include.lexeme
             else:
-                raise ParseError(self.current, "unknown statement type")
+                raise ParseError(start, "unknown statement type")
 
-        return self.node_exit(SpecNode(chunks, blocks, templs, includes))
+            yield start, item
 
     def chunk(self) -> ChunkNode:
         """
@@ -168,10 +293,19 @@ class Parser:
 
         constraints = self.constraints()
 
-        block_name = self.expect(TokenType.Name).lexeme
+        block_name = self.expect(TokenType.Name)
+        symbol = self.symbols.intern(block_name.lexeme)
+        if self.lazy:
+            body = self.skip_scope()
+            return self.node_exit(
+                BlockNode(symbol.name, symbol.id, [], constraints, body)
+            )
+
         statements = self.scope()
 
-        return self.node_exit(BlockNode(block_name, statements, constraints))
+        return self.node_exit(
+            BlockNode(symbol.name, symbol.id, statements, constraints)
+        )
 
     def constraints(self) -> List[str]:
         constraints = []
@@ -191,6 +325,10 @@ class Parser:
         Parse a single statement.
         """
 
+        # statements are never parsed speculatively, so nothing before the
+        # start of one can be backtracked to
+        self.tokens.release(self.pos)
+
         self.node_enter()
 
         stmt: StatementNode
@@ -199,7 +337,8 @@ class Parser:
             self.end_of_line(after="splitter")
         elif self.accept(TokenType.Reserved, ReservedWord.Call):
             target = self.expect(TokenType.Name)
-            stmt = self.node_exit(CallNode(target.lexeme))
+            symbol = self.symbols.intern(target.lexeme)
+            stmt = self.node_exit(CallNode(symbol.name, symbol.id))
             self.end_of_line(after="call")
         elif self.accept(TokenType.Reserved, ReservedWord.While):
             condition = self.expression()
@@ -255,135 +394,84 @@ class Parser:
             statements.append(self.statement())
         return statements
 
-    def expression(self) -> ExpressionNode:
+    def skip_scope(self) -> Tuple[int, int]:
         """
-        Parse an expression.
+        Skip over a scope without parsing it, returning the span of the stream
+        from its opening brace to its closing brace.
         """
 
-        return self.disjunction()
+        opening = self.expect(TokenType.BraceOpen)
+        depth = 1
+        while depth > 0:
+            # nothing in a skipped scope will ever be backtracked to
+            self.tokens.release(self.pos)
 
-    def disjunction(self) -> ExpressionNode:
-        """
-        Parse a boolean disjunction.
-        """
+            token = self.current
+            assert token is not None
+            if token.ttype == TokenType.EOF:
+                ttype_name = PRINTABLE_NAMES[TokenType.BraceClose]
+                raise ParseError(token, f"expected {ttype_name} but got EOF")
+            elif token.ttype == TokenType.BraceOpen:
+                depth += 1
+            elif token.ttype == TokenType.BraceClose:
+                depth -= 1
+            self.advance()
 
-        return self.binary(
-            self.conjunction, self.disjunction, {TokenType.BooleanOr: Operator.Or}
-        )
+        assert self.last is not None
+        return opening.position - opening.length, self.last.position
 
-    def conjunction(self) -> ExpressionNode:
-        """
-        Parse a boolean conjunction.
+    def expression(self, precedence: int = 1) -> ExpressionNode:
         """
+        Parse an expression.
 
-        return self.binary(
-            self.comparison, self.conjunction, {TokenType.BooleanAnd: Operator.And}
-        )
-
-    def comparison(self) -> ExpressionNode:
-        """
-        Parse a comparison.
+        Binary operators are parsed by precedence climbing, only consuming
+        operators that bind at least as tightly as the given precedence.
         """
 
-        return self.binary(
-            self.sum,
-            self.sum,
-            {
-                TokenType.CompareNE: Operator.Neq,
-                TokenType.CompareEQ: Operator.Eq,
-                TokenType.CompareLT: Operator.Lt,
-                TokenType.CompareLE: Operator.Lte,
-                TokenType.CompareGT: Operator.Gt,
-                TokenType.CompareGE: Operator.Gte,
-            },
-        )
+        start = self.current
+        node = self.standalone()
 
-    def sum(self) -> ExpressionNode:
-        """
-        Parse a sum.
-        """
+        limit = len(PRECEDENCE_LEVELS) + 1
+        while True:
+            assert self.current is not None
+            entry = BINARY_OPERATORS.get(self.current.ttype)
+            if entry is None:
+                break
+            op, level = entry
+            if not precedence <= level < limit:
+                break
 
-        return self.binary(
-            self.product,
-            self.sum,
-            {
-                TokenType.Plus: Operator.Add,
-                TokenType.Minus: Operator.Subtract,
-                TokenType.BitwiseAnd: Operator.BitwiseAnd,
-                TokenType.BitwiseOr: Operator.BitwiseOr,
-                TokenType.BitwiseXor: Operator.BitwiseXor,
-            },
-        )
+            self.advance()
+            if level in NONASSOCIATIVE_LEVELS:
+                right = self.expression(level + 1)
+            else:
+                right = self.expression(level)
 
-    def product(self) -> ExpressionNode:
-        """
-        Parse a product.
-        """
+            result = BinaryOperationNode(op, node, right)
+            result.token_start = start
+            result.token_end = self.last
+            node = result
 
-        return self.binary(
-            self.standalone,
-            self.product,
-            {
-                TokenType.Times: Operator.Multiply,
-                TokenType.Divide: Operator.Divide,
-            },
-        )
+            # any operators at this level (or above) have been consumed by the
+            # right hand side, so we only need to look for looser ones now
+            limit = level
+
+        return node
 
     def standalone(self) -> ExpressionNode:
         """
         Parse a standalone expression with a possible unary prefix operator.
         """
 
-        return self.unary(
-            self.atom,
-            {
-                TokenType.BooleanNot: Operator.Not,
-                TokenType.BitwiseNot: Operator.BitwiseNot,
-                TokenType.Minus: Operator.Negate,
-            },
-        )
-
-    def unary(
-        self,
-        item: Callable[[], ExpressionNode],
-        operators: Dict[TokenType, Operator],
-    ) -> ExpressionNode:
-        """
-        Parse an arbitrary unary expression.
-        """
-
-        self.node_enter()
-        found = None
-        for op in operators:
-            if self.accept(op):
-                found = op
-                break
-
-        operand = item()
-        if found:
-            return self.node_exit(UnaryOperationNode(operators[found], operand))
-        else:
-            self.node_cancel()
-            return operand
-
-    def binary(
-        self,
-        left: Callable[[], ExpressionNode],
-        right: Callable[[], ExpressionNode],
-        operators: Dict[TokenType, Operator],
-    ) -> ExpressionNode:
-        """
-        Parse an arbitrary binary expression.
-        """
+        assert self.current is not None
+        op = UNARY_OPERATORS.get(self.current.ttype)
+        if op is None:
+            return self.atom()
 
         self.node_enter()
-        op1 = left()
-        for op in operators:
-            if self.accept(op):
-                op2 = right()
-                return self.node_exit(BinaryOperationNode(operators[op], op1, op2))
-        self.node_cancel()
-        return op1
+        self.advance()
+        operand = self.atom()
+        return self.node_exit(UnaryOperationNode(op, operand))
 
     def atom(self) -> ExpressionNode:
         """
@@ -536,7 +624,8 @@ class Parser:
             if name.lexeme in ("null", "NULL"):
                 node = self.node_exit(LiteralExpressionNode("NULL"))
             else:
-                node = self.node_exit(VariableNode(name.lexeme))
+                symbol = self.symbols.intern(name.lexeme)
+                node = self.node_exit(VariableNode(symbol.name, symbol.id))
 
         state = (self.pos, self.current, self.last)
         try:
@@ -564,7 +653,10 @@ class Parser:
         if self.accept(TokenType.Assign):
             initial = self.expression()
 
-        return self.node_exit(DeclarationNode(var.lexeme, var_type, initial))
+        symbol = self.symbols.intern(var.lexeme)
+        return self.node_exit(
+            DeclarationNode(symbol.name, symbol.id, var_type, initial)
+        )
 
     def declaration_type(self) -> TypeNode:
         """
@@ -696,8 +788,9 @@ class Parser:
         Lookahead to the next available token.
         """
 
-        if self.pos + 1 < len(self.tokens):
-            return self.tokens[self.pos + 1]
+        token = self.tokens.get(self.pos + 1)
+        if token is not None:
+            return token
         else:
             # HACK!
             return Token("", 0, 0, TokenType.Unknown)
@@ -709,18 +802,15 @@ class Parser:
 
         self.pos += 1
         self.last = self.current
-        if self.pos < len(self.tokens):
-            self.current = self.tokens[self.pos]
-        else:
-            self.current = None
+        self.current = self.tokens.get(self.pos)
 
     def node_enter(self):
-        self.starts.append(self.pos)
+        self.starts.append(self.current)
 
     def node_cancel(self):
         self.starts.pop()
 
     def node_exit(self, node: N) -> N:
-        node.token_start = self.tokens[self.starts.pop()]
-        node.token_end = self.tokens[self.pos - 1]
+        node.token_start = self.starts.pop()
+        node.token_end = self.last
         return node
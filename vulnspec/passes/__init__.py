@@ -1,6 +1,7 @@
 from .blockify import BlockifyVisitor
 from .chunkify import ChunkifyVisitor
 from .error import ProcessingError
+from .frontend import FrontEndVisitor
 from .printer import PrinterVisitor
 from .templater import TemplaterVisitor
 from .typer import TypeCheckVisitor
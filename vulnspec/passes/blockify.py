@@ -45,6 +45,7 @@ from ..node import (
     IntValueNode,
     LiteralExpressionNode,
     LiteralStatementNode,
+    Node,
     RefNode,
     SizeOfExprNode,
     SizeOfTypeNode,
@@ -52,6 +53,7 @@ from ..node import (
     SplitNode,
     StatementNode,
     StringValueNode,
+    TypeNode,
     UnaryOperationNode,
     ValueNode,
     VariableNode,
@@ -63,12 +65,23 @@ from .error import ProcessingError
 PRINTABLE = set(string.printable) - set("\x0b\x0c")
 
 
+# FrontEndVisitor (see frontend.py) repeats the traversal of these visitors, so
+# any change to it has to be made there too.
 class BlockifyVisitor(Visitor[None]):
-    def __init__(self, chunks: List[Chunk], extern: Chunk):
+    def __init__(
+        self,
+        chunks: List[Chunk],
+        extern: Chunk,
+        types: Optional[Dict[Node, TypeNode]] = None,
+    ):
         super().__init__()
         self.chunks = chunks
         self.extern = extern
 
+        # the types resolved by the type checker (see TypeCheckVisitor.types),
+        # which are carried onto each expression as its vtype
+        self.types = {} if types is None else types
+
         self.block_current: str = ""
         self.block_split_count: int = 0
         self.blocks: Dict[str, Block] = {}
@@ -109,23 +122,31 @@ class BlockifyVisitor(Visitor[None]):
 
         for statement in statements:
             if isinstance(statement, SplitNode):
-                self.block_split_count += 1
-                name = f"{self.block_current}{self.block_split_count}"
-
-                next_block = Block(name)
-                self.blocks[name] = next_block
+                next_block = self.split(statement)
+                name = next_block.name
 
                 caller = Call(next_block)
                 result_statements.append(caller)
             elif name is not None:
-                stmt = statement.accept(BlockifyStatementVisitor(self))
+                stmt = self.statement(statement)
                 self.blocks[name].add_statement(stmt)
             else:
-                stmt = statement.accept(BlockifyStatementVisitor(self))
+                stmt = self.statement(statement)
                 result_statements.append(stmt)
 
         return result_statements
 
+    def split(self, node: SplitNode) -> Block:  # pylint: disable=unused-argument
+        self.block_split_count += 1
+        name = f"{self.block_current}{self.block_split_count}"
+
+        next_block = Block(name)
+        self.blocks[name] = next_block
+        return next_block
+
+    def statement(self, node: StatementNode) -> Statement:
+        return node.accept(BlockifyStatementVisitor(self))
+
     def lookup_var(self, name: str) -> ChunkVariable:
         if name in ("argc", "argv"):
             return ChunkVariable(name, None, None)
@@ -204,21 +225,23 @@ class BlockifyLvalueVisitor(Visitor[Lvalue]):
     def visit_variable(self, node: VariableNode) -> Lvalue:
         try:
             var = self.parent.lookup_var(node.name)
-            return Variable(var)
+            return Variable(var).with_type(self.parent.types.get(node))
         except KeyError as e:
             raise ProcessingError(node, e.args[0])
 
     def visit_deref(self, node: DerefNode) -> Lvalue:
-        return Deref(node.target.accept(BlockifyExpressionVisitor(self.parent)))
+        return Deref(
+            node.target.accept(BlockifyExpressionVisitor(self.parent))
+        ).with_type(self.parent.types.get(node))
 
     def visit_array(self, node: ArrayNode) -> Lvalue:
         return Array(
             node.target.accept(BlockifyExpressionVisitor(self.parent)),
             node.index.accept(BlockifyExpressionVisitor(self.parent)),
-        )
+        ).with_type(self.parent.types.get(node))
 
     def visit_literal_expr(self, node: LiteralExpressionNode) -> Lvalue:
-        return Value(node.content.strip())
+        return Value(node.content.strip()).with_type(self.parent.types.get(node))
 
 
 class BlockifyExpressionVisitor(Visitor[Expression]):
@@ -236,54 +259,70 @@ class BlockifyExpressionVisitor(Visitor[Expression]):
         return node.accept(BlockifyLvalueVisitor(self.parent))
 
     def visit_ref(self, node: RefNode) -> Expression:
-        return Ref(node.target.accept(BlockifyLvalueVisitor(self.parent)))
+        return Ref(node.target.accept(BlockifyLvalueVisitor(self.parent))).with_type(
+            self.parent.types.get(node)
+        )
 
     def visit_function(self, node: FunctionNode) -> Expression:
         var = node.target.accept(BlockifyLvalueVisitor(self.parent))
-        return Function(var, [expr.accept(self) for expr in node.arguments])
+        return Function(var, [expr.accept(self) for expr in node.arguments]).with_type(
+            self.parent.types.get(node)
+        )
 
     def visit_value(self, node: ValueNode) -> Expression:
-        if isinstance(node, StringValueNode):
-            if any(ch not in PRINTABLE for ch in node.value):
-                result = '"' + "".join(f"\\x{ord(ch):02x}" for ch in node.value) + '"'
-            else:
-                result = json.dumps(node.value)
-            return Value(result)
-        elif isinstance(node, IntValueNode):
-            if node.base == 2:
-                return Value(bin(node.value))
-            elif node.base == 8:
-                return Value(oct(node.value))
-            elif node.base == 10:
-                return Value(str(node.value))
-            elif node.base == 16:
-                return Value(hex(node.value))
-            else:
-                raise RuntimeError("value unrepresentable in C")
-        elif isinstance(node, FloatValueNode):
-            return Value(f"{node.left}.{node.right}")
-        elif isinstance(node, BoolValueNode):
-            if node.value:
-                return Value("true")
-            else:
-                return Value("false")
-        else:
-            raise RuntimeError()
+        return blockify_value(node).with_type(self.parent.types.get(node))
 
     def visit_sizeof_expr(self, node: SizeOfExprNode) -> Expression:
-        return SizeOfExpr(node.target.accept(self))
+        return SizeOfExpr(node.target.accept(self)).with_type(
+            self.parent.types.get(node)
+        )
 
     def visit_sizeof_type(self, node: SizeOfTypeNode) -> Expression:
-        return SizeOfType(node.target)
+        return SizeOfType(node.target).with_type(self.parent.types.get(node))
 
     def visit_cast(self, node: CastNode) -> Expression:
-        return Cast(node.expr.accept(self), node.cast)
+        return Cast(node.expr.accept(self), node.cast).with_type(
+            self.parent.types.get(node)
+        )
 
     def visit_literal_expr(self, node: LiteralExpressionNode) -> Expression:
-        return Value(node.content.strip())
+        return Value(node.content.strip()).with_type(self.parent.types.get(node))
 
     def visit_unary(self, node: UnaryOperationNode) -> Expression:
-        return Operation(node.op, [node.item.accept(self)])
+        return Operation(node.op, [node.item.accept(self)]).with_type(
+            self.parent.types.get(node)
+        )
 
     def visit_binary(self, node: BinaryOperationNode) -> Expression:
-        return Operation(node.op, [node.left.accept(self), node.right.accept(self)])
+        return Operation(
+            node.op, [node.left.accept(self), node.right.accept(self)]
+        ).with_type(self.parent.types.get(node))
+
+
+def blockify_value(node: ValueNode) -> Value:
+    if isinstance(node, StringValueNode):
+        if any(ch not in PRINTABLE for ch in node.value):
+            result = '"' + "".join(f"\\x{ord(ch):02x}" for ch in node.value) + '"'
+        else:
+            result = json.dumps(node.value)
+        return Value(result)
+    elif isinstance(node, IntValueNode):
+        if node.base == 2:
+            return Value(bin(node.value))
+        elif node.base == 8:
+            return Value(oct(node.value))
+        elif node.base == 10:
+            return Value(str(node.value))
+        elif node.base == 16:
+            return Value(hex(node.value))
+        else:
+            raise RuntimeError("value unrepresentable in C")
+    elif isinstance(node, FloatValueNode):
+        return Value(f"{node.left}.{node.right}")
+    elif isinstance(node, BoolValueNode):
+        if node.value:
+            return Value("true")
+        else:
+            return Value("false")
+    else:
+        raise RuntimeError()
@@ -39,6 +39,9 @@ class ChunkifyChunkVisitor(Visitor[None]):
         for var in node.variables:
             var.accept(self)
 
+        self.constrain(node)
+
+    def constrain(self, node: ChunkNode):
         if not self.allow_constraints and node.constraints:
             raise ProcessingError(node, "cannot process chunk constraints here")
 
@@ -69,5 +72,11 @@ class ChunkifyChunkVisitor(Visitor[None]):
             init = node.initial.accept(
                 BlockifyExpressionVisitor(BlockifyVisitor([], Chunk([])))
             )
+        self.declare(node, init)
+
+    def declare(self, node: DeclarationNode, init: Optional[Expression]):
+        if node.name in self.chunk:
+            return
+
         var = ChunkVariable(node.name, node.vartype, self.chunk, initial=init)
         self.chunk.add_variable(var)
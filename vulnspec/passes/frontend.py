@@ -0,0 +1,353 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+from ..graph import (
+    Array,
+    Assignment,
+    Block,
+    Call,
+    Cast,
+    Chunk,
+    Deref,
+    Expression,
+    ExpressionStatement,
+    Function,
+    If,
+    Operation,
+    Raw,
+    Ref,
+    SizeOfExpr,
+    SizeOfType,
+    Statement,
+    Value,
+    Variable,
+    While,
+    merge_chunks,
+)
+from ..node import (
+    ArrayNode,
+    AssignmentNode,
+    BinaryOperationNode,
+    BlockNode,
+    CallNode,
+    CastNode,
+    ChunkNode,
+    DerefNode,
+    ExpressionStatementNode,
+    ExternChunkNode,
+    FunctionNode,
+    IfNode,
+    LiteralExpressionNode,
+    LiteralStatementNode,
+    RefNode,
+    SizeOfExprNode,
+    SizeOfTypeNode,
+    SpecNode,
+    SplitNode,
+    StatementNode,
+    TemplateValueNode,
+    TypeNode,
+    UnaryOperationNode,
+    ValueNode,
+    VariableNode,
+    Visitor,
+    WhileNode,
+)
+from .blockify import BlockifyVisitor, blockify_value
+from .chunkify import ChunkifyChunkVisitor
+from .error import ProcessingError
+from .templater import TemplaterVisitor
+from .typer import TypeCheckVisitor
+
+# an expression, along with its type (if it has been checked)
+Typed = Tuple[Optional[TypeNode], Expression]
+
+
+class FrontEndVisitor(Visitor[None]):
+    """
+    Instantiate templates, check types, and build the chunks and blocks of a
+    spec, all in a single traversal.
+
+    This produces the same chunks, blocks and template instantiations as
+    running the TemplaterVisitor, TypeCheckVisitor, ChunkifyVisitor and
+    BlockifyVisitor one after another, but visits each node only once, and
+    builds the blocks without rewriting the tree first.
+
+    However, errors are found in a different order - the separate passes
+    report every template error before any type error (and so on), while
+    this reports whichever error it reaches first.
+    """
+
+    def __init__(
+        self,
+        predefined: Optional[Dict[str, Union[str, int, float, bool]]] = None,
+        require_main: bool = True,
+    ):
+        super().__init__()
+        self.templater = TemplaterVisitor(predefined)
+        self.typer = TypeCheckVisitor(require_main=require_main)
+
+        self.chunks: List[Chunk] = []
+        self.extern = Chunk([])
+
+        self.blockifier: Optional[FrontEndBlockifyVisitor] = None
+
+    def result(self) -> List[Block]:
+        assert self.blockifier is not None
+        return self.blockifier.result()
+
+    def visit_spec(self, node: SpecNode):
+        self.typer.check_spec(node)
+
+        self.templater.define(node.templates)
+        for chunk in node.chunks:
+            chunk.accept(self)
+
+        self.blockifier = FrontEndBlockifyVisitor(self)
+        node.accept(self.blockifier)
+
+    def visit_chunk(self, node: ChunkNode):
+        chunkifier = ChunkifyChunkVisitor()
+        self._declare(node, chunkifier)
+        self.typer.check_chunk(node)
+        chunkifier.constrain(node)
+
+        self.chunks.append(chunkifier.chunk)
+
+    def visit_extern(self, node: ExternChunkNode):
+        chunkifier = ChunkifyChunkVisitor(allow_constraints=False)
+        self._declare(node, chunkifier)
+
+        self.extern = merge_chunks(self.extern, chunkifier.chunk)
+
+    def _declare(self, node: ChunkNode, chunkifier: ChunkifyChunkVisitor):
+        # the initial values are visited without any chunks/extern, like in
+        # ChunkifyChunkVisitor
+        expressions = FrontEndExpressionVisitor(self, BlockifyVisitor([], Chunk([])))
+
+        for var in node.variables:
+            var.vartype.accept(self.templater)
+            vartype = self.typer.check_declaration(var)
+
+            init: Optional[Expression] = None
+            if var.initial:
+                tp, init = var.initial.accept(expressions)
+                assert tp is not None
+                self.typer.check_initial(var, vartype, tp)
+
+            var.vartype.accept(self.typer)
+            chunkifier.declare(var, init)
+
+
+class FrontEndBlockifyVisitor(BlockifyVisitor):
+    def __init__(self, parent: FrontEndVisitor):
+        super().__init__(parent.chunks, parent.extern, parent.typer.types)
+        self.parent = parent
+
+        self.statements = FrontEndStatementVisitor(parent, self)
+
+    def visit_block(self, node: BlockNode):
+        self.parent.typer.check_block(node)
+        super().visit_block(node)
+
+    def split(self, node: SplitNode) -> Block:
+        self.parent.typer.visit_split(node)
+        return super().split(node)
+
+    def statement(self, node: StatementNode) -> Statement:
+        return node.accept(self.statements)
+
+
+class FrontEndStatementVisitor(Visitor[Statement]):
+    def __init__(self, parent: FrontEndVisitor, blockifier: FrontEndBlockifyVisitor):
+        super().__init__()
+        self.parent = parent
+        self.blockifier = blockifier
+
+        self.expressions = FrontEndExpressionVisitor(parent, blockifier)
+
+    def visit_literal_stmt(self, node: LiteralStatementNode) -> Statement:
+        return Raw(self.parent.templater.visit_literal_stmt(node).content)
+
+    def visit_assignment(self, node: AssignmentNode) -> Statement:
+        lhs_type, target = node.target.accept(self.expressions)
+        rhs_type, value = node.expression.accept(self.expressions)
+        assert lhs_type is not None and rhs_type is not None
+        self.parent.typer.check_assignment(node, lhs_type, rhs_type)
+
+        assert isinstance(target, (Variable, Array, Deref, Value))
+        return Assignment(target, value)
+
+    def visit_call(self, node: CallNode) -> Statement:
+        self.parent.typer.visit_call(node)
+        return Call(self.blockifier.blocks[node.target])
+
+    def visit_split(self, node: SplitNode) -> Statement:
+        raise RuntimeError("split should never be manually visited")
+
+    def visit_if(self, node: IfNode) -> Statement:
+        groups: List[Tuple[Optional[Expression], List[Statement]]] = []
+
+        nodeiter: Optional[IfNode] = node
+        while nodeiter is not None:
+            tp, condition = nodeiter.condition.accept(self.expressions)
+            assert tp is not None
+            self.parent.typer.check_condition(nodeiter, tp)
+
+            groups.append(
+                (condition, self.blockifier.process_statements(nodeiter.statements))
+            )
+            if nodeiter.else_statements:
+                groups.append(
+                    (None, self.blockifier.process_statements(nodeiter.else_statements))
+                )
+            nodeiter = nodeiter.else_if
+
+        return If(groups)
+
+    def visit_while(self, node: WhileNode) -> Statement:
+        tp, condition = node.condition.accept(self.expressions)
+        assert tp is not None
+        self.parent.typer.check_condition(node, tp)
+
+        return While(condition, self.blockifier.process_statements(node.statements))
+
+    def visit_exprstmt(self, node: ExpressionStatementNode) -> Statement:
+        _, expr = node.expression.accept(self.expressions)
+        return ExpressionStatement(expr)
+
+
+class FrontEndExpressionVisitor(Visitor[Typed]):
+    """
+    Instantiate, check and blockify an expression, returning the blockified
+    expression along with its type.
+
+    Expressions that the type checker doesn't reach (such as those inside a
+    cast) are visited with check=False, and have no type.
+    """
+
+    def __init__(
+        self, parent: FrontEndVisitor, blockifier: BlockifyVisitor, check: bool = True
+    ):
+        super().__init__()
+        self.templater = parent.templater
+        self.typer = parent.typer
+        self.blockifier = blockifier
+        self.check = check
+
+        self._unchecked: Optional[FrontEndExpressionVisitor] = None
+        if check:
+            self._unchecked = FrontEndExpressionVisitor(parent, blockifier, False)
+
+    def visit_variable(self, node: VariableNode) -> Typed:
+        tp = self.typer.visit_variable(node) if self.check else None
+        try:
+            var = self.blockifier.lookup_var(node.name)
+        except KeyError as e:
+            raise ProcessingError(node, e.args[0])
+
+        return tp, Variable(var).with_type(tp)
+
+    def visit_value(self, node: ValueNode) -> Typed:
+        if isinstance(node, TemplateValueNode):
+            node = self.templater.visit_value(node)
+
+        tp = self.typer.visit_value(node) if self.check else None
+        return tp, blockify_value(node).with_type(tp)
+
+    def visit_literal_expr(self, node: LiteralExpressionNode) -> Typed:
+        node = self.templater.visit_literal_expr(node)
+
+        tp = self.typer.visit_literal_expr(node) if self.check else None
+        return tp, Value(node.content.strip()).with_type(tp)
+
+    def visit_ref(self, node: RefNode) -> Typed:
+        tp, target = node.target.accept(self)
+        if self.check:
+            assert tp is not None
+            tp = self.typer.check_ref(node, tp)
+
+        assert isinstance(target, (Variable, Array, Deref, Value))
+        return tp, Ref(target).with_type(tp)
+
+    def visit_deref(self, node: DerefNode) -> Typed:
+        tp, target = node.target.accept(self)
+        if self.check:
+            tp = self.typer.check_deref(node, tp)
+
+        return tp, Deref(target).with_type(tp)
+
+    def visit_array(self, node: ArrayNode) -> Typed:
+        target_type, target = node.target.accept(self)
+        index_type, index = node.index.accept(self)
+
+        tp = None
+        if self.check:
+            assert index_type is not None
+            self.typer.check_index(node, index_type)
+            tp = self.typer.check_indexed(node, target_type)
+
+        return tp, Array(target, index).with_type(tp)
+
+    def visit_function(self, node: FunctionNode) -> Typed:
+        vtype, func = node.target.accept(self)
+
+        arg_types: List[TypeNode] = []
+        args: List[Expression] = []
+        for arg in node.arguments:
+            arg_type, arg_expr = arg.accept(self)
+            if arg_type is not None:
+                arg_types.append(arg_type)
+            args.append(arg_expr)
+
+        tp = None
+        if self.check:
+            tp = self.typer.check_function(node, vtype, arg_types)
+
+        return tp, Function(func, args).with_type(tp)
+
+    def visit_sizeof_expr(self, node: SizeOfExprNode) -> Typed:
+        _, target = node.target.accept(self)
+
+        tp = self.typer.check_sizeof(node) if self.check else None
+        return tp, SizeOfExpr(target).with_type(tp)
+
+    def visit_sizeof_type(self, node: SizeOfTypeNode) -> Typed:
+        node.target.accept(self.templater)
+
+        tp = None
+        if self.check:
+            node.target.accept(self.typer)
+            tp = self.typer.check_sizeof(node)
+
+        return tp, SizeOfType(node.target).with_type(tp)
+
+    def visit_cast(self, node: CastNode) -> Typed:
+        node.cast.accept(self.templater)
+
+        # the type checker doesn't look inside casts
+        unchecked = self if self._unchecked is None else self._unchecked
+        _, expr = node.expr.accept(unchecked)
+
+        tp = self.typer.visit_cast(node) if self.check else None
+        return tp, Cast(expr, node.cast).with_type(tp)
+
+    def visit_unary(self, node: UnaryOperationNode) -> Typed:
+        item_type, item = node.item.accept(self)
+
+        tp = None
+        if self.check:
+            assert item_type is not None
+            tp = self.typer.check_unary(node, item_type)
+
+        return tp, Operation(node.op, [item]).with_type(tp)
+
+    def visit_binary(self, node: BinaryOperationNode) -> Typed:
+        left_type, left = node.left.accept(self)
+        right_type, right = node.right.accept(self)
+
+        tp = None
+        if self.check:
+            assert left_type is not None and right_type is not None
+            tp = self.typer.check_binary(node, left_type, right_type)
+
+        return tp, Operation(node.op, [left, right]).with_type(tp)
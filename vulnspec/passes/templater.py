@@ -1,11 +1,15 @@
+import functools
+import heapq
 import re
-from typing import Dict, Optional, Union
+from types import CodeType
+from typing import Dict, FrozenSet, Iterator, List, MutableMapping, Optional, Set, Union
 
 from ..builtins import functions, types, variables
 from ..node import (
     LiteralExpressionNode,
     LiteralStatementNode,
     MapVisitor,
+    SpecNode,
     TemplateValueNode,
     ValueNode,
 )
@@ -24,28 +28,205 @@ TRANSLATIONS = {
 }
 EVAL_CONTEXT = {**LIBS, **TRANSLATIONS}
 
+TemplateValue = Union[str, int, float, bool]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_definition(definition: str) -> CodeType:
+    """
+    Compile the definition of a template, so that synthesizing the same spec
+    many times (e.g. for every seed) only parses each definition once.
+    """
+
+    return compile(definition, "<string>", "eval")
+
+
+def _names(code: CodeType) -> Set[str]:
+    # includes the names used in nested scopes, like generator expressions
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _names(const)
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def _dependencies(definition: str) -> FrozenSet[str]:
+    try:
+        return frozenset(_names(compile_definition(definition)))
+    except SyntaxError:
+        # reported when the template is actually evaluated
+        return frozenset()
+
+
+class TemplatePlan:
+    """
+    The order in which to evaluate the top-level templates of a spec.
+
+    Templates are evaluated in the order that they are written, except that
+    a template is always evaluated after the templates that it refers to.
+    """
+
+    def __init__(self, templates: List[TemplateValueNode]):
+        self.templates = templates
+
+        indices = {templ.name: i for i, templ in enumerate(templates)}
+        self.dependencies: List[Set[int]] = []
+        for i, templ in enumerate(templates):
+            names = _dependencies(templ.definition or "")
+            self.dependencies.append(
+                {indices[name] for name in names if indices.get(name, i) != i}
+            )
+
+        self.order = self._sort(len(indices) == len(templates))
+
+    def _sort(self, unique: bool) -> List[TemplateValueNode]:
+        # redefined templates don't have a single definition to depend on
+        if not unique:
+            return list(self.templates)
+
+        waiting = [len(deps) for deps in self.dependencies]
+        dependents: List[List[int]] = [[] for _ in self.templates]
+        for i, deps in enumerate(self.dependencies):
+            for dep in deps:
+                dependents[dep].append(i)
+
+        # always take the earliest written template that's ready
+        ready = [i for i, count in enumerate(waiting) if count == 0]
+        order: List[int] = []
+        while ready:
+            i = heapq.heappop(ready)
+            order.append(i)
+            for dependent in dependents[i]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+
+        # with a cycle, leave the templates as written to fail in evaluation
+        if len(order) != len(self.templates):
+            return list(self.templates)
+        return [self.templates[i] for i in order]
+
+
+class Templates(MutableMapping[str, TemplateValue]):
+    """
+    The values of the templates of a spec, evaluated on demand.
+
+    Top-level templates are only defined up front, and are evaluated the first
+    time that their value is looked up (including by the definition of another
+    template), after which the value is kept. Iterating over the templates
+    evaluates all of them.
+
+    Templates that use random are the exception, and are evaluated as soon as
+    they're defined, so that the values a seed produces don't depend on the
+    order that templates are used in. Pending templates are also evaluated
+    before anything they refer to is redefined, so that they see the value it
+    had when they were defined.
+    """
+
+    def __init__(self, values: Optional[Dict[str, TemplateValue]] = None):
+        self.evaluated = values or {}
+        self.pending: Dict[str, str] = {}
+
+    def define(self, name: str, definition: str):
+        self._settle(name)
+        self.evaluated.pop(name, None)
+        self.pending[name] = definition
+        if "random" in _dependencies(definition):
+            self._evaluate(name, definition)
+
+    def evaluate(self, name: str, definition: str) -> TemplateValue:
+        self._settle(name)
+        return self._evaluate(name, definition)
+
+    def _settle(self, name: str):
+        # evaluate the pending templates that refer to name, before it's bound
+        # to something else
+        if name not in self:
+            return
+        for other, definition in list(self.pending.items()):
+            if other in self.pending and name in _dependencies(definition):
+                self._evaluate(other, definition)
+
+    def _evaluate(self, name: str, definition: str) -> TemplateValue:
+        # removed first, so that a template that depends on itself fails to
+        # find itself, instead of recursing forever
+        self.pending.pop(name, None)
+
+        # pylint: disable=eval-used
+        result = eval(compile_definition(definition), EVAL_CONTEXT, self)
+        self.evaluated[name] = result
+        return result
+
+    def resolve(self):
+        """
+        Evaluate every template that hasn't been evaluated yet.
+        """
+
+        while self.pending:
+            name = next(iter(self.pending))
+            self._evaluate(name, self.pending[name])
+
+    def __getitem__(self, name: str) -> TemplateValue:
+        try:
+            return self.evaluated[name]
+        except KeyError:
+            definition = self.pending.get(name)
+            if definition is None:
+                raise
+            return self._evaluate(name, definition)
+
+    def __setitem__(self, name: str, value: TemplateValue):
+        self._settle(name)
+        self.pending.pop(name, None)
+        self.evaluated[name] = value
+
+    def __delitem__(self, name: str):
+        if self.pending.pop(name, None) is None:
+            del self.evaluated[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.evaluated or name in self.pending
+
+    def __iter__(self) -> Iterator[str]:
+        self.resolve()
+        return iter(self.evaluated)
+
+    def __len__(self) -> int:
+        self.resolve()
+        return len(self.evaluated)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__} {self.evaluated!r} pending={self.pending!r}>"
+        )
+
 
 class TemplaterVisitor(MapVisitor):
     """
     Instantiate templates in place.
+
+    The top-level templates are only evaluated once they are used, see
+    Templates.
+
+    FrontEndVisitor repeats this traversal, so any change to it has to be made
+    there too.
     """
 
     REF = re.compile(r"<\s*([^ ;]*)\s*>")
     ASSIGN = re.compile(r"<\s*([^ ;]*)\s*;(.*)>")
 
-    def __init__(
-        self, predefined: Optional[Dict[str, Union[str, int, float, bool]]] = None
-    ):
+    def __init__(self, predefined: Optional[Dict[str, TemplateValue]] = None):
         super().__init__()
-        self.instantiations: Dict[str, Union[str, int, float, bool]] = predefined or {}
+        self.instantiations = Templates(predefined)
 
-    def evaluate(self, name: str, definition: str) -> Union[str, bool, int, float]:
-        # pylint: disable=eval-used
-        result = eval(definition, EVAL_CONTEXT, self.instantiations)
-        self.instantiations[name] = result
-        return result
+    def evaluate(self, name: str, definition: str) -> TemplateValue:
+        return self.instantiations.evaluate(name, definition)
 
     def _expand(self, text: str) -> str:
+        if "<" not in text:
+            return text
+
         def expander(match: re.Match) -> str:
             groups = match.groups()
             if len(groups) == 1:
@@ -62,6 +243,23 @@ class TemplaterVisitor(MapVisitor):
         new = TemplaterVisitor.ASSIGN.sub(expander, new)
         return new
 
+    def visit_spec(self, node: SpecNode) -> SpecNode:
+        self.define(node.templates)
+
+        for i, chunk in enumerate(node.chunks):
+            node.chunks[i] = chunk.accept(self)
+        for i, block in enumerate(node.blocks):
+            node.blocks[i] = block.accept(self)
+
+        return node
+
+    def define(self, templates: List[TemplateValueNode]):
+        for templ in TemplatePlan(templates).order:
+            if templ.definition:
+                self.instantiations.define(templ.name, templ.definition)
+            else:
+                self.visit_value(templ)
+
     def visit_value(self, node: ValueNode) -> ValueNode:
         if isinstance(node, TemplateValueNode):
             if node.definition:
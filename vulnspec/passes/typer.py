@@ -1,7 +1,8 @@
 import functools
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Union
 
-from ..builtins import MetaTypes, functions, types, variables
+from ..builtins import MetaType, MetaTypes, functions, types, variables
+from ..common.symbols import SymbolTable
 from ..node import (
     ARITHMETIC_OPERATORS,
     BITWISE_OPERATORS,
@@ -18,6 +19,7 @@ from ..node import (
     ChunkNode,
     DeclarationNode,
     DerefNode,
+    ExpressionNode,
     FloatValueNode,
     FunctionNode,
     FuncTypeNode,
@@ -25,6 +27,7 @@ from ..node import (
     IntValueNode,
     LiteralExpressionNode,
     MetaTypeNode,
+    Node,
     PointerTypeNode,
     RefNode,
     SimpleTypeNode,
@@ -39,65 +42,162 @@ from ..node import (
     ValueNode,
     VariableNode,
     WhileNode,
+    intern_type,
     type_check,
 )
-from ..parser import Lexer, Parser
+from ..parser import Parser, RegexLexer
 from .error import ProcessingError
 
 
 @functools.lru_cache(maxsize=None)
 def parse_typestring(typestr: str) -> TypeNode:
-    lex = Lexer(typestr)
-    tokens = lex.tokens_list()
+    lex = RegexLexer(typestr)
 
-    parser = Parser(tokens)
+    parser = Parser(lex.tokens())
     parser.advance()
     tp = parser.declaration_type()
-    return tp
+    return intern_type(tp)
+
+
+def decode_type(encoded: str) -> TypeNode:
+    """
+    Construct a type that has already been parsed and encoded by
+    tools/builtin_generator (see signatures.py there for the format).
+    """
+
+    parts = iter(encoded.split())
+    return _decode_type(parts)
+
+
+def _decode_type(parts: Iterator[str]) -> TypeNode:
+    part = next(parts)
+    kind, data = part[0], part[1:]
+
+    tp: TypeNode
+    if kind == "s":
+        tp = SimpleTypeNode(data)
+    elif kind == "m":
+        tp = MetaTypeNode(MetaType(data))
+    elif kind == "p":
+        tp = PointerTypeNode(_decode_type(parts))
+    elif kind == "a":
+        size = IntValueNode(int(data), 10) if data else None
+        tp = ArrayTypeNode(_decode_type(parts), size)
+    elif kind == "f":
+        variadic = data.endswith("v")
+        argc = int(data.rstrip("v"))
+        ret = _decode_type(parts)
+        args = [_decode_type(parts) for _ in range(argc)]
+        tp = FuncTypeNode(ret, args, variadic)
+    else:
+        raise RuntimeError()
+
+    return intern_type(tp)
+
+
+@functools.lru_cache(maxsize=None)
+def builtin_variable_type(name: str) -> TypeNode:
+    encoded = variables.PARSED.get(name)
+    if encoded is not None:
+        return decode_type(encoded)
+    else:
+        return parse_typestring(variables.TYPES[name])
+
+
+@functools.lru_cache(maxsize=None)
+def builtin_function_type(name: str) -> TypeNode:
+    encoded = functions.PARSED.get(name)
+    if encoded is not None:
+        return decode_type(encoded)
+    else:
+        return parse_typestring(functions.SIGNATURES[name])
+
+
+# The types produced by the checker are all canonical (see intern_type), so
+# that repeated checks between the same types are cheap.
+BOOLEAN_TYPE = intern_type(MetaTypeNode(MetaTypes.Boolean))
+INTEGRAL_TYPE = intern_type(MetaTypeNode(MetaTypes.Integral))
+FLOATING_TYPE = intern_type(MetaTypeNode(MetaTypes.Floating))
+POINTER_TYPE = intern_type(MetaTypeNode(MetaTypes.Pointer))
+UNIVERSAL_TYPE = intern_type(MetaTypeNode(MetaTypes.Universal))
+
+INT_TYPE = intern_type(SimpleTypeNode("int"))
+STRING_TYPE = intern_type(PointerTypeNode(SimpleTypeNode("char")))
+ARGV_TYPE = intern_type(ArrayTypeNode(PointerTypeNode(SimpleTypeNode("char")), None))
+BLOCK_FUNC_TYPE = intern_type(FuncTypeNode(MetaTypeNode(MetaTypes.Void), []))
 
 
 class TypeCheckVisitor(TraversalVisitor[TypeNode]):
+    """
+    Check the types of a spec.
+
+    The visit methods traverse the tree, and leave the checks for each kind of
+    node to the check methods, so that these can also be used by passes that
+    traverse the tree themselves (see FrontEndVisitor). Any change to the
+    traversal here has to be made in FrontEndVisitor too.
+    """
+
     def __init__(self, require_main: bool = True):
         super().__init__()
         self.require_main = require_main
 
-        self.vars: Dict[str, TypeNode] = {}
+        # keyed by symbol id, see SymbolTable
+        self.symbols = SymbolTable()
+        self.vars: Dict[int, TypeNode] = {}
 
-        self.blocks: Dict[str, BlockNode] = {}
+        # the resolved type of every expression that has been checked, keyed
+        # by the expression node itself
+        self.types: Dict[Node, TypeNode] = {}
+
+        self.blocks: Dict[int, BlockNode] = {}
 
         self.block_current: Optional[str] = None
         self.block_seen_split = False
 
     def visit_spec(self, node: SpecNode):
+        self.check_spec(node)
+
+        # the top-level templates are checked where they're used
+        for chunk in node.chunks:
+            chunk.accept(self)
         for block in node.blocks:
-            if block.name in self.blocks:
+            block.accept(self)
+
+    def check_spec(self, node: SpecNode):
+        self.symbols = node.symbols
+
+        for block in node.blocks:
+            if block.symbol in self.blocks:
                 raise ProcessingError(
                     block, f"block {block.name} cannot be defined twice"
                 )
 
-            self.blocks[block.name] = block
+            self.blocks[block.symbol] = block
 
-        if self.require_main and "main" not in self.blocks:
+        main = self.symbols.lookup("main")
+        if self.require_main and (main is None or main.id not in self.blocks):
             raise ProcessingError(node, "no main block is defined")
 
-        super().visit_spec(node)
-
     def visit_block(self, node: BlockNode):
+        self.check_block(node)
+        super().visit_block(node)
+
+    def check_block(self, node: BlockNode):
         self.block_current = node.name
         self.block_seen_split = False
-        if self.block_current in self.vars:
+        if node.symbol in self.vars:
             raise ProcessingError(
                 node,
                 f"name {node.name} has already been used as a variable",
             )
 
-        self.blocks[self.block_current] = node
-
-        super().visit_block(node)
+        self.blocks[node.symbol] = node
 
     def visit_chunk(self, node: ChunkNode):
         super().visit_chunk(node)
+        self.check_chunk(node)
 
+    def check_chunk(self, node: ChunkNode):
         initials = [var.initial for var in node.variables]
         if any(initials) and not all(initials):
             raise ProcessingError(
@@ -109,51 +209,57 @@ class TypeCheckVisitor(TraversalVisitor[TypeNode]):
         self.block_seen_split = True
 
     def visit_call(self, node: CallNode):
-        if node.target not in self.blocks:
+        if node.symbol not in self.blocks:
             raise ProcessingError(node, f"block {node.target} is not defined")
 
         super().visit_call(node)
 
     def visit_declaration(self, node: DeclarationNode):
+        vartype = self.check_declaration(node)
+        if node.initial:
+            rhs_type = node.initial.accept(self)
+            assert rhs_type is not None
+            self.check_initial(node, vartype, rhs_type)
+
+        super().visit_declaration(node)
+
+    def check_declaration(self, node: DeclarationNode) -> TypeNode:
+        symbol = self.symbols[node.symbol]
         if node.name in ("argc", "argv"):
             raise ProcessingError(
                 node,
                 f"variable {node.name} has already been implicitly declared by main",
             )
-        elif node.name in self.vars:
+        elif node.symbol in self.vars:
             raise ProcessingError(
                 node, f"variable {node.name} has already been declared"
             )
-        elif node.name in variables.TYPES:
+        elif symbol.name in variables.TYPES:
             raise ProcessingError(
                 node,
                 f"variable {node.name} has already been declared as a builtin variable",
             )
-        elif node.name in functions.SIGNATURES:
+        elif symbol.name in functions.SIGNATURES:
             raise ProcessingError(
                 node,
                 f"variable {node.name} has already been declared as a builtin function",
             )
 
-        self.vars[node.name] = node.vartype
-        if node.initial:
-            rhs_type = node.initial.accept(self)
-            assert rhs_type is not None
-
-            if isinstance(node.vartype, FuncTypeNode):
-                raise ProcessingError(node, "cannot assign to function")
-            if not type_check(node.vartype, rhs_type):
-                raise ProcessingError(
-                    node, "incompatible types in declaration assignment"
-                )
+        vartype = intern_type(node.vartype)
+        self.vars[node.symbol] = vartype
+        return vartype
 
-        super().visit_declaration(node)
+    def check_initial(self, node: DeclarationNode, vartype: TypeNode, tp: TypeNode):
+        if isinstance(vartype, FuncTypeNode):
+            raise ProcessingError(node, "cannot assign to function")
+        if not type_check(vartype, tp):
+            raise ProcessingError(node, "incompatible types in declaration assignment")
 
     def visit_type_simple(self, node: SimpleTypeNode) -> TypeNode:
         if node.core not in types.TRANSLATIONS:
             raise ProcessingError(node, f"{node.core} is not a valid type")
 
-        return SimpleTypeNode(node.core)
+        return intern_type(node)
 
     def visit_variable(self, node: VariableNode) -> TypeNode:
         if node.name in ("argc", "argv"):
@@ -168,20 +274,25 @@ class TypeCheckVisitor(TraversalVisitor[TypeNode]):
                 )
 
             if node.name == "argc":
-                return SimpleTypeNode("int")
+                tp = INT_TYPE
             elif node.name == "argv":
-                return ArrayTypeNode(PointerTypeNode(SimpleTypeNode("char")), None)
+                tp = ARGV_TYPE
             else:
                 raise RuntimeError()
-        elif node.name in self.vars:
-            return self.vars[node.name]
-        elif node.name in variables.TYPES:
-            return parse_typestring(variables.TYPES[node.name])
-        elif node.name in functions.SIGNATURES:
-            return parse_typestring(functions.SIGNATURES[node.name])
-        elif node.name in self.blocks:
-            if "func" in self.blocks[node.name].constraints:
-                return FuncTypeNode(MetaTypeNode(MetaTypes.Void), [])
+
+            self.types[node] = tp
+            return tp
+
+        symbol = self.symbols[node.symbol]
+        if node.symbol in self.vars:
+            tp = self.vars[node.symbol]
+        elif symbol.name in variables.TYPES:
+            tp = builtin_variable_type(symbol.name)
+        elif symbol.name in functions.SIGNATURES:
+            tp = builtin_function_type(symbol.name)
+        elif node.symbol in self.blocks:
+            if "func" in self.blocks[node.symbol].constraints:
+                tp = BLOCK_FUNC_TYPE
             else:
                 raise ProcessingError(
                     node,
@@ -190,27 +301,39 @@ class TypeCheckVisitor(TraversalVisitor[TypeNode]):
         else:
             raise ProcessingError(node, f"variable {node.name} does not exist")
 
+        self.types[node] = tp
+        return tp
+
     def visit_if(self, node: IfNode) -> None:
         condition_type = node.condition.accept(self)
         assert condition_type is not None
-        if not type_check(MetaTypeNode(MetaTypes.Boolean), condition_type):
-            raise ProcessingError(node.condition, "if condition must be bool")
+        self.check_condition(node, condition_type)
 
         super().visit_if(node)
 
     def visit_while(self, node: WhileNode) -> None:
         condition_type = node.condition.accept(self)
         assert condition_type is not None
-        if not type_check(MetaTypeNode(MetaTypes.Boolean), condition_type):
-            raise ProcessingError(node.condition, "while condition must be bool")
+        self.check_condition(node, condition_type)
 
         super().visit_while(node)
 
+    def check_condition(self, node: Union[IfNode, WhileNode], tp: TypeNode):
+        if not type_check(BOOLEAN_TYPE, tp):
+            kind = "if" if isinstance(node, IfNode) else "while"
+            raise ProcessingError(node.condition, f"{kind} condition must be bool")
+
     def visit_assignment(self, node: AssignmentNode) -> None:
         lhs_type = node.target.accept(self)
         rhs_type = node.expression.accept(self)
         assert lhs_type is not None and rhs_type is not None
+        self.check_assignment(node, lhs_type, rhs_type)
+
+        super().visit_assignment(node)
 
+    def check_assignment(
+        self, node: AssignmentNode, lhs_type: TypeNode, rhs_type: TypeNode
+    ):
         if isinstance(lhs_type, FuncTypeNode):
             raise ProcessingError(node.target, "cannot assign to function")
         if isinstance(lhs_type, ArrayTypeNode):
@@ -218,22 +341,53 @@ class TypeCheckVisitor(TraversalVisitor[TypeNode]):
         if not type_check(lhs_type, rhs_type):
             raise ProcessingError(node, "incompatible types in assignment")
 
-        super().visit_assignment(node)
-
     def visit_ref(self, node: RefNode) -> TypeNode:
         tp = node.target.accept(self)
         assert tp is not None
-        return PointerTypeNode(tp)
+        return self.check_ref(node, tp)
+
+    def check_ref(self, node: RefNode, target_type: TypeNode) -> TypeNode:
+        tp = intern_type(PointerTypeNode(target_type))
+        self.types[node] = tp
+        return tp
 
     def visit_deref(self, node: DerefNode) -> TypeNode:
-        tp = node.target.accept(self)
-        if isinstance(tp, PointerTypeNode):
-            return tp.base
-        else:
+        return self.check_deref(node, node.target.accept(self))
+
+    def check_deref(self, node: DerefNode, tp: Optional[TypeNode]) -> TypeNode:
+        if not isinstance(tp, PointerTypeNode):
             raise ProcessingError(node, "cannot dereference non-pointer")
 
+        self.types[node] = tp.base
+        return tp.base
+
     def visit_function(self, node: FunctionNode) -> TypeNode:
-        vtype = node.target.accept(self)
+        vtype = self.check_callable(node, node.target.accept(self))
+        for arg, varg in zip(node.arguments, vtype.args):
+            type_result = arg.accept(self)
+            assert type_result is not None
+            self.check_argument(arg, varg, type_result)
+
+        if vtype.variadic:
+            for arg in node.arguments[len(vtype.args) :]:
+                arg.accept(self)
+
+        self.types[node] = vtype.ret
+        return vtype.ret
+
+    def check_function(
+        self, node: FunctionNode, vtype: Optional[TypeNode], arg_types: List[TypeNode]
+    ) -> TypeNode:
+        vtype = self.check_callable(node, vtype)
+        for arg, varg, type_result in zip(node.arguments, vtype.args, arg_types):
+            self.check_argument(arg, varg, type_result)
+
+        self.types[node] = vtype.ret
+        return vtype.ret
+
+    def check_callable(
+        self, node: FunctionNode, vtype: Optional[TypeNode]
+    ) -> FuncTypeNode:
         if not isinstance(vtype, FuncTypeNode):
             raise ProcessingError(node, "value is not a function and cannot be called")
 
@@ -248,106 +402,127 @@ class TypeCheckVisitor(TraversalVisitor[TypeNode]):
                 f"{funcname} expects {len(vtype.args)} arguments, but was given {len(node.arguments)}",
             )
 
-        for arg, varg in zip(node.arguments, vtype.args):
-            if isinstance(arg, FuncTypeNode):
-                raise ProcessingError(arg, "cannot pass function to function")
-
-            type_result = arg.accept(self)
-            assert type_result is not None
-            if not type_check(varg, type_result):
-                # FIXME: better error message needed
-                print(varg, type_result)
-                raise ProcessingError(arg, "argument type mismatch")
+        return vtype
 
-        if vtype.variadic:
-            for arg in node.arguments[len(vtype.args) :]:
-                arg.accept(self)
+    def check_argument(self, arg: ExpressionNode, varg: TypeNode, tp: TypeNode):
+        if isinstance(arg, FuncTypeNode):
+            raise ProcessingError(arg, "cannot pass function to function")
 
-        return vtype.ret
+        if not type_check(varg, tp):
+            # FIXME: better error message needed
+            print(varg, tp)
+            raise ProcessingError(arg, "argument type mismatch")
 
     def visit_value(self, node: ValueNode) -> TypeNode:
         if isinstance(node, IntValueNode):
-            return MetaTypeNode(MetaTypes.Integral)
+            tp = INTEGRAL_TYPE
         elif isinstance(node, FloatValueNode):
-            return MetaTypeNode(MetaTypes.Floating)
+            tp = FLOATING_TYPE
         elif isinstance(node, BoolValueNode):
-            return MetaTypeNode(MetaTypes.Boolean)
+            tp = BOOLEAN_TYPE
         elif isinstance(node, StringValueNode):
-            return PointerTypeNode(SimpleTypeNode("char"))
+            tp = STRING_TYPE
         else:
             raise RuntimeError()
 
+        self.types[node] = tp
+        return tp
+
     def visit_sizeof_expr(self, node: SizeOfExprNode) -> TypeNode:
         node.target.accept(self)
-        return MetaTypeNode(MetaTypes.Integral)
+        return self.check_sizeof(node)
 
     def visit_sizeof_type(self, node: SizeOfTypeNode) -> TypeNode:
         node.target.accept(self)
-        return MetaTypeNode(MetaTypes.Integral)
+        return self.check_sizeof(node)
+
+    def check_sizeof(self, node: Union[SizeOfExprNode, SizeOfTypeNode]) -> TypeNode:
+        self.types[node] = INTEGRAL_TYPE
+        return INTEGRAL_TYPE
 
     def visit_cast(self, node: CastNode) -> TypeNode:
-        return node.cast
+        tp = intern_type(node.cast)
+        self.types[node] = tp
+        return tp
 
     def visit_literal_expr(self, node: LiteralExpressionNode) -> TypeNode:
-        if node.content == "NULL":
-            return MetaTypeNode(MetaTypes.Pointer)
-        else:
-            return MetaTypeNode(MetaTypes.Universal)
+        tp = POINTER_TYPE if node.content == "NULL" else UNIVERSAL_TYPE
+        self.types[node] = tp
+        return tp
 
     def visit_array(self, node: ArrayNode) -> TypeNode:
         index_type = node.index.accept(self)
         assert index_type is not None
-        if not type_check(MetaTypeNode(MetaTypes.Integral), index_type):
+        self.check_index(node, index_type)
+        return self.check_indexed(node, node.target.accept(self))
+
+    def check_index(self, node: ArrayNode, index_type: TypeNode):
+        if not type_check(INTEGRAL_TYPE, index_type):
             raise ProcessingError(
                 node.index, "cannot index with non-integer expressions"
             )
 
-        target_type = node.target.accept(self)
+    def check_indexed(
+        self, node: ArrayNode, target_type: Optional[TypeNode]
+    ) -> TypeNode:
         if not isinstance(target_type, ArrayTypeNode) and not isinstance(
             target_type, PointerTypeNode
         ):
             raise ProcessingError(node.index, "cannot index non-array")
 
+        self.types[node] = target_type.base
         return target_type.base
 
     def visit_unary(self, node: UnaryOperationNode) -> TypeNode:
         item_type = node.item.accept(self)
         assert item_type is not None
+        return self.check_unary(node, item_type)
 
+    def check_unary(self, node: UnaryOperationNode, item_type: TypeNode) -> TypeNode:
         if node.op in BOOLEAN_OPERATORS:
-            bool_type = MetaTypeNode(MetaTypes.Boolean)
+            bool_type = BOOLEAN_TYPE
             if not type_check(bool_type, item_type):
                 raise ProcessingError(node.item, "operand should be boolean")
-            return bool_type
+            tp = bool_type
         elif node.op in ARITHMETIC_OPERATORS:
-            return item_type
+            tp = item_type
         else:
             raise RuntimeError()
 
+        self.types[node] = tp
+        return tp
+
     def visit_binary(self, node: BinaryOperationNode) -> TypeNode:
         left_type = node.left.accept(self)
         right_type = node.right.accept(self)
         assert left_type is not None and right_type is not None
+        return self.check_binary(node, left_type, right_type)
 
+    def check_binary(
+        self, node: BinaryOperationNode, left_type: TypeNode, right_type: TypeNode
+    ) -> TypeNode:
         if node.op in BOOLEAN_OPERATORS:
-            bool_type = MetaTypeNode(MetaTypes.Boolean)
+            bool_type = BOOLEAN_TYPE
             if not type_check(bool_type, left_type):
                 raise ProcessingError(node.left, "left operand should be boolean")
             if not type_check(bool_type, right_type):
                 raise ProcessingError(node.right, "right operand should be boolean")
-            return bool_type
+            tp = bool_type
         elif node.op in COMPARISON_OPERATORS:
             if not type_check(left_type, right_type) and not type_check(
                 right_type, left_type
             ):
                 raise ProcessingError(node, "operands are not the same type")
-            return MetaTypeNode(MetaTypes.Boolean)
+            tp = BOOLEAN_TYPE
         elif node.op in ARITHMETIC_OPERATORS or node.op in BITWISE_OPERATORS:
             if type_check(left_type, right_type):
-                return left_type
-            if type_check(right_type, left_type):
-                return right_type
+                tp = left_type
+            elif type_check(right_type, left_type):
+                tp = right_type
             else:
                 raise ProcessingError(node, "operands are not the same type")
         else:
             raise RuntimeError()
+
+        self.types[node] = tp
+        return tp
@@ -1,29 +1,43 @@
 import argparse
-import random
 import re
-import shutil
-import subprocess
 import sys
+import time
 from pathlib import Path
-from pprint import pformat
-from typing import Any, Dict, Iterable, Optional, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from .assets import Asset, AssetLoader
-from .common.data import data_path
-from .common.dump import DumpType
 from .common.error import SynthError
-from .common.names import rename_args, rename_blocks, rename_vars
-from .config import Configuration
-from .graph import CodeGen, Program
-from .graph.visualizer import GraphVisualizer
-from .interpret import Interpreter
-from .markov import MarkovLoader
-from .nops import NopTransformer
-from .solve import SolveUtils
+
+if TYPE_CHECKING:
+    from .assets import Asset
+    from .cache import SpecCache
+    from .common.dump import DumpType
+    from .config import Configuration
+    from .graph import Program
+    from .node import SpecNode
+
+# The rest of the pipeline is only imported by the subcommands that need it,
+# so that the others (and `import vulnspec`) stay quick to start up - see
+# --startup-profile.
+# pylint: disable=import-outside-toplevel
 
 
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="report how long each vulnspec module takes to import",
+    )
     subparsers = parser.add_subparsers()
 
     parser_synth = subparsers.add_parser(
@@ -36,6 +50,16 @@ def main():
     parser_synth.add_argument(
         "--template", action="append", help="preset value of a template"
     )
+    parser_synth.add_argument(
+        "--cache",
+        action="store_true",
+        help="cache parsed specifications between runs",
+    )
+    parser_synth.add_argument(
+        "--fused",
+        action="store_true",
+        help="template, check and lower the specification in a single pass",
+    )
     parser_synth.add_argument(
         "--no-file-comment",
         dest="file_comment",
@@ -59,6 +83,29 @@ def main():
     for dump in SYNTH_DUMP_ARGS:
         parser_synth.add_argument(dump, type=Path)
 
+    parser_watch = subparsers.add_parser(
+        "watch", help="resynthesize a specification whenever it changes"
+    )
+    parser_watch.set_defaults(action=action_watch)
+    parser_watch.add_argument("inpath", type=Path)
+    parser_watch.add_argument("outpath", type=Path, nargs="?")
+    parser_watch.add_argument("--seed", help="random seed to use")
+    parser_watch.add_argument(
+        "--template", action="append", help="preset value of a template"
+    )
+    parser_watch.add_argument(
+        "--interval",
+        type=float,
+        default=0.2,
+        help="seconds to wait between checking for changes",
+    )
+    parser_watch.add_argument(
+        "--format",
+        choices=["none", "llvm", "google", "chromium", "mozilla", "webkit"],
+        default="webkit",
+        help="coding style to output",
+    )
+
     parser_build = subparsers.add_parser(
         "build", help="execute the build commands in a C file header"
     )
@@ -82,6 +129,11 @@ def main():
     parser_environ.add_argument(
         "--template", action="append", help="preset value of a template"
     )
+    parser_environ.add_argument(
+        "--cache",
+        action="store_true",
+        help="cache parsed specifications between runs",
+    )
     parser_environ.add_argument(
         "--solution",
         action="store_true",
@@ -104,6 +156,9 @@ def main():
 
     args = parser.parse_args()
 
+    if args.startup_profile:
+        argv = [arg for arg in sys.argv[1:] if arg != "--startup-profile"]
+        sys.exit(startup_profile(argv))
     if hasattr(args, "action"):
         sys.exit(args.action(args))
     else:
@@ -111,7 +166,37 @@ def main():
         sys.exit(1)
 
 
+def startup_profile(argv: List[str]) -> int:
+    """
+    Run vulnspec with the given arguments under `python -X importtime`, and
+    report the import times of its modules once it's finished.
+    """
+
+    import subprocess
+
+    from .common import importtime
+
+    times = []
+    with subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-m", "vulnspec", *argv],
+        stderr=subprocess.PIPE,
+        text=True,
+    ) as proc:
+        assert proc.stderr is not None
+        for line in proc.stderr:
+            if not importtime.is_importtime(line):
+                print(line, end="", file=sys.stderr)
+            elif (timing := importtime.parse_line(line.rstrip("\n"))) is not None:
+                times.append(timing)
+
+    print(importtime.report(times), file=sys.stderr)
+    return proc.returncode
+
+
 def action_synth(args) -> int:
+    from .common.dump import DumpType
+    from .config import Configuration
+
     stream = args.inpath.read_text()
     config = Configuration(args.outpath, stream)
 
@@ -128,8 +213,15 @@ def action_synth(args) -> int:
         DumpType.GraphBlock: args.dump_block_graph,
         DumpType.GraphBlockChunk: args.dump_block_chunk_graph,
     }
+    cache = None
+    if args.cache:
+        from .cache import SpecCache
+
+        cache = SpecCache()
     try:
-        _, program = synthesize(stream, args.seed, templates, dump=dump)
+        _, program = synthesize(
+            stream, args.seed, templates, dump=dump, cache=cache, fused=args.fused
+        )
     except SynthError as err:
         print(err, file=sys.stderr)
         return 1
@@ -140,6 +232,62 @@ def action_synth(args) -> int:
     return 0
 
 
+def action_watch(args) -> int:
+    import copy
+
+    from .config import Configuration
+    from .parser import IncrementalParser
+
+    templates = {}
+    if args.template:
+        for templ in args.template:
+            name, value = templ.split("=")
+            templates[name] = value
+
+    front = IncrementalParser()
+    mtime = None
+    try:
+        while True:
+            try:
+                current = args.inpath.stat().st_mtime_ns
+            except FileNotFoundError:
+                current = None
+            if current is None or current == mtime:
+                time.sleep(args.interval)
+                continue
+            mtime = current
+
+            stream = args.inpath.read_text()
+            start = time.perf_counter()
+            try:
+                spec = front.update(stream)
+            except SynthError as err:
+                print(err, file=sys.stderr)
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"parsed {args.inpath} in {elapsed:.2f}ms", file=sys.stderr)
+
+            try:
+                # the passes modify the tree and fill in the templates, so
+                # keep both intact for the next update
+                _, program = synthesize(
+                    stream, args.seed, dict(templates), parsed=copy.deepcopy(spec)
+                )
+                if args.outpath:
+                    config = Configuration(args.outpath, stream)
+                    code = gen_code(
+                        program, config, file_comment=True, style=args.format
+                    )
+                    args.outpath.write_text(code)
+            except SynthError as err:
+                print(front.relocate(err), file=sys.stderr)
+                continue
+
+            print(f"synthesized {args.inpath}", file=sys.stderr)
+    except KeyboardInterrupt:
+        return 0
+
+
 def action_build(args) -> int:
     stream = args.inpath.read_text()
 
@@ -153,6 +301,11 @@ def action_build(args) -> int:
 
 
 def action_environment(args) -> int:
+    import shutil
+    import subprocess
+
+    from .config import Configuration
+
     stream = args.inpath.read_text()
     base = Path(args.inpath).parent
 
@@ -194,8 +347,13 @@ def action_environment(args) -> int:
             name, value = templ.split("=")
             templates[name] = value
 
+    cache = None
+    if args.cache:
+        from .cache import SpecCache
+
+        cache = SpecCache()
     try:
-        asset, program = synthesize(stream, args.seed, templates)
+        asset, program = synthesize(stream, args.seed, templates, cache=cache)
         code = gen_code(program, config, style=args.format)
         target.write_text(code)
     except SynthError as err:
@@ -273,12 +431,29 @@ def synthesize(
     spec: str,
     seed: Optional[str] = None,
     templates: Optional[Dict[str, Union[str, int, float, bool]]] = None,
-    dump: Optional[Dict[DumpType, Optional[Path]]] = None,
-) -> Tuple[Asset, Program]:
+    dump: Optional[Dict["DumpType", Optional[Path]]] = None,
+    cache: Optional["SpecCache"] = None,
+    *,
+    parsed: Optional["SpecNode"] = None,
+    fused: bool = False,
+) -> Tuple["Asset", "Program"]:
+    import random
+
+    from .assets import Asset, AssetLoader
+    from .common.data import data_path
+    from .common.dump import DumpType
+    from .common.names import rename_args, rename_blocks, rename_vars
+    from .graph.visualizer import GraphVisualizer
+    from .interpret import Interpreter
+    from .markov import NAME_SIZES, MarkovLoader
+    from .nops import NopTransformer
+
     if seed is not None:
         random.seed(seed)
 
-    asset = Asset.load(spec, templates=templates, dump=dump)
+    asset = Asset.load(
+        spec, templates=templates, dump=dump, cache=cache, parsed=parsed, fused=fused
+    )
 
     if dump and (dump_output := dump.get(DumpType.GraphBlock)):
         with dump_output.open("w") as f:
@@ -289,21 +464,20 @@ def synthesize(
             vis = GraphVisualizer(f)
             vis.generate_block_chunk_graph(asset.blocks, asset.chunks, asset.extern)
 
-    nops = AssetLoader(data_path("nops")).list(external=True)
+    # most nops are never used in a single synthesis, so only load them when
+    # they're picked
+    nops = AssetLoader(data_path("nops")).list(external=True, lazy=True)
     noper = NopTransformer(nops)
     asset = noper.transform(asset)
 
-    mapping = {}
     mloader = MarkovLoader(exclude=asset.extern.varnames)
-    model_funcs = mloader.model("funcs", (3, 12))
-    model_vars = mloader.model("vars", (1, 12))
-    for block in asset.blocks:
-        if block.name == "main":
-            continue
-        mapping[block.name] = model_funcs.generate()
-    for chunk in asset.chunks:
-        for var in chunk.variables:
-            mapping[var.name] = model_vars.generate()
+    model_funcs = mloader.model("funcs", NAME_SIZES["funcs"])
+    model_vars = mloader.model("vars", NAME_SIZES["vars"])
+
+    blocks = [block.name for block in asset.blocks if block.name != "main"]
+    variables = [var.name for chunk in asset.chunks for var in chunk.variables]
+    mapping = dict(zip(blocks, model_funcs.generate_batch(len(blocks))))
+    mapping.update(zip(variables, model_vars.generate_batch(len(variables))))
 
     rename_blocks(asset, mapping)
     rename_vars(asset, mapping)
@@ -315,16 +489,19 @@ def synthesize(
     inter = Interpreter(asset)
     prog = inter.program()
 
-    for func in prog.functions.values():
-        fmapping = {}
-        for var in func.args:
-            fmapping[var.name] = model_vars.generate()
-        rename_args(func, fmapping)
+    funcs = list(prog.functions.values())
+    names = iter(model_vars.generate_batch(sum(len(func.args) for func in funcs)))
+    for func in funcs:
+        rename_args(func, {var.name: next(names) for var in func.args})
 
     return asset, prog
 
 
-def gen_solve(source: str, annotations: Dict[str, Any], config: Configuration) -> str:
+def gen_solve(source: str, annotations: Dict[str, Any], config: "Configuration") -> str:
+    from pprint import pformat
+
+    from .solve import SolveUtils
+
     binpath = config.debug_path if config.debug_path else config.dest_path
     with binpath.open("rb") as binary:
         su = SolveUtils(binary)
@@ -339,18 +516,26 @@ def gen_solve(source: str, annotations: Dict[str, Any], config: Configuration) -
 
     def subf(match: re.Match) -> str:
         lhs = f"gen_{match.group(1)}"
-        rhs = pformat(items[match.group(1)])
+        value = items[match.group(1)]
+        if isinstance(value, Mapping):
+            # e.g. the templates, which are only evaluated once needed
+            value = dict(value)
+        rhs = pformat(value)
         return f"{lhs} = {rhs}"
 
     return pattern.sub(subf, source).rstrip()
 
 
 def gen_code(
-    program: Program,
-    config: Configuration,
+    program: "Program",
+    config: "Configuration",
     file_comment: bool = False,
     style: str = "none",
 ) -> str:
+    import subprocess
+
+    from .graph import CodeGen
+
     code = CodeGen(program).generate()
     if style != "none":
         proc = subprocess.run(
@@ -398,6 +583,8 @@ def extract_commands(stream: str, section: str) -> Iterable[str]:
 
 
 def run_commands(stream: str, section: str, cwd: Optional[Path] = None):
+    import subprocess
+
     for command in extract_commands(stream, section):
         print(command, file=sys.stderr, flush=True)
         subprocess.run(command, cwd=cwd, shell=True, check=True)